@@ -0,0 +1,220 @@
+"""Simulate a day of checks at fixed and adaptive intervals, without a broker.
+
+Each queue sits well under its limit, following a daily cycle, until an
+incident stops its consumers and it fills at a steady rate until some time
+after it breaches its limit. Reports the checks made by each policy, and
+how long after each breach it was noticed.
+
+Usage:
+    python benchmarks/bench_adaptive.py --queues 200 --incidents 12 --min 0.5 --max 5
+"""
+
+import argparse
+import math
+import random
+from typing import List, Optional, Tuple
+
+from amqpeek.history import DepthHistory
+from amqpeek.schedule import AdaptiveInterval
+
+DAY = 24 * 60 * 60
+
+# Seconds an incident carries on after its queue breaches its limit
+INCIDENT_AFTER_BREACH = 15 * 60
+
+LIMIT = 1000
+
+
+class SimulatedQueue(object):
+    """The depth of a queue over a day, with the incidents it goes through."""
+
+    def __init__(self, rng: random.Random) -> None:
+        """Create a SimulatedQueue with a random daily cycle.
+
+        Args:
+            rng: Source of randomness
+        """
+        self.level = rng.uniform(0.05, 0.3) * LIMIT
+        self.swing = rng.uniform(0.0, 0.1) * LIMIT
+        self.phase = rng.uniform(0, DAY)
+        self.incidents: List[Tuple[float, float, float]] = []
+
+    def base(self, now: float) -> float:
+        """Get the depth of the queue outside incidents.
+
+        Args:
+            now: Seconds into the day
+
+        Returns:
+            The depth of the queue
+        """
+        return self.level + self.swing * math.sin(
+            2 * math.pi * (now + self.phase) / DAY
+        )
+
+    def add_incident(self, start: float, rate: float) -> float:
+        """Stop the consumers of the queue until after it breaches its limit.
+
+        Args:
+            start: Seconds into the day the incident starts
+            rate: Messages a second the queue fills at during the incident
+
+        Returns:
+            Seconds into the day the queue breaches its limit
+        """
+        breach = start
+
+        while self.base(breach) + rate * (breach - start) <= LIMIT:
+            breach += 1
+
+        self.incidents.append((start, breach + INCIDENT_AFTER_BREACH, rate))
+
+        return breach
+
+    def depth(self, now: float) -> int:
+        """Get the depth of the queue.
+
+        Args:
+            now: Seconds into the day
+
+        Returns:
+            The depth of the queue
+        """
+        depth = self.base(now)
+
+        for start, end, rate in self.incidents:
+            if start <= now < end:
+                depth += rate * (now - start)
+            elif now >= end:
+                # Drained three times as fast as it filled
+                depth += max(rate * (end - start) - 3 * rate * (now - end), 0.0)
+
+        return int(depth)
+
+
+def simulate(
+    queues: List[SimulatedQueue],
+    breaches: List[Tuple[int, float]],
+    adaptive: AdaptiveInterval,
+    fixed: Optional[float],
+) -> Tuple[int, List[float], int]:
+    """Check the queues over a day at a fixed or adaptive interval.
+
+    Args:
+        queues: The simulated queues
+        breaches: The queue and time of each breach
+        adaptive: The adaptive interval, used when not fixed
+        fixed: The seconds between checks, None to adapt
+
+    Returns:
+        The number of checks, the delay noticing each breach noticed, and
+        the number of breaches not noticed
+    """
+    now = 0.0
+    history = DepthHistory(size=2, clock=lambda: now)
+    queue_details = [(index, LIMIT) for index in range(len(queues))]
+    pending = sorted(breaches, key=lambda breach: breach[1])
+    delays = []
+    checks = 0
+
+    while now < DAY:
+        history.start_cycle()
+        checks += 1
+
+        for index, queue in enumerate(queues):
+            history.record(index, queue.depth(now))  # type: ignore
+
+        for index, breached_at in [breach for breach in pending if breach[1] <= now]:
+            if history.current(index) > LIMIT:  # type: ignore
+                delays.append(now - breached_at)
+            elif now < breached_at + INCIDENT_AFTER_BREACH:
+                # Truncated to a whole message, still at its limit
+                continue
+
+            pending.remove((index, breached_at))
+
+        if fixed is not None:
+            now += fixed
+        else:
+            pressure = adaptive.pressure(history, queue_details)
+            now += adaptive.period(pressure)  # type: ignore
+
+    return checks, delays, len(breaches) - len(delays)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of the values.
+
+    Args:
+        values: The values, not empty
+        fraction: The percentile as a fraction
+
+    Returns:
+        The value at the percentile, by nearest rank
+    """
+    ordered = sorted(values)
+
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queues", type=int, default=200)
+    parser.add_argument("--incidents", type=int, default=12)
+    parser.add_argument("--min", type=float, default=0.5, help="minutes")
+    parser.add_argument("--max", type=float, default=5, help="minutes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    queues = [SimulatedQueue(rng) for _ in range(args.queues)]
+    breaches = []
+
+    for _ in range(args.incidents):
+        index = rng.randrange(args.queues)
+        # Filling up in between 2 and 30 minutes
+        rate = LIMIT / rng.uniform(2 * 60, 30 * 60)
+        breaches.append((index, queues[index].add_incident(rng.uniform(0, DAY), rate)))
+
+    adaptive = AdaptiveInterval(min_period=args.min * 60, max_period=args.max * 60)
+    policies = [
+        ("fixed min", args.min * 60),
+        ("fixed max", args.max * 60),
+        ("adaptive", None),
+    ]
+
+    print(
+        "{} queues, {} incidents, checks between {} and {} min".format(
+            args.queues, args.incidents, args.min, args.max
+        )
+    )
+    print(
+        "{:<10} {:>7} {:>7} {:>8} {:>8} {:>8} {:>8}".format(
+            "policy", "checks", "saved", "p50 s", "p95 s", "max s", "missed"
+        )
+    )
+    baseline = None
+
+    for name, fixed in policies:
+        checks, delays, missed = simulate(queues, breaches, adaptive, fixed)
+        baseline = baseline or checks
+        print(
+            "{:<10} {:>7} {:>6.0%} {:>8.0f} {:>8.0f} {:>8.0f} {:>8}".format(
+                name,
+                checks,
+                1 - checks / baseline,
+                percentile(delays, 0.5) if delays else math.nan,
+                percentile(delays, 0.95) if delays else math.nan,
+                max(delays) if delays else math.nan,
+                missed,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Measure the cycle time and memory of a monitor against a fake broker.
+
+Each size is checked against a fake broker holding that many queues, some
+of them missing, and the cycle time, the memory allocated at the peak of a
+cycle and the memory still held after it are reported. The broker runs in
+a child process, so its own work and allocations are not measured.
+
+Save the results, then compare a later run against them to catch
+regressions before release:
+
+    python benchmarks/bench_cycle.py --save baseline.json
+    python benchmarks/bench_cycle.py --baseline baseline.json
+
+The comparison exits with an error if any result is worse than the
+baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import statistics
+import sys
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from typing import Dict, Iterator, List, Tuple
+
+from bench_engines import CountingNotifier
+from fake_broker import FakeBroker
+
+from amqpeek.async_monitor import AsyncioMonitor
+from amqpeek.monitor import Connector, Monitor
+
+ENGINES = {"blocking": Monitor, "asyncio": AsyncioMonitor}
+
+
+def build_queues(count: int, missing: float) -> Tuple[List[tuple], Dict[str, int]]:
+    """Build the queues to monitor, and those declared on the broker.
+
+    Args:
+        count: The number of queues monitored
+        missing: The fraction of the monitored queues not declared
+
+    Returns:
+        The queue details to monitor, and a map of the declared queues to
+        the number of messages on them
+    """
+    queue_details = [("queue-{}".format(i), 10) for i in range(count)]
+    declared = queue_details[int(count * missing) :]
+
+    return queue_details, {name: i % 20 for i, (name, _) in enumerate(declared)}
+
+
+def serve(queues: Dict[str, int], latency: float, pipe: Connection) -> None:
+    """Run a fake broker until told to stop, in a child process.
+
+    Args:
+        queues: Map of queue name to the number of messages on it
+        latency: Seconds to wait before sending each reply
+        pipe: Receives the port listened on, then the request to stop
+    """
+    with FakeBroker(queues, latency=latency) as broker:
+        pipe.send(broker.port)
+        pipe.recv()
+
+
+class BrokerProcess(object):
+    """A fake broker running in a child process."""
+
+    def __init__(self, queues: Dict[str, int], latency: float) -> None:
+        """Create the broker process.
+
+        Args:
+            queues: Map of queue name to the number of messages on it
+            latency: Seconds to wait before sending each reply
+        """
+        self.pipe, child_pipe = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=serve, args=(queues, latency, child_pipe), daemon=True
+        )
+        self.port = 0
+
+    def __enter__(self) -> "BrokerProcess":
+        """Start the broker and wait for it to listen.
+
+        Returns:
+            The running broker
+        """
+        self.process.start()
+        self.port = self.pipe.recv()
+
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop the broker.
+
+        Args:
+            exc_info: Exception details, if any
+        """
+        self.pipe.send(None)
+        self.process.join()
+
+
+def measure(monitor: Monitor, cycles: int) -> Dict[str, float]:
+    """Measure the cycles of a monitor whose connection is already open.
+
+    Args:
+        monitor: The monitor to check with
+        cycles: The number of cycles to time
+
+    Returns:
+        The median cycle time in ms, and the peak and retained memory of a
+        cycle in KB
+    """
+    times = []
+
+    for _ in range(cycles):
+        start = time.perf_counter()
+        monitor.run_cycle()
+        times.append(time.perf_counter() - start)
+
+    # Only the allocations made once tracing starts are traced
+    tracemalloc.start()
+    monitor.run_cycle()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cycle_ms": statistics.median(times) * 1000,
+        "peak_kb": peak / 1024,
+        "retained_kb": retained / 1024,
+    }
+
+
+def run_sizes(args: argparse.Namespace) -> Iterator[Tuple[int, Dict[str, float]]]:
+    """Measure each size of broker in turn.
+
+    Args:
+        args: The parsed command line arguments
+
+    Yields:
+        The number of queues, and the results for that many
+    """
+    for size in args.sizes:
+        queue_details, queues = build_queues(size, args.missing)
+
+        with BrokerProcess(queues, args.latency) as broker:
+            monitor = ENGINES[args.engine](
+                Connector(
+                    host="127.0.0.1",
+                    port=broker.port,
+                    vhost="/",
+                    user="guest",
+                    passwd="guest",
+                ),
+                queue_details,
+                persistent=True,
+            )
+            monitor.notifiers = [CountingNotifier()]
+            # Open the connection and channels before measuring
+            monitor.run_cycle()
+
+            yield size, measure(monitor, args.cycles)
+
+            monitor.shutdown()
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline_path: str, tolerance: float
+) -> List[str]:
+    """Find the results worse than the baseline by more than the tolerance.
+
+    Args:
+        results: Map of size to its results
+        baseline_path: The file of saved results to compare with
+        tolerance: The fraction a result may be worse than the baseline
+
+    Returns:
+        A description of each regression
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = []
+
+    for size, size_results in results.items():
+        for name, value in size_results.items():
+            expected = baseline.get(size, {}).get(name)
+
+            if expected is not None and value > max(expected, 1) * (1 + tolerance):
+                regressions.append(
+                    "{} queues: {} {:.1f} > {:.1f}".format(size, name, value, expected)
+                )
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[10, 1000, 10000],
+    )
+    parser.add_argument("--missing", type=float, default=0.01)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="blocking")
+    parser.add_argument("--save", help="Save the results to this file")
+    parser.add_argument("--baseline", help="Compare the results with this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    # pika warns about every channel closed for a missing queue
+    logging.getLogger("pika").setLevel(logging.ERROR)
+
+    print(
+        "{} engine, {:.0%} missing, {:.1f} ms latency".format(
+            args.engine, args.missing, args.latency * 1000
+        )
+    )
+    print(
+        "{:>8} {:>10} {:>12} {:>10} {:>12}".format(
+            "queues", "cycle ms", "us / queue", "peak KB", "retained KB"
+        )
+    )
+
+    results = {}
+
+    for size, size_results in run_sizes(args):
+        results[str(size)] = size_results
+        print(
+            "{:>8} {:>10.2f} {:>12.1f} {:>10.1f} {:>12.1f}".format(
+                size,
+                size_results["cycle_ms"],
+                size_results["cycle_ms"] * 1000 / size,
+                size_results["peak_kb"],
+                size_results["retained_kb"],
+            )
+        )
+
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump(results, save_file, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
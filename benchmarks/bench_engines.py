@@ -0,0 +1,121 @@
+"""Compare cycle time of the blocking, asyncio and sharded check engines.
+
+The fake broker runs in this process, so with the sharded engine it can
+become the bottleneck before the worker processes do.
+
+Usage:
+    python benchmarks/bench_engines.py --queues 3000 --latency 0.002 --processes 4
+"""
+
+import argparse
+import logging
+import time
+from typing import List
+
+from fake_broker import FakeBroker
+
+from amqpeek.async_monitor import AsyncioMonitor
+from amqpeek.monitor import Connector, Monitor
+from amqpeek.notifier import Notifier
+from amqpeek.sharded import ShardedMonitor
+
+
+class CountingNotifier(Notifier):
+    """Notifier that only counts the notifications sent."""
+
+    def __init__(self) -> None:
+        """Create the notifier with no notifications counted."""
+        self.count = 0
+
+    def notify(self, subject: str, message: str) -> None:
+        """Count the notification.
+
+        Args:
+            subject: The subject of the notification
+            message: The body of the notification
+        """
+        self.count += 1
+
+
+def time_cycle(monitor: Monitor) -> tuple:
+    """Time a single check cycle of the given monitor.
+
+    Args:
+        monitor: The monitor to run
+
+    Returns:
+        The cycle time in seconds and the number of notifications sent
+    """
+    notifier = CountingNotifier()
+    monitor.notifiers = [notifier]
+
+    start = time.perf_counter()
+    monitor.check()
+
+    return time.perf_counter() - start, notifier.count
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queues", type=int, default=3000)
+    parser.add_argument("--missing", type=float, default=0.01)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    # pika warns about every channel closed for a missing queue
+    logging.getLogger("pika").setLevel(logging.ERROR)
+
+    missing = int(args.queues * args.missing)
+    queue_details = [("queue-{}".format(i), 10) for i in range(args.queues)]
+    queues = {name: i % 20 for i, (name, _) in enumerate(queue_details[missing:])}
+
+    with FakeBroker(queues, latency=args.latency) as broker:
+        connector = Connector(
+            host=broker.host, port=broker.port, vhost="/", user="guest", passwd="guest"
+        )
+        engines = (
+            ("blocking", Monitor(connector, queue_details)),
+            (
+                "asyncio",
+                AsyncioMonitor(connector, queue_details, concurrency=args.concurrency),
+            ),
+            (
+                "sharded",
+                ShardedMonitor(
+                    connector,
+                    queue_details,
+                    processes=args.processes,
+                    concurrency=args.concurrency,
+                ),
+            ),
+        )
+
+        print(
+            "{} queues, {} missing, {:.1f} ms latency".format(
+                args.queues, missing, args.latency * 1000
+            )
+        )
+
+        for name, monitor in engines:
+            if isinstance(monitor, ShardedMonitor):
+                # Start the worker processes and connections outside the timing
+                monitor.check()
+
+            elapsed, notifications = time_cycle(monitor)
+            monitor.shutdown()
+            print(
+                "{:<10} {:>8.3f} s  {} notifications".format(
+                    name, elapsed, notifications
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
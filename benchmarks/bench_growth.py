@@ -0,0 +1,88 @@
+"""Compare fitting the growth of each queue one by one and in one batch.
+
+Usage:
+    python benchmarks/bench_growth.py --queues 10000 --window 10
+"""
+
+import argparse
+import itertools
+import random
+import time
+from typing import Dict, List, Tuple
+
+from amqpeek.history import DepthHistory
+
+
+def naive_slopes(
+    history: DepthHistory, queue_names: List[str], window: int
+) -> Dict[str, Tuple[int, float]]:
+    """Fit a least squares line to the samples of each queue in turn.
+
+    Args:
+        history: The recent depths of the queues
+        queue_names: The queues to fit
+        window: The number of most recent samples to fit
+
+    Returns:
+        Map of queue name to its latest depth and slope
+    """
+    slopes = {}
+
+    for queue_name in queue_names:
+        samples = history.samples(queue_name)[-window:]
+        mean_time = sum(sample_time for sample_time, _ in samples) / window
+        mean_depth = sum(depth for _, depth in samples) / window
+        covariance = sum(
+            (sample_time - mean_time) * (depth - mean_depth)
+            for sample_time, depth in samples
+        )
+        spread = sum((sample_time - mean_time) ** 2 for sample_time, _ in samples)
+        slopes[queue_name] = (samples[-1][1], covariance / spread)
+
+    return slopes
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queues", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=10)
+    parser.add_argument("--history-size", type=int, default=1440)
+    args = parser.parse_args(argv)
+
+    clock = itertools.count(0, 60)
+    history = DepthHistory(size=args.history_size, clock=lambda: next(clock))
+    queue_names = ["queue_{}".format(i) for i in range(args.queues)]
+    rates = {queue_name: random.randint(0, 100) for queue_name in queue_names}
+
+    for cycle in range(args.history_size):
+        history.start_cycle()
+
+        for queue_name, rate in rates.items():
+            history.record(queue_name, cycle * rate + random.randint(0, 10))
+
+    print(
+        "{} queues, window of {}, history {:.1f} MB".format(
+            args.queues, args.window, history.nbytes() / 2 ** 20
+        )
+    )
+
+    start = time.perf_counter()
+    expected = naive_slopes(history, queue_names, args.window)
+    print("{:<10} {:>8.3f} s".format("naive", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    slopes = history.slopes(queue_names, args.window)
+    print("{:<10} {:>8.3f} s".format("batched", time.perf_counter() - start))
+
+    for queue_name, (depth, slope) in expected.items():
+        assert slopes[queue_name][0] == depth
+        assert abs(slopes[queue_name][1] - slope) < 1e-6
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Measure the time taken to start amqpeek, against a budget.
+
+Run once a minute from cron, amqpeek spends much of its time importing
+modules, so only the clients of the engine and notifiers in use should be
+imported. Each run imports the command line in a new interpreter with
+-X importtime, and the median time is compared with the budget:
+
+    python benchmarks/bench_import.py --budget 100
+
+The benchmark exits with an error when the import takes longer than the
+budget, or when any of the slow clients is imported at startup.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules only needed once the config asks for them
+LAZY_MODULES = (
+    "asyncio",
+    "http.server",
+    "pika",
+    "requests",
+    "slacker",
+    "smtplib",
+    "yaml",
+)
+
+
+def import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    """Import a module in a new interpreter, timing every module imported.
+
+    Args:
+        module: The module to import
+
+    Returns:
+        Map of each module imported to its own and cumulative import time in us
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        own, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+
+    return times
+
+
+def measure(module: str, runs: int) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Time importing a module over several runs.
+
+    Args:
+        module: The module to import
+        runs: The number of interpreters to time
+
+    Returns:
+        The median import time in ms, and the module times of the last run
+    """
+    totals = []
+
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(times[module][1] / 1000)
+
+    return statistics.median(totals), times
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--module", default="amqpeek.cli")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=100, help="Budget in ms")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    median, times = measure(args.module, args.runs)
+
+    print(
+        "{} imported in {:.1f} ms (median of {})".format(args.module, median, args.runs)
+    )
+    print("{:>10}  {}".format("own ms", "slowest modules"))
+
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)
+
+    for name, (own, _) in slowest[: args.top]:
+        print("{:>10.1f}  {}".format(own / 1000, name))
+
+    failures = [
+        "{} imported at startup".format(name) for name in LAZY_MODULES if name in times
+    ]
+
+    if median > args.budget:
+        failures.append(
+            "import took {:.1f} ms, over the budget of {:.1f} ms".format(
+                median, args.budget
+            )
+        )
+
+    for failure in failures:
+        print("Regression: {}".format(failure))
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare matching queue names against patterns one by one and with QueueMatcher.
+
+Usage:
+    python benchmarks/bench_matcher.py --queues 50000 --patterns 300
+"""
+
+import argparse
+import fnmatch
+import re
+import time
+from typing import List
+
+from amqpeek.discovery import QueueMatcher
+
+
+def build_patterns(count: int) -> List[tuple]:
+    """Build a mix of glob and regex patterns, one per queue family.
+
+    Args:
+        count: The number of patterns
+
+    Returns:
+        Pairs of pattern and limit
+    """
+    patterns = []
+
+    for i in range(count):
+        if i % 2:
+            patterns.append(("re:family-{}\\.tenant-\\d+".format(i), i))
+        else:
+            patterns.append(("family-{}.tenant-*".format(i), i))
+
+    return patterns
+
+
+def naive_resolve(patterns: List[tuple], queue_names: List[str]) -> List[tuple]:
+    """Match every queue name against each pattern in turn.
+
+    Args:
+        patterns: Pairs of pattern and limit
+        queue_names: The names of the queues on the broker
+
+    Returns:
+        Pairs of queue name and the lowest matching limit
+    """
+    compiled = [
+        (
+            re.compile(
+                pattern[3:] if pattern.startswith("re:") else fnmatch.translate(pattern)
+            ),
+            limit,
+        )
+        for pattern, limit in patterns
+    ]
+    queue_details = []
+
+    for queue_name in queue_names:
+        limits = [limit for regex, limit in compiled if regex.fullmatch(queue_name)]
+
+        if limits:
+            queue_details.append((queue_name, min(limits)))
+
+    return queue_details
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queues", type=int, default=50000)
+    parser.add_argument("--patterns", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    patterns = build_patterns(args.patterns)
+    # A tenth of the queues belong to no family, so match no pattern
+    queue_names = [
+        "family-{}.tenant-{}".format(i % (args.patterns * 10 // 9), i)
+        for i in range(args.queues)
+    ]
+
+    print("{} queues, {} patterns".format(args.queues, args.patterns))
+
+    start = time.perf_counter()
+    expected = naive_resolve(patterns, queue_names)
+    print("{:<10} {:>8.3f} s".format("naive", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    matcher = QueueMatcher(patterns)
+    compiled = time.perf_counter() - start
+    resolved = matcher.resolve(queue_names)
+    print(
+        "{:<10} {:>8.3f} s  (compile {:.3f} s)".format(
+            "matcher", time.perf_counter() - start, compiled
+        )
+    )
+
+    assert sorted(resolved) == sorted(expected)
+
+
+if __name__ == "__main__":
+    main()
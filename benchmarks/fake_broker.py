@@ -0,0 +1,210 @@
+"""A minimal in-process AMQP 0-9-1 broker for benchmarking amqpeek.
+
+Only the parts of the protocol amqpeek uses are implemented: connection
+open, channel open and passive queue declares. Every synchronous reply is
+delayed by ``latency`` seconds to simulate the broker round trip, without
+serialising replies to different channels.
+"""
+
+import asyncio
+import threading
+from typing import Dict, Optional
+
+from pika import frame, spec
+
+SERVER_PROPERTIES = {"product": "amqpeek-fake-broker", "capabilities": {}}
+
+
+class FakeBrokerProtocol(asyncio.Protocol):
+    """Handles a single client connection to the fake broker."""
+
+    def __init__(self, broker: "FakeBroker") -> None:
+        """Create the protocol for the given broker.
+
+        Args:
+            broker: The broker holding the queues and settings
+        """
+        self.broker = broker
+        self.buffer = b""
+        self.transport: Optional[asyncio.Transport] = None
+        self.loop = asyncio.get_event_loop()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Record the transport of the new connection.
+
+        Args:
+            transport: The transport of the client connection
+        """
+        self.transport = transport  # type: ignore
+
+    def data_received(self, data: bytes) -> None:
+        """Decode and handle all complete frames received.
+
+        Args:
+            data: The bytes received from the client
+        """
+        self.buffer += data
+
+        while self.buffer:
+            consumed, received = frame.decode_frame(self.buffer)
+
+            if not consumed:
+                return
+
+            self.buffer = self.buffer[consumed:]
+            self.handle_frame(received)
+
+    def send(self, channel_number: int, method: spec.amqp_object.Method) -> None:
+        """Send a method frame, after the configured latency.
+
+        Args:
+            channel_number: The channel to send the method on
+            method: The method to send
+        """
+        data = frame.Method(channel_number, method).marshal()
+
+        if self.broker.latency:
+            self.loop.call_later(self.broker.latency, self.write, data)
+        else:
+            self.write(data)
+
+    def write(self, data: bytes) -> None:
+        """Write data to the client, if it is still connected.
+
+        Args:
+            data: The bytes to write
+        """
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(data)
+
+    def handle_frame(self, received: object) -> None:  # noqa: C901
+        """Reply to a frame received from the client.
+
+        Args:
+            received: The decoded frame
+        """
+        if isinstance(received, frame.ProtocolHeader):
+            self.send(
+                0,
+                spec.Connection.Start(
+                    server_properties=SERVER_PROPERTIES,
+                    mechanisms=b"PLAIN",
+                    locales=b"en_US",
+                ),
+            )
+            return
+
+        if not isinstance(received, frame.Method):
+            return
+
+        channel_number = received.channel_number
+        method = received.method
+
+        if isinstance(method, spec.Connection.StartOk):
+            self.send(0, spec.Connection.Tune(channel_max=2047, frame_max=131072))
+        elif isinstance(method, spec.Connection.Open):
+            self.send(0, spec.Connection.OpenOk())
+        elif isinstance(method, spec.Connection.Close):
+            self.write(frame.Method(0, spec.Connection.CloseOk()).marshal())
+            self.transport.close()  # type: ignore
+        elif isinstance(method, spec.Channel.Open):
+            if self.broker.drop_on_channel_open:
+                self.transport.close()  # type: ignore
+            else:
+                self.send(channel_number, spec.Channel.OpenOk())
+        elif isinstance(method, spec.Channel.Close):
+            self.send(channel_number, spec.Channel.CloseOk())
+        elif isinstance(method, spec.Queue.Declare):
+            self.declare(channel_number, method)
+
+    def declare(self, channel_number: int, method: spec.Queue.Declare) -> None:
+        """Reply to a passive queue declare.
+
+        Args:
+            channel_number: The channel the declare was received on
+            method: The declare method
+        """
+        message_count = self.broker.queues.get(method.queue)
+
+        if message_count is None:
+            self.send(
+                channel_number,
+                spec.Channel.Close(
+                    reply_code=404,
+                    reply_text="NOT_FOUND - no queue '{}'".format(method.queue),
+                    class_id=spec.Queue.Declare.INDEX >> 16,
+                    method_id=spec.Queue.Declare.INDEX & 0xFFFF,
+                ),
+            )
+        else:
+            self.send(
+                channel_number,
+                spec.Queue.DeclareOk(
+                    queue=method.queue, message_count=message_count, consumer_count=1
+                ),
+            )
+
+
+class FakeBroker(object):
+    """Fake broker running on its own event loop in a background thread."""
+
+    def __init__(
+        self,
+        queues: Dict[str, int],
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+    ) -> None:
+        """Create a fake broker holding the given queues.
+
+        Args:
+            queues: Map of queue name to the number of messages on it
+            latency: Seconds to wait before sending each reply
+            host: The interface to listen on
+        """
+        self.queues = queues
+        self.latency = latency
+        self.host = host
+        self.port = 0
+        self.drop_on_channel_open = False
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def start(self) -> "FakeBroker":
+        """Start listening on a free port.
+
+        Returns:
+            The running broker
+        """
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            self.loop.create_server(lambda: FakeBrokerProtocol(self), self.host, 0),
+            self.loop,
+        ).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+
+        return self
+
+    def stop(self) -> None:
+        """Stop the broker and its event loop."""
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def __enter__(self) -> "FakeBroker":
+        """Start the broker on entering the context.
+
+        Returns:
+            The running broker
+        """
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop the broker on leaving the context.
+
+        Args:
+            exc_info: Exception details, if any
+        """
+        self.stop()
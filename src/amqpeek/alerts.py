@@ -0,0 +1,127 @@
+"""Tracking of the alerts already sent, so breaches are not re-notified every cycle."""
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Tuple
+
+
+class AlertState(object):
+    """Table of the active alerts, with when each was last sent.
+
+    An alert is only sent again once it has been active for the re-notify
+    TTL. The table is kept in least recently seen order, so alerts not seen
+    for the TTL are evicted, and it is bounded by dropping the least recently
+    seen alert when full.
+    """
+
+    def __init__(
+        self,
+        renotify_after: float = 3600,
+        max_size: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create an empty AlertState.
+
+        Args:
+            renotify_after: Seconds before an alert still active is sent again
+            max_size: The max number of active alerts tracked
+            clock: Source of the current time
+        """
+        self.renotify_after = renotify_after
+        self.max_size = max_size
+        self.clock = clock
+        self.active: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """Get the number of active alerts tracked.
+
+        Returns:
+            The number of active alerts
+        """
+        return len(self.active)
+
+    def should_send(self, key: Hashable) -> bool:
+        """Record the alert as seen, and whether it should be sent.
+
+        Args:
+            key: Identifies the alert, such as broker, queue and alert type
+
+        Returns:
+            True if the alert is new, or was last sent at least the re-notify
+            TTL ago
+        """
+        now = self.clock()
+        times = self.active.get(key)
+
+        if times is not None:
+            self.active.move_to_end(key)
+            times[1] = now
+
+            if now - times[0] < self.renotify_after:
+                return False
+
+            times[0] = now
+
+            return True
+
+        self.evict(now)
+        self.active[key] = [now, now]
+
+        return True
+
+    def clear(self, key: Hashable) -> bool:
+        """Forget an alert, as what caused it has recovered.
+
+        Args:
+            key: Identifies the alert
+
+        Returns:
+            True if the alert was active, so its recovery should be sent
+        """
+        return self.active.pop(key, None) is not None
+
+    def evict(self, now: float) -> None:
+        """Drop the alerts not seen for the TTL, and make room for a new alert.
+
+        Args:
+            now: The current time
+        """
+        while self.active:
+            key, (_, seen_at) = next(iter(self.active.items()))
+
+            if now - seen_at < self.renotify_after:
+                break
+
+            del self.active[key]
+
+        while len(self.active) >= self.max_size:
+            self.active.popitem(last=False)
+
+    def dump(self) -> List[Tuple[Hashable, float, float]]:
+        """Get the active alerts, to be stored between runs.
+
+        The clock may only be comparable within this process, so the times
+        are given as wall clock times.
+
+        Returns:
+            The key, and when last sent and last seen, of each active alert,
+            least recently seen first
+        """
+        offset = time.time() - self.clock()
+
+        return [
+            (key, sent_at + offset, seen_at + offset)
+            for key, (sent_at, seen_at) in self.active.items()
+        ]
+
+    def restore(self, alerts: List[Tuple[Hashable, float, float]]) -> None:
+        """Restore the active alerts stored by an earlier run.
+
+        Args:
+            alerts: The alerts, as given by dump
+        """
+        offset = time.time() - self.clock()
+
+        for key, sent_at, seen_at in alerts:
+            self.active[key] = [sent_at - offset, seen_at - offset]
+
+        self.evict(self.clock())
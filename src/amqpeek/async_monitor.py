@@ -0,0 +1,323 @@
+"""Concurrent checking of RMQ queues using asyncio."""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.channel import Channel
+from pika.exceptions import AMQPConnectionError, ChannelClosed
+
+from amqpeek.monitor import Connector, Monitor
+from amqpeek.stats import span
+
+DEFAULT_CONCURRENCY = 32
+
+
+class AsyncChannel(object):
+    """Wraps a pika channel so passive declares can be awaited.
+
+    AMQP only allows one synchronous request in flight per channel, so
+    concurrency is achieved by running many of these side by side on the
+    same connection.
+    """
+
+    def __init__(self, channel: Channel) -> None:
+        """Create an AsyncChannel for the given open channel.
+
+        Args:
+            channel: An open channel created by an AsyncioConnection
+        """
+        self.channel = channel
+        self.pending: Optional[asyncio.Future] = None
+        self.channel.add_on_close_callback(self.on_close)
+
+    @classmethod
+    async def open(cls, connection: AsyncioConnection) -> "AsyncChannel":
+        """Open a new channel on the given connection.
+
+        Args:
+            connection: The open connection to the RMQ server
+
+        Returns:
+            The newly opened channel
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        def on_close(channel: Channel, reason: Exception) -> None:
+            # The channel, or the connection under it, was closed before
+            # the channel finished opening
+            if not future.done():
+                future.set_exception(reason)
+
+        channel = connection.channel(on_open_callback=future.set_result)
+        channel.add_on_close_callback(on_close)
+
+        return cls(await future)
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the channel can still be used.
+
+        Returns:
+            True if the channel is open
+        """
+        return bool(self.channel.is_open)
+
+    def on_close(self, channel: Channel, reason: Exception) -> None:
+        """Fail the pending declare when the channel is closed under it.
+
+        Args:
+            channel: The channel that was closed
+            reason: Why the channel was closed
+        """
+        if self.pending is not None and not self.pending.done():
+            self.pending.set_exception(reason)
+
+    async def queue_declare(self, queue_name: str) -> Any:
+        """Passively declare the given queue.
+
+        Args:
+            queue_name: The queue to connect to
+
+        Returns:
+            The declare-ok frame, holding the number of messages amongst
+            other things
+        """
+        self.pending = asyncio.get_running_loop().create_future()
+        self.channel.queue_declare(
+            queue=queue_name, passive=True, callback=self.pending.set_result
+        )
+
+        return await self.pending
+
+    def close(self) -> None:
+        """Close the channel if it is still open."""
+        if self.is_open:
+            self.channel.close()
+
+
+class AsyncioMonitor(Monitor):
+    """Monitor that keeps many passive declares in flight at once."""
+
+    connector: Connector
+
+    def __init__(
+        self,
+        connector: Connector,
+        queue_details: List[tuple],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs: Any,
+    ) -> None:
+        """Creates an AsyncioMonitor with the given parameters.
+
+        Args:
+            connector: The connector object used to create a connection to the
+                RMQ server to be monitored
+            queue_details: The map of the queues to connect to and there limits
+            concurrency: The max number of passive declares in flight at once
+            kwargs: Any other Monitor settings
+        """
+        super().__init__(connector=connector, queue_details=queue_details, **kwargs)
+        self.concurrency = concurrency
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the event loop, which lives as long as any long-lived connection.
+
+        Returns:
+            The event loop used by this monitor
+        """
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+
+        return self.loop
+
+    def check(self) -> None:
+        """Connect to RMQ and check all the monitored queues once."""
+        self.get_loop().run_until_complete(self.check_async())
+
+    def wait(self, seconds: float) -> None:
+        """Wait between checks, running the event loop to service heartbeats.
+
+        Args:
+            seconds: The time to wait
+        """
+        if self.connection is None:
+            super().wait(seconds)
+        else:
+            self.get_loop().run_until_complete(asyncio.sleep(seconds))
+
+    def shutdown(self) -> None:
+        """Close any long-lived connection and the event loop."""
+        if self.connection is not None and self.loop is not None:
+            # Run the close handshake before the loop goes away
+            connection = self.connection
+            self.connection = None
+            self.loop.run_until_complete(self.close(connection))
+
+        super().shutdown()
+
+        if self.loop is not None:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+            self.loop = None
+
+    def connection_alive(self, connection: AsyncioConnection) -> bool:
+        """Whether the given long-lived connection can still be used.
+
+        Args:
+            connection: The connection to check
+
+        Returns:
+            True when the connection is still open
+        """
+        return bool(connection.is_open)
+
+    async def check_async(self) -> None:
+        """Check all the monitored queues using an asyncio connection."""
+        self.history.start_cycle()
+
+        if not self.connection_allowed():
+            return
+
+        try:
+            connection = await self.get_connection_async()
+        except AMQPConnectionError:
+            self.connection_error()
+            return
+
+        self.connected()
+        queue_details = self.get_queue_details()
+
+        try:
+            results = await self.fetch_queues(connection, queue_details)
+        except AMQPConnectionError:
+            self.drop_connection()
+            self.connection_error()
+            return
+        finally:
+            if connection is not self.connection:
+                await self.close(connection)
+
+        self.check_results(results, queue_details)
+
+    async def get_connection_async(self) -> AsyncioConnection:
+        """Get a connection to RMQ, reusing the long-lived one when possible.
+
+        Returns:
+            An open connection to the RMQ server
+        """
+        if self.connection is not None:
+            if self.connection_alive(self.connection):
+                return self.reuse_connection()
+
+            logging.info("Connection to RMQ lost, reconnecting")
+            self.drop_connection()
+
+        start = time.monotonic()
+
+        with span(self.stats, "connect"):
+            connection = await self.connect()
+        self.connection_opened(connection, time.monotonic() - start)
+
+        return connection
+
+    async def connect(self) -> AsyncioConnection:
+        """Open an asyncio connection to RMQ.
+
+        An AMQPConnectionError is raised when the connection cannot be made.
+
+        Returns:
+            The open connection
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_open_error(connection: AsyncioConnection, error: Exception) -> None:
+            if not isinstance(error, AMQPConnectionError):
+                error = AMQPConnectionError(error)
+
+            future.set_exception(error)
+
+        AsyncioConnection(
+            parameters=self.connector.connection_parameters(),
+            on_open_callback=future.set_result,
+            on_open_error_callback=on_open_error,
+            custom_ioloop=loop,
+        )
+
+        return await future
+
+    async def close(self, connection: AsyncioConnection) -> None:
+        """Close the given connection and wait for the close to complete.
+
+        Args:
+            connection: The connection to close
+        """
+        if connection.is_closed:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        connection.add_on_close_callback(lambda conn, reason: future.set_result(None))
+
+        if not connection.is_closing:
+            connection.close()
+
+        await future
+
+    async def fetch_queues(
+        self, connection: AsyncioConnection, queue_details: List[tuple]
+    ) -> Dict[str, Any]:
+        """Passively declare all the given queues, concurrently.
+
+        Args:
+            connection: The open connection to the RMQ server
+            queue_details: A map of the queues and thier specified limits
+
+        Returns:
+            A map of queue name to declare-ok frame, or None when the queue
+            has not been declared
+        """
+        results: Dict[str, Any] = {}
+        queue_names = iter([queue_name for queue_name, _ in queue_details])
+        workers = min(self.concurrency, len(queue_details))
+
+        await asyncio.gather(
+            *(
+                self.declare_worker(connection, queue_names, results)
+                for _ in range(workers)
+            )
+        )
+
+        return results
+
+    async def declare_worker(
+        self, connection: AsyncioConnection, queue_names: Any, results: Dict[str, Any]
+    ) -> None:
+        """Declare queues from the shared iterator, one at a time, on one channel.
+
+        A missing queue closes the channel, so a fresh one is opened before the
+        next declare.
+
+        Args:
+            connection: The open connection to the RMQ server
+            queue_names: Iterator of queue names shared between all workers
+            results: The map to record the declare results in
+        """
+        channel: Optional[AsyncChannel] = None
+
+        try:
+            for queue_name in queue_names:
+                if channel is None or not channel.is_open:
+                    with span(self.stats, "get_channel"):
+                        channel = await AsyncChannel.open(connection)
+
+                try:
+                    with span(self.stats, "connect_to_queue", self.label(queue_name)):
+                        results[queue_name] = await channel.queue_declare(queue_name)
+                except ChannelClosed:
+                    results[queue_name] = None
+        finally:
+            if channel is not None:
+                channel.close()
@@ -10,8 +10,48 @@ rabbit_connection: {
   host: localhost,
   port: 5672,
   vhost: /,
+  heartbeat: 60,
 }
 
+# RMQ management API details, used by the management engine (see monitor
+# below) which fetches every queue in a few requests rather than checking
+# them one at a time
+management: {
+  host: localhost,
+  port: 15672,
+  user: guest,
+  passwd: guest,
+  vhost: /,
+  page_size: 500
+}
+
+# Backing off from RMQ while it is down (optional). Without it, every test
+# tries to connect and a connection error is sent each time. With it, a
+# failed connection is sent once, and RMQ is not connected to again for
+# base_delay seconds, then twice as long after each further failure
+# (multiplier), up to max_delay seconds. A random fraction of up to jitter
+# is taken off each delay, so several monitors do not all reconnect at
+# once. One "Recovered" notification is sent once a connection succeeds
+#
+# reconnect: {
+#   base_delay: 5,
+#   max_delay: 300,
+#   multiplier: 2,
+#   jitter: 0.5
+# }
+
+# To monitor several brokers from one process, rabbit_connection can
+# instead be a list of connections. Each may have its own name (used to tag
+# its notifications), queues, queue_limits, management and reconnect
+# settings; any not given are taken from the rest of this file. The
+# brokers are checked in parallel (see workers under monitor below)
+#
+# rabbit_connection:
+#   - {name: eu-1, host: rmq-eu-1, port: 5672, vhost: /, user: guest,
+#      passwd: guest, queues: {orders: {limit: 100}}}
+#   - {name: us-1, host: rmq-us-1, port: 5672, vhost: /, user: guest,
+#      passwd: guest}
+
 # Queues to monitor.
 #
 # Define a queue you wish to monitor and the warning limit of that queue
@@ -19,6 +59,13 @@ rabbit_connection: {
 #
 # limit:
 # max items in queue before notification is sent
+#
+# interval:
+# optional minutes between tests of this queue, when running with an
+# interval (see --interval). Queues without one are tested every interval.
+# Tests are kept to a fixed schedule, however long each takes, and queues
+# due at the same time are tested together on one connection. Only for
+# queues given by exact name, not patterns
 queues:
   my_queue: {
       'limit': 10
@@ -44,14 +91,167 @@ queues:
 #
 # value:
 # list of queue names to apply the limit to
+#
+# Queue names in queues and queue_limits may also be patterns, selecting
+# every matching queue on RMQ: globs such as 'orders.tenant-*', or
+# regular expressions starting with 're:' such as 're:orders\\.tenant-\\d+'.
+# Queues are listed using the management API settings above. Where a queue
+# matches several patterns the lowest limit is used
 queue_limits:
   10: ['my_queue', 'my_other_queue']
   100: ['my_other_other_queue']
 
+# Monitor settings.
+#
+# engine:
+# how the queues are checked. "blocking" checks one queue at a time,
+# "asyncio" keeps many checks in flight at once, which is much faster
+# with a large number of queues or a slow link to RMQ, "management"
+# fetches all the queues in bulk from the management API, and "sharded"
+# splits the queues between several processes, each checking its share as
+# the asyncio engine does on its own connection
+#
+# concurrency:
+# max number of queue checks in flight at once (asyncio and sharded
+# engines only, in each process when sharded)
+#
+# processes:
+# number of processes checking the queues (sharded engine only), defaults
+# to the number of CPUs
+#
+# persistent:
+# keep the connection to RMQ open between tests when running with an
+# interval, rather than reconnecting for every test. Heartbeats (see
+# rabbit_connection above) keep the connection alive, and it is only
+# re-established when lost
+#
+# workers:
+# max number of brokers checked at once when monitoring several brokers,
+# defaults to all of them
+#
+# digest:
+# collect the alerts of each test, including connection errors and missing
+# queues, and send them grouped as one message per notifier at the end of
+# the test
+#
+# renotify_after:
+# minutes before an alert still active, such as a queue staying over its
+# limit, is sent again. Once set, alerts are only sent when first raised
+# and a "Recovered" notification is sent when they clear. Without it every
+# alert is sent on every test
+#
+# alert_state_size:
+# max number of active alerts remembered, the least recently seen is
+# forgotten first. Defaults to 10000
+#
+# discovery_ttl:
+# seconds to reuse the list of queues on RMQ before listing them again,
+# when queues are selected by pattern. Defaults to 300
+#
+# history_size:
+# number of tests of queue depths kept for each queue, as history for
+# alerting rules. Each takes 4 bytes per queue. Defaults to 1440, a day
+# of tests with an interval of one minute
+#
+# time_to_limit:
+# minutes before a queue is projected to reach its limit at which a "Queue
+# Growth Warning" is sent, such as "orders will hit its limit of 10000 in
+# ~4 min". The growth of each queue is fitted to its last growth_window
+# tests (10 by default, and no more than history_size). Without it queues
+# only alert once over their limit
+#
+# drain_backlog:
+# messages on a queue with consumers at which a "Queue Drain Warning" is
+# sent when the queue is not getting shorter, as its consumers are stuck or
+# too few to keep up. How fast each queue is drained and filled is worked
+# out from the changes in its depth over its last drain_window tests (10 by
+# default, and no more than history_size). Without it the consumers of the
+# queues are not read
+#
+# stats:
+# time each phase of the tests (connecting, opening channels, checking
+# each queue and notifying) and show the percentiles of each, and the
+# slowest queues of the last test, on exit. Also set with --stats
+#
+# stats_interval:
+# minutes between logging the timings when stats is set, defaults to 1
+#
+# min_interval, max_interval:
+# with an interval, adapt the minutes between tests to how close the
+# queues are to their limits. While every queue is projected, at its
+# current growth, to stay under half its limit, tests are max_interval
+# apart, and once any queue is projected to reach its limit they are
+# min_interval apart. Either defaults to the interval. Also set with
+# --min_interval and --max_interval. Queues with their own interval are
+# not adapted
+#
+# state:
+# keep the history of queue depths and the active alerts in a file under
+# $XDG_STATE_HOME/amqpeek (~/.local/state/amqpeek by default), so runs
+# from cron carry on from the last run: alerts still active are not sent
+# again until renotify_after, recoveries are sent, and the history rules
+# see the depths of earlier runs. Runs with the same config take turns.
+# Also set with --state
+monitor: {
+  engine: blocking,
+  concurrency: 32,
+  persistent: false,
+  digest: false,
+  renotify_after: 60
+}
+
+# Metrics.
+#
+# Serve Prometheus metrics at http://host:port/metrics: the depth, limit
+# and fraction of its limit of each queue, and the duration, count and
+# connection failures of the tests of each broker. The metrics are those
+# of the last test, so scraping them does not touch RMQ. An empty host
+# listens on all addresses. Remove this section to not serve metrics
+#
+# metrics: {
+#   host: '',
+#   port: 9102
+# }
+
+# Notification queue.
+#
+# Notifications are sent from background threads, one per notifier, so a
+# slow notification channel does not hold up the checks.
+#
+# max_size:
+# max notifications waiting to be sent by each notifier
+#
+# overflow:
+# what to do when a notifier's queue is full. "drop_oldest" drops the
+# oldest notification waiting, "coalesce" merges the new notification into
+# one waiting with the same subject
+#
+# flush_timeout:
+# seconds to wait on exit for the notifications still waiting to be sent
+notification_queue: {
+  max_size: 100,
+  overflow: drop_oldest,
+  flush_timeout: 30
+}
+
 # Active notifiers:
 #
 # Currently supported notifers are listed below with example
 # settings
+#
+# timeout:
+# seconds each notifier waits for its channel to respond, defaults to 10
+#
+# The SMTP notifier connects when it first sends, and reuses the session
+# for the emails after it, checking a session left idle with a NOOP first.
+# port 0 uses the standard SMTP port, starttls upgrades the connection to
+# TLS before logging in, and retries is the number of times sending is
+# retried on a new connection when the connection fails
+#
+# The Slack notifier reuses one HTTP session, and sends at most rate
+# messages a second, after an initial burst. When Slack rate limits a
+# message anyway, it is retried up to retries times, once the time Slack
+# asks to wait has passed
 notifiers:
   smtp: {
       host: localhost,
@@ -59,12 +259,18 @@ notifiers:
       passwd: ~,
       from_addr: youremail@example.com,
       to_addr: [theiremail@example.com],
-      subject: 'AMQPeek - RMQ Monitor'
+      subject: 'AMQPeek - RMQ Monitor',
+      port: 0,
+      starttls: false,
+      retries: 2
   }
 
   slack: {
       api_key: your-api-key,
       username: ampeek,
-      channel: '#general'
+      channel: '#general',
+      rate: 1,
+      burst: 5,
+      retries: 3
   }
 """
@@ -0,0 +1,113 @@
+"""Backing off from a broker that cannot be connected to, until it recovers."""
+import random
+import time
+from typing import Callable, Optional
+
+# Connections are attempted as normal
+CLOSED = "closed"
+
+# Connections are not attempted until the retry time
+OPEN = "open"
+
+# A single connection is attempted, to find out if the broker has recovered
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker(object):
+    """Circuit breaker around the connections to a broker.
+
+    A failed connection opens the breaker, and no connection is attempted
+    until a delay has passed. The breaker is then half-open, and the next
+    connection attempted probes the broker: when it succeeds the breaker is
+    closed again, and when it fails the breaker is opened for longer. The
+    delay grows by the multiplier with each failure in a row, up to the max
+    delay, and is shortened by a random fraction of up to the jitter, so
+    monitors that lost the broker together do not all reconnect at once.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 5.0,
+        max_delay: float = 300.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        """Create a closed CircuitBreaker.
+
+        Args:
+            base_delay: Seconds before the first probe after a failure
+            max_delay: The max seconds between probes
+            multiplier: Growth of the delay with each failure in a row
+            jitter: The max fraction of each delay taken off at random
+            clock: Source of the current time
+            rng: Source of random numbers between 0 and 1
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a connection may be attempted now.
+
+        An open breaker turns half-open once its delay has passed.
+
+        Returns:
+            True unless the breaker is open
+        """
+        if self.state == OPEN and self.clock() >= self.retry_at:  # type: ignore
+            self.state = HALF_OPEN
+
+        return self.state != OPEN
+
+    def failure(self) -> bool:
+        """Record a failed connection, opening the breaker.
+
+        Returns:
+            True if the breaker was closed, so the broker has just gone down
+        """
+        was_closed = self.state == CLOSED
+        # The exponent is capped, so a long outage does not overflow
+        delay = min(
+            self.base_delay * self.multiplier ** min(self.failures, 64),
+            self.max_delay,
+        )
+
+        self.failures += 1
+        self.state = OPEN
+        self.retry_at = self.clock() + delay * (1 - self.jitter * self.rng())
+
+        return was_closed
+
+    def success(self) -> bool:
+        """Record a successful connection, closing the breaker.
+
+        Returns:
+            True if the breaker was not closed, so the broker has just
+            recovered
+        """
+        recovered = self.state != CLOSED
+
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = None
+
+        return recovered
+
+    def retry_in(self) -> float:
+        """Get the time left until the next probe.
+
+        Returns:
+            Seconds until the breaker turns half-open, 0 when not open
+        """
+        if self.state != OPEN:
+            return 0.0
+
+        return max(self.retry_at - self.clock(), 0.0)  # type: ignore
@@ -2,16 +2,64 @@
 
 import logging
 import os
+import re
 import sys
-from typing import List
+from typing import Dict, List, Optional, Tuple, Type, TYPE_CHECKING, Union
 
 import click
-import yaml
 
+from .alerts import AlertState
 from .base_config import BASE_CONFIG, DEFAULT_LOCATION
+from .breaker import CircuitBreaker
+from .config_cache import ConfigCache, default_cache_dir
+from .discovery import is_pattern, QueueDiscovery, QueueMatcher
 from .exceptions import ConfigExistsError
-from .monitor import Connector, Monitor
-from .notifier import create_notifiers
+from .history import DEFAULT_HISTORY_SIZE
+from .loader import load
+from .notifier import create_notifiers, QueuedNotifier
+from .rules import DrainRule, GrowthRule
+from .schedule import AdaptiveInterval
+from .stats import Stats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .group import MonitorGroup
+    from .metrics import MetricsExporter
+    from .monitor import BrokerConnector, Monitor
+    from .state import StateStore
+
+DEFAULT_ENGINE = "blocking"
+
+# Engines are imported only when used, so a run only pays for the clients of
+# the engine it checks with
+ENGINE_MAP = {
+    "blocking": "amqpeek.monitor:Monitor",
+    "asyncio": "amqpeek.async_monitor:AsyncioMonitor",
+    "management": "amqpeek.management:ManagementMonitor",
+    "sharded": "amqpeek.sharded:ShardedMonitor",
+}
+
+# Monitor settings that must be whole numbers of at least 1, and their names
+# in error messages
+POSITIVE_INT_SETTINGS = (
+    ("concurrency", "Concurrency"),
+    ("processes", "Processes"),
+    ("workers", "Workers"),
+    ("alert_state_size", "Alert state size"),
+    ("history_size", "History size"),
+    ("growth_window", "Growth window"),
+    ("drain_window", "Drain window"),
+    ("drain_backlog", "Drain backlog"),
+)
+
+# Monitor settings giving a number of samples from the history, and their
+# names in error messages
+WINDOW_SETTINGS = (
+    ("growth_window", "Growth window"),
+    ("drain_window", "Drain window"),
+)
+
+# Settings of the reconnect section of a broker
+RECONNECT_SETTINGS = ("base_delay", "max_delay", "multiplier", "jitter")
 
 
 def gen_config_file() -> None:
@@ -27,17 +75,46 @@ def gen_config_file() -> None:
         cf.write(BASE_CONFIG)
 
 
-def read_config(config_file_name: str) -> dict:
+def read_config(config_file_name: str, cache: Optional[ConfigCache] = None) -> dict:
     """Read the AMQPeek config from the given file.
 
     Args:
         config_file_name: The config file to read from
+        cache: The parsed configs, used instead of parsing the file again
+            when it has not changed. None to always parse the file
 
     Returns:
         A map containing all the config data
     """
-    with open(config_file_name, "r") as config_file:
-        return yaml.load(config_file, Loader=yaml.SafeLoader)
+    with open(config_file_name, "rb") as config_file:
+        content = config_file.read()
+        mtime_ns = os.fstat(config_file.fileno()).st_mtime_ns
+
+    if cache is None:
+        return parse_config(content)
+
+    key = cache.key(config_file_name, content, mtime_ns)
+    app_config = cache.load(key)
+
+    if app_config is None:
+        app_config = parse_config(content)
+        cache.save(key, app_config)
+
+    return app_config
+
+
+def parse_config(content: bytes) -> dict:
+    """Parse the YAML of a config file, with the C parser when available.
+
+    Args:
+        content: The content of the config file
+
+    Returns:
+        A map containing all the config data
+    """
+    import yaml
+
+    return yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
 
 def configure_logging(verbosity: int) -> None:
@@ -77,6 +154,681 @@ def build_queue_data(app_config: dict) -> List[tuple]:
     return list(set(queue_config))
 
 
+def build_queue_intervals(app_config: dict) -> Dict[str, float]:
+    """Creates a map of the queues checked at their own interval.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        Map of queue name to the time between its tests (minutes)
+    """
+    return {
+        queue_name: dets["interval"]
+        for queue_name, dets in (app_config.get("queues") or {}).items()
+        if dets.get("interval") is not None
+    }
+
+
+def build_broker_configs(app_config: dict) -> List[dict]:
+    """Split the config into the config of each broker to monitor.
+
+    rabbit_connection may be a list of connections, each with its own
+    name, queues, queue_limits, management and reconnect settings. Those not
+    given for a connection are taken from the top level of the config.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        A config map for each broker
+    """
+    connections = app_config.get("rabbit_connection")
+
+    if not isinstance(connections, list):
+        return [app_config]
+
+    broker_configs = []
+
+    for connection in connections:
+        connection = dict(connection)
+        broker_config = dict(app_config)
+
+        for key in ("queues", "queue_limits", "management", "reconnect"):
+            if key in connection:
+                broker_config[key] = connection.pop(key)
+
+        broker_config["name"] = connection.pop("name", connection.get("host"))
+        broker_config["rabbit_connection"] = connection
+        broker_configs.append(broker_config)
+
+    return broker_configs
+
+
+def load_engine(engine: str) -> Type["Monitor"]:
+    """Import the monitor class of the given engine.
+
+    Args:
+        engine: The engine used to check the queues
+
+    Returns:
+        The class of the monitors checking with the engine
+    """
+    return load(ENGINE_MAP[engine])  # type: ignore
+
+
+def create_connector(engine: str, app_config: dict) -> "BrokerConnector":
+    """Create the connector used by the given engine.
+
+    Args:
+        engine: The engine used to check the queues
+        app_config: Map containing the config
+
+    Returns:
+        A ManagementConnector for the management engine, otherwise a Connector
+    """
+    if engine == "management":
+        from .management import ManagementConnector
+
+        return ManagementConnector(**app_config["management"])
+
+    from .monitor import Connector
+
+    return Connector(**app_config["rabbit_connection"])
+
+
+def create_breaker(broker_config: dict) -> Optional[CircuitBreaker]:
+    """Create the circuit breaker backing off from a broker while it is down.
+
+    Args:
+        broker_config: The config of the broker
+
+    Returns:
+        The circuit breaker, None when there are no reconnect settings
+    """
+    reconnect = broker_config.get("reconnect")
+
+    if reconnect is None:
+        return None
+
+    return CircuitBreaker(**reconnect)
+
+
+def create_discovery(settings: dict, broker_config: dict) -> Optional[QueueDiscovery]:
+    """Create the discovery of the queues selected by pattern, if there are any.
+
+    Args:
+        settings: The monitor settings for this session
+        broker_config: The config of the broker
+
+    Returns:
+        The discovery of the broker's queues, None when every queue is
+        given by exact name
+    """
+    queue_details = build_queue_data(broker_config)
+
+    if not any(is_pattern(queue_name) for queue_name, _ in queue_details):
+        return None
+
+    from .management import ManagementConnector
+
+    discovery_kwargs = {}
+
+    if "discovery_ttl" in settings:
+        discovery_kwargs["ttl"] = settings["discovery_ttl"]
+
+    return QueueDiscovery(
+        ManagementConnector(**broker_config["management"]),
+        QueueMatcher(queue_details),
+        **discovery_kwargs,
+    )
+
+
+def create_alert_state(settings: dict) -> Optional[AlertState]:
+    """Create the table of alerts sent, when alerts are not sent every cycle.
+
+    Args:
+        settings: The monitor settings for this session
+
+    Returns:
+        The alert state, None when every alert is to be sent
+    """
+    if settings.get("renotify_after") is None:
+        return None
+
+    alert_state_kwargs = {"renotify_after": settings["renotify_after"] * 60}
+
+    if "alert_state_size" in settings:
+        alert_state_kwargs["max_size"] = settings["alert_state_size"]
+
+    return AlertState(**alert_state_kwargs)
+
+
+def create_growth_rule(settings: dict) -> Optional[GrowthRule]:
+    """Create the rule alerting on queues projected to reach their limit soon.
+
+    Args:
+        settings: The monitor settings for this session
+
+    Returns:
+        The growth rule, None when queues only alert once over their limit
+    """
+    if settings.get("time_to_limit") is None:
+        return None
+
+    growth_rule_kwargs = {"time_to_limit": settings["time_to_limit"] * 60}
+
+    if "growth_window" in settings:
+        growth_rule_kwargs["window"] = settings["growth_window"]
+
+    return GrowthRule(**growth_rule_kwargs)
+
+
+def create_drain_rule(settings: dict) -> Optional[DrainRule]:
+    """Create the rule alerting on queues with consumers not draining their backlog.
+
+    Args:
+        settings: The monitor settings for this session
+
+    Returns:
+        The drain rule, None when the consumers of the queues are not read
+    """
+    if settings.get("drain_backlog") is None:
+        return None
+
+    drain_rule_kwargs = {"backlog": settings["drain_backlog"]}
+
+    if "drain_window" in settings:
+        drain_rule_kwargs["window"] = settings["drain_window"]
+
+    return DrainRule(**drain_rule_kwargs)
+
+
+def start_metrics(app_config: dict) -> Optional["MetricsExporter"]:
+    """Start serving the metrics, when enabled in the config.
+
+    Exits when the metrics cannot be served, such as when the port is in use.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        The running exporter, None when metrics are not enabled
+    """
+    metrics_config = app_config.get("metrics")
+
+    if not metrics_config:
+        return None
+
+    from .metrics import MetricsExporter
+
+    metrics = MetricsExporter(**metrics_config)
+
+    try:
+        metrics.start()
+    except OSError as error:
+        click.echo(
+            click.style(
+                "Unable to serve metrics on port {}: {}".format(metrics.port, error),
+                fg="red",
+            )
+        )
+
+        sys.exit(0)
+
+    return metrics
+
+
+def create_stats(settings: dict) -> Optional[Stats]:
+    """Create the timings of the phases of each test, when enabled.
+
+    Args:
+        settings: The monitor settings for this session
+
+    Returns:
+        The stats, None when the tests are not timed
+    """
+    if not settings.get("stats"):
+        return None
+
+    return Stats(log_interval=settings.get("stats_interval", 1) * 60)
+
+
+def create_adaptive_interval(
+    settings: dict, interval: Optional[float]
+) -> Optional[AdaptiveInterval]:
+    """Create the policy adapting the interval to how close queues are to their limits.
+
+    Args:
+        settings: The monitor settings for this session
+        interval: The time to wait between tests
+
+    Returns:
+        The adaptive interval, None when always waiting the interval
+    """
+    if interval is None or (
+        settings.get("min_interval") is None and settings.get("max_interval") is None
+    ):
+        return None
+
+    min_setting: Optional[float] = settings.get("min_interval")
+    max_setting: Optional[float] = settings.get("max_interval")
+    # The unset bound defaults to the interval, within the one set
+    min_interval = interval if min_setting is None else min_setting
+    max_interval = interval if max_setting is None else max_setting
+
+    if min_setting is None:
+        min_interval = min(interval, max_interval)
+
+    if max_setting is None:
+        max_interval = max(interval, min_interval)
+
+    return AdaptiveInterval(min_period=min_interval * 60, max_period=max_interval * 60)
+
+
+def create_state_store(
+    settings: dict, config_path: str, monitors: List["Monitor"]
+) -> Optional["StateStore"]:
+    """Open the state kept between runs with the config, when enabled.
+
+    The state stored by the last run is restored into the monitors.
+
+    Args:
+        settings: The monitor settings for this session
+        config_path: The config file used for this session
+        monitors: The monitor of each broker
+
+    Returns:
+        The locked state store, None when the state is not kept or is in use
+    """
+    if not settings.get("state"):
+        return None
+
+    from .state import default_state_dir, StateStore
+
+    state_store = StateStore(default_state_dir(), config_path)
+
+    if not state_store.lock():
+        return None
+
+    state_store.load(monitors)
+
+    return state_store
+
+
+def create_monitor(
+    settings: dict,
+    broker_config: dict,
+    interval: Optional[float],
+    max_tests: Optional[int],
+    metrics: Optional["MetricsExporter"] = None,
+    stats: Optional[Stats] = None,
+) -> "Monitor":
+    """Create the monitor of one broker.
+
+    Args:
+        settings: The monitor settings for this session
+        broker_config: The config of the broker
+        interval: The time to wait between tests
+        max_tests: The max tests to perform in this session
+        metrics: Exports the results of each test, None to not export them
+        stats: Times the phases of each test, None to not time them
+
+    Returns:
+        A monitor using the engine given in the settings
+    """
+    monitor_kwargs = {
+        "persistent": settings.get("persistent", False),
+        "digest": settings.get("digest", False),
+        "alert_state": create_alert_state(settings),
+        "growth_rule": create_growth_rule(settings),
+        "drain_rule": create_drain_rule(settings),
+        "metrics": metrics,
+        "stats": stats,
+        "name": broker_config.get("name"),
+        "discovery": create_discovery(settings, broker_config),
+        "breaker": create_breaker(broker_config),
+    }
+
+    if "history_size" in settings:
+        monitor_kwargs["history_size"] = settings["history_size"]
+
+    if settings["engine"] in ("asyncio", "sharded") and "concurrency" in settings:
+        monitor_kwargs["concurrency"] = settings["concurrency"]
+
+    if settings["engine"] == "sharded" and "processes" in settings:
+        monitor_kwargs["processes"] = settings["processes"]
+
+    return load_engine(settings["engine"])(
+        connector=create_connector(settings["engine"], broker_config),
+        queue_details=build_queue_data(broker_config),
+        interval=interval,
+        intervals=build_queue_intervals(broker_config),
+        adaptive=create_adaptive_interval(settings, interval),
+        max_connections=max_tests,
+        **monitor_kwargs,
+    )
+
+
+def create_monitors(
+    settings: dict,
+    app_config: dict,
+    interval: Optional[float],
+    max_tests: Optional[int],
+    metrics: Optional["MetricsExporter"] = None,
+    stats: Optional[Stats] = None,
+) -> Tuple[Union["Monitor", "MonitorGroup"], List["Monitor"]]:
+    """Create the monitor of each broker, grouped when given a list of brokers.
+
+    Args:
+        settings: The monitor settings for this session
+        app_config: Map containing the config
+        interval: The time to wait between tests
+        max_tests: The max tests to perform in this session
+        metrics: Exports the results of each test, None to not export them
+        stats: Times the phases of each test, None to not time them
+
+    Returns:
+        The monitor to run, and the monitor of each broker
+    """
+    monitors = [
+        create_monitor(settings, broker_config, interval, max_tests, metrics, stats)
+        for broker_config in build_broker_configs(app_config)
+    ]
+
+    if not isinstance(app_config["rabbit_connection"], list):
+        return monitors[0], monitors
+
+    from .group import MonitorGroup
+
+    group = MonitorGroup(
+        monitors,
+        interval=interval,
+        max_connections=max_tests,
+        workers=settings.get("workers"),
+        digest=settings.get("digest", False),
+        stats=stats,
+    )
+
+    return group, monitors
+
+
+def create_queued_notifiers(
+    notifier_data: dict, queue_settings: dict, stats: Optional[Stats] = None
+) -> Dict[str, QueuedNotifier]:
+    """Create the notifiers in the given map, each sending from its own thread.
+
+    Notifications are sent from background threads, so slow notification
+    channels do not hold up the checks.
+
+    Args:
+        notifier_data: Map of the required notifiers
+        queue_settings: The settings of the queue of each notifier
+        stats: Times sending each notification, None to not time it
+
+    Returns:
+        Map of notifier type to the notifier
+    """
+    notifiers = create_notifiers(notifier_data)
+
+    return {
+        notifier_type: QueuedNotifier(notifiers[index], stats=stats, **queue_settings)
+        for index, notifier_type in enumerate(notifier_data or {})
+    }
+
+
+def is_positive_int(value: object) -> bool:
+    """Check the given config value is a whole number of at least 1.
+
+    Args:
+        value: The value to check
+
+    Returns:
+        True if the value is a positive integer
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def is_number(value: object) -> bool:
+    """Check the given config value is a number.
+
+    Args:
+        value: The value to check
+
+    Returns:
+        True if the value is an integer or float
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_monitor_settings(settings: dict, app_config: dict) -> Optional[str]:
+    """Check the monitor settings can be used to create a monitor.
+
+    Args:
+        settings: The monitor settings for this session
+        app_config: Map containing the config
+
+    Returns:
+        A description of the problem, None when the settings are valid
+    """
+    if settings["engine"] not in ENGINE_MAP:
+        return 'Unknown engine "{}" in configuration file'.format(settings["engine"])
+
+    for setting, label in POSITIVE_INT_SETTINGS:
+        if setting in settings and not is_positive_int(settings[setting]):
+            return (
+                "{} in configuration file must be a whole number of at least 1"
+            ).format(label)
+
+    for setting, label in WINDOW_SETTINGS:
+        if not 2 <= settings.get(setting, 2) <= settings.get(
+            "history_size", DEFAULT_HISTORY_SIZE
+        ):
+            return (
+                "{} in configuration file must be at least 2 "
+                "and no more than the history size"
+            ).format(label)
+
+    if settings["engine"] == "management" and not all(
+        broker_config.get("management")
+        for broker_config in build_broker_configs(app_config)
+    ):
+        return (
+            "The management engine requires management settings "
+            "in the configuration file"
+        )
+
+    overflow = (app_config.get("notification_queue") or {}).get("overflow")
+
+    if overflow is not None and overflow not in QueuedNotifier.OVERFLOW_POLICIES:
+        return 'Unknown overflow policy "{}" in configuration file'.format(overflow)
+
+    return (
+        validate_adaptive_intervals(settings)
+        or validate_queue_patterns(app_config)
+        or validate_queue_intervals(app_config)
+        or validate_reconnect(app_config)
+    )
+
+
+def validate_adaptive_intervals(settings: dict) -> Optional[str]:
+    """Check the shortest and longest intervals of the adaptive interval.
+
+    Args:
+        settings: The monitor settings for this session
+
+    Returns:
+        A description of the problem, None when the intervals are valid
+    """
+    for setting, label in (("min_interval", "Min"), ("max_interval", "Max")):
+        value = settings.get(setting)
+
+        if value is not None and (
+            not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0
+        ):
+            return "{} interval in configuration file must be a number above 0".format(
+                label
+            )
+
+    if settings.get("min_interval", 0) > settings.get("max_interval", float("inf")):
+        return "Min interval in configuration file must not be above the max interval"
+
+    return None
+
+
+def validate_queue_patterns(app_config: dict) -> Optional[str]:
+    """Check the queue patterns of every broker can be resolved.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        A description of the problem, None when the patterns are valid
+    """
+    for broker_config in build_broker_configs(app_config):
+        patterns = [
+            queue_name
+            for queue_name, _ in build_queue_data(broker_config)
+            if is_pattern(queue_name)
+        ]
+
+        if patterns and not broker_config.get("management"):
+            return (
+                "Queue patterns require management settings "
+                "in the configuration file"
+            )
+
+        for pattern in patterns:
+            try:
+                QueueMatcher([(pattern, 0)])
+            except re.error as error:
+                return 'Invalid queue pattern "{}" in configuration file: {}'.format(
+                    pattern, error
+                )
+
+    return None
+
+
+def validate_queue_intervals(app_config: dict) -> Optional[str]:
+    """Check the queues checked at their own interval can be scheduled.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        A description of the problem, None when the intervals are valid
+    """
+    for broker_config in build_broker_configs(app_config):
+        for queue_name, interval in build_queue_intervals(broker_config).items():
+            if is_pattern(queue_name):
+                return (
+                    'Queue pattern "{}" in configuration file '
+                    "cannot have its own interval"
+                ).format(queue_name)
+
+            if (
+                not isinstance(interval, (int, float))
+                or isinstance(interval, bool)
+                or interval <= 0
+            ):
+                return (
+                    'Interval of queue "{}" in configuration file '
+                    "must be a number above 0"
+                ).format(queue_name)
+
+    return None
+
+
+def validate_reconnect(app_config: dict) -> Optional[str]:
+    """Check the reconnect settings of every broker.
+
+    Args:
+        app_config: Map containing the config
+
+    Returns:
+        A description of the problem, None when the settings are valid
+    """
+    for broker_config in build_broker_configs(app_config):
+        reconnect = broker_config.get("reconnect")
+
+        if reconnect is None:
+            continue
+
+        if not isinstance(reconnect, dict):
+            return "Reconnect in configuration file must be a map of settings"
+
+        error = validate_reconnect_settings(reconnect)
+
+        if error is not None:
+            return error
+
+    return None
+
+
+def validate_reconnect_settings(reconnect: dict) -> Optional[str]:
+    """Check the reconnect settings of one broker.
+
+    Args:
+        reconnect: The reconnect section of the broker
+
+    Returns:
+        A description of the problem, None when the settings are valid
+    """
+    for setting in reconnect:
+        if setting not in RECONNECT_SETTINGS:
+            return 'Unknown reconnect setting "{}" in configuration file'.format(
+                setting
+            )
+
+    for setting in ("base_delay", "max_delay"):
+        value = reconnect.get(setting, 1)
+
+        if not is_number(value) or value <= 0:
+            return (
+                "Reconnect {} in configuration file must be a number above 0"
+            ).format(setting)
+
+    multiplier = reconnect.get("multiplier", 1)
+
+    if not is_number(multiplier) or multiplier < 1:
+        return (
+            "Reconnect multiplier in configuration file must be a number "
+            "of at least 1"
+        )
+
+    jitter = reconnect.get("jitter", 0)
+
+    if not is_number(jitter) or not 0 <= jitter <= 1:
+        return "Reconnect jitter in configuration file must be from 0 to 1"
+
+    if reconnect.get("base_delay", 0) > reconnect.get("max_delay", float("inf")):
+        return (
+            "Reconnect base_delay in configuration file must not be above "
+            "the max_delay"
+        )
+
+    return None
+
+
+def build_monitor_settings(app_config: dict, **overrides: Optional[object]) -> dict:
+    """Merge the monitor settings from the config with any given on the command line.
+
+    Args:
+        app_config: Map containing the config
+        overrides: Settings given on the command line, None when not given
+
+    Returns:
+        A map of the monitor settings to use for this session
+    """
+    settings = dict(app_config.get("monitor") or {})
+    settings.update(
+        {name: value for name, value in overrides.items() if value is not None}
+    )
+    settings.setdefault("engine", DEFAULT_ENGINE)
+
+    return settings
+
+
 @click.command()
 @click.option(
     "--config",
@@ -108,8 +860,82 @@ def build_queue_data(app_config: dict) -> List[tuple]:
     is_flag=True,
     help="Create a basic configuration file and place it in your current directory",
 )
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(sorted(ENGINE_MAP)),
+    default=None,
+    help=(
+        "Engine used to check the queues (defaults to blocking). "
+        "management fetches all queues in bulk from the management HTTP API, "
+        "sharded splits the queues between several processes"
+    ),
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help=(
+        "Maximum number of queue checks in flight at once "
+        "(asyncio and sharded engines only, per process when sharded)"
+    ),
+)
+@click.option(
+    "--processes",
+    type=click.IntRange(min=1),
+    default=None,
+    help=(
+        "Number of processes checking shards of the queues "
+        "(sharded engine only, defaults to the number of CPUs)"
+    ),
+)
+@click.option(
+    "--persistent/--no-persistent",
+    default=None,
+    help="Keep the connection to RMQ open between tests (interval mode)",
+)
+@click.option(
+    "--digest/--no-digest",
+    default=None,
+    help="Send the alerts of each test as one message per notifier",
+)
+@click.option(
+    "--stats/--no-stats",
+    default=None,
+    help="Time each phase of the tests, logging and showing the timings on exit",
+)
+@click.option(
+    "--min_interval",
+    type=float,
+    default=None,
+    help="Shortest time between tests when queues near their limits (minutes)",
+)
+@click.option(
+    "--max_interval",
+    type=float,
+    default=None,
+    help="Longest time between tests when queues are well under their limits (minutes)",
+)
+@click.option(
+    "--state/--no-state",
+    default=None,
+    help="Keep the queue history and active alerts between runs",
+)
 def main(
-    config: str, interval: float, verbosity: int, max_tests: int, gen_config: bool
+    config: str,
+    interval: float,
+    verbosity: int,
+    max_tests: int,
+    gen_config: bool,
+    engine: Optional[str],
+    concurrency: Optional[int],
+    processes: Optional[int],
+    persistent: Optional[bool],
+    digest: Optional[bool],
+    stats: Optional[bool],
+    min_interval: Optional[float],
+    max_interval: Optional[float],
+    state: Optional[bool],
 ) -> None:
     """Entry point for AMQPeek - Simple, flexible RMQ monitor.
 
@@ -119,6 +945,15 @@ def main(
         verbosity: The verbosity level
         max_tests: The max tests to perform in this session
         gen_config: If this session is being used to generate the config file
+        engine: The engine used to check the queues
+        concurrency: The max number of queue checks in flight at once
+        processes: The number of processes checking shards of the queues
+        persistent: If the connection to RMQ is kept open between tests
+        digest: If the alerts of each test are sent as one message
+        stats: If the phases of each test are timed
+        min_interval: The shortest time to wait between tests, when adaptive
+        max_interval: The longest time to wait between tests, when adaptive
+        state: If the queue history and active alerts are kept between runs
     """
     configure_logging(verbosity)
 
@@ -145,8 +980,10 @@ def main(
 
         sys.exit(0)
 
+    cache = ConfigCache(default_cache_dir())
+
     try:
-        app_config = read_config(config)
+        app_config = read_config(config, cache)
     except IOError:
         click.echo(
             click.style(
@@ -159,20 +996,64 @@ def main(
 
         sys.exit(0)
 
-    connector = Connector(**app_config["rabbit_connection"])
+    settings = build_monitor_settings(
+        app_config,
+        engine=engine,
+        concurrency=concurrency,
+        processes=processes,
+        persistent=persistent,
+        digest=digest,
+        stats=stats,
+        min_interval=min_interval,
+        max_interval=max_interval,
+        state=state,
+    )
 
-    queue_config = build_queue_data(app_config)
+    error = validate_monitor_settings(settings, app_config)
 
-    monitor = Monitor(
-        connector=connector,
-        queue_details=queue_config,
-        interval=interval,
-        max_connections=max_tests,
+    if error:
+        click.echo(click.style(error, fg="red"))
+
+        sys.exit(0)
+
+    metrics = start_metrics(app_config)
+    timings = create_stats(settings)
+    monitor, monitors = create_monitors(
+        settings, app_config, interval, max_tests, metrics, timings
     )
 
-    notifiers = create_notifiers(app_config["notifiers"])
+    notifiers = create_queued_notifiers(
+        app_config["notifiers"], app_config.get("notification_queue") or {}, timings
+    )
 
-    for notifier in notifiers:
+    for notifier in notifiers.values():
         monitor.add_notifier(notifier)
 
-    monitor.run()
+    state_store = create_state_store(settings, config, monitors)
+
+    if interval is not None:
+        from .reload import ConfigReloader
+
+        monitor.reloader = ConfigReloader(
+            config, app_config, settings, monitor, monitors, notifiers, cache, timings
+        )
+        monitor.reloader.install()
+
+    try:
+        monitor.run()
+    finally:
+        if monitor.reloader is not None:
+            monitor.reloader.uninstall()
+
+        if state_store is not None:
+            state_store.save(monitors)
+            state_store.unlock()
+
+        for notifier in list(notifiers.values()):
+            notifier.close()
+
+        if metrics is not None:
+            metrics.close()
+
+        if timings is not None:
+            click.echo(timings.summary())
@@ -0,0 +1,126 @@
+"""Cache of parsed config files, so an unchanged config is not parsed again."""
+import hashlib
+import logging
+import marshal
+import os
+from typing import Any, Optional, Tuple
+
+# Changed whenever the layout of the cache files changes
+CACHE_VERSION = 1
+
+CacheKey = Tuple[int, int, str, int, bytes]
+
+
+def default_cache_dir() -> str:
+    """Get the directory the parsed configs are cached in.
+
+    Returns:
+        The amqpeek directory under $XDG_CACHE_HOME, or ~/.cache when unset
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+
+    return os.path.join(cache_home, "amqpeek")
+
+
+class ConfigCache(object):
+    """Parsed configs stored in marshal format, one file per config file.
+
+    Each entry is keyed by the path, modification time and SHA-256 hash of
+    the config file it was parsed from, so an entry is only used for the
+    exact content it was parsed from. Configs holding values marshal cannot
+    store, such as dates, are not cached. Failures reading or writing the
+    cache are logged and otherwise ignored, the config is parsed instead.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        """Create a ConfigCache storing its files in the given directory.
+
+        Args:
+            cache_dir: The directory of the cache files, created when needed
+        """
+        self.cache_dir = cache_dir
+
+    def key(self, config_path: str, content: bytes, mtime_ns: int) -> CacheKey:
+        """Build the key of a config file.
+
+        Args:
+            config_path: The path of the config file
+            content: The content of the config file
+            mtime_ns: The modification time of the config file in ns
+
+        Returns:
+            The key the parsed config is stored under
+        """
+        return (
+            CACHE_VERSION,
+            marshal.version,
+            os.path.abspath(config_path),
+            mtime_ns,
+            hashlib.sha256(content).digest(),
+        )
+
+    def cache_path(self, key: CacheKey) -> str:
+        """Get the path of the cache file of a config file.
+
+        Args:
+            key: The key of the config file
+
+        Returns:
+            The path of the cache file
+        """
+        name = hashlib.sha256(key[2].encode("utf-8")).hexdigest()[:32]
+
+        return os.path.join(self.cache_dir, "{}.marshal".format(name))
+
+    def load(self, key: CacheKey) -> Optional[Any]:
+        """Get the parsed config stored under a key.
+
+        Args:
+            key: The key of the config file
+
+        Returns:
+            The parsed config, None when not cached or the config has changed
+        """
+        try:
+            with open(self.cache_path(key), "rb") as cache_file:
+                # Read whole, as marshal reads a file object a value at a time
+                cached_key, config = marshal.loads(cache_file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError) as error:
+            logging.info("Ignoring unreadable config cache: %s", error)
+            return None
+
+        if tuple(cached_key) != key:
+            return None
+
+        return config
+
+    def save(self, key: CacheKey, config: Any) -> None:
+        """Store a parsed config under a key, replacing any stored before.
+
+        Args:
+            key: The key of the config file
+            config: The parsed config
+        """
+        try:
+            data = marshal.dumps((key, config))
+        except ValueError as error:
+            logging.info("Config cannot be cached: %s", error)
+            return
+
+        path = self.cache_path(key)
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            with open(temp_path, "wb") as cache_file:
+                cache_file.write(data)
+
+            # Replaced in one step, so other processes never read part of it
+            os.replace(temp_path, path)
+        except OSError as error:
+            logging.info("Unable to write the config cache: %s", error)
@@ -0,0 +1,279 @@
+"""Selection of RMQ queues by glob or regex pattern."""
+import fnmatch
+import logging
+import re
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.management import ManagementConnector
+
+REGEX_PREFIX = "re:"
+GLOB_CHARS = "*?["
+LITERAL_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+)
+QUANTIFIER_CHARS = "*+?{"
+
+# Backreferences, conditionals and named groups refer to the groups of a
+# regex, which are renumbered once combined with other patterns, and global
+# flags must start the whole regex
+UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(|\(\?[aiLmsux]+\)")
+
+
+def is_pattern(queue_name: str) -> bool:
+    """Whether a configured queue name is a pattern rather than an exact name.
+
+    Names starting with "re:" are regular expressions, names holding any of
+    the glob characters * ? [ are globs.
+
+    Args:
+        queue_name: The queue name from the config
+
+    Returns:
+        True if the name selects queues by pattern
+    """
+    return queue_name.startswith(REGEX_PREFIX) or any(
+        char in queue_name for char in GLOB_CHARS
+    )
+
+
+def compile_pattern(pattern: str) -> Tuple[str, str]:
+    """Turn a configured pattern into a regex, and the literal prefix of its matches.
+
+    Args:
+        pattern: A glob, or a regex starting with "re:"
+
+    Returns:
+        The regex matching the whole of a queue name, and the text every
+        matching name starts with
+    """
+    if not pattern.startswith(REGEX_PREFIX):
+        prefix_end = min(
+            (pattern.index(char) for char in GLOB_CHARS if char in pattern),
+            default=len(pattern),
+        )
+
+        return fnmatch.translate(pattern), pattern[:prefix_end]
+
+    regex = pattern[len(REGEX_PREFIX) :]
+    prefix_end = 0
+
+    # Any alternation may match names that do not share the leading text
+    if "|" not in regex:
+        while prefix_end < len(regex) and regex[prefix_end] in LITERAL_CHARS:
+            prefix_end += 1
+
+        if prefix_end < len(regex) and regex[prefix_end] in QUANTIFIER_CHARS:
+            prefix_end = max(prefix_end - 1, 0)
+
+    return regex, regex[:prefix_end]
+
+
+class QueueMatcher(object):
+    """Index of queue patterns, compiled once to match many queue names quickly.
+
+    Patterns are grouped by the literal text their matches start with, and
+    each group is compiled into a single regex. A name is only tried against
+    the groups whose prefix it starts with. Regexes that refer to their own
+    groups or set global flags are compiled on their own, and tried after
+    the combined regex of their group. Where a name matches more than one
+    pattern, the lowest limit is used.
+    """
+
+    def __init__(self, queue_details: List[tuple]) -> None:
+        """Create a QueueMatcher for the configured queues.
+
+        Args:
+            queue_details: Pairs of queue name or pattern, and limit
+        """
+        self.exact = [
+            (queue_name, limit)
+            for queue_name, limit in queue_details
+            if not is_pattern(queue_name)
+        ]
+        self.limits: List[int] = []
+        self.buckets: Dict[
+            str,
+            Tuple[Optional[Pattern], Dict[int, int], List[Tuple[Pattern, int]]],
+        ] = {}
+
+        patterns: Dict[str, List[Tuple[str, int]]] = {}
+
+        for queue_name, limit in sorted(
+            (detail for detail in queue_details if is_pattern(detail[0])),
+            key=lambda detail: (detail[1], detail[0]),
+        ):
+            regex, prefix = compile_pattern(queue_name)
+            patterns.setdefault(prefix, []).append((regex, len(self.limits)))
+            self.limits.append(limit)
+
+        for prefix, bucket in patterns.items():
+            self.buckets[prefix] = self.compile_bucket(bucket)
+
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.buckets})
+
+    @staticmethod
+    def compile_bucket(
+        bucket: List[Tuple[str, int]]
+    ) -> Tuple[Optional[Pattern], Dict[int, int], List[Tuple[Pattern, int]]]:
+        """Compile the patterns sharing a prefix into a single regex.
+
+        Each pattern is followed by an empty group, which is always the last
+        group closed when that pattern matches, so the pattern that matched is
+        found from the index of the last group.
+
+        Args:
+            bucket: The regex and index of each pattern, lowest limit first
+
+        Returns:
+            The combined regex, None when no pattern can be combined, a map of
+            marker group index to pattern index, and the regex and index of
+            each pattern compiled on its own
+        """
+        alternatives = []
+        markers = {}
+        standalone = []
+        group_count = 0
+
+        for regex, index in bucket:
+            compiled = re.compile(regex)
+
+            if UNCOMBINABLE.search(regex):
+                standalone.append((compiled, index))
+                continue
+
+            group_count += compiled.groups + 1
+            markers[group_count] = index
+            alternatives.append("(?:{})()".format(regex))
+
+        combined = re.compile("|".join(alternatives)) if alternatives else None
+
+        return combined, markers, standalone
+
+    def match(self, queue_name: str) -> Optional[int]:
+        """Find the limit of the given queue name.
+
+        Args:
+            queue_name: The name of a queue on the broker
+
+        Returns:
+            The limit of the first pattern matching the name, None if no
+            pattern does
+        """
+        best = None
+
+        for length in self.prefix_lengths:
+            if length > len(queue_name):
+                break
+
+            bucket = self.buckets.get(queue_name[:length])
+
+            if bucket is None:
+                continue
+
+            combined, markers, standalone = bucket
+            found = None if combined is None else combined.fullmatch(queue_name)
+
+            if found is not None:
+                index = markers[found.lastindex]  # type: ignore
+
+                if best is None or index < best:
+                    best = index
+
+            for regex, index in standalone:
+                if (best is None or index < best) and regex.fullmatch(queue_name):
+                    best = index
+
+        return None if best is None else self.limits[best]
+
+    def resolve(self, queue_names: Iterable[str]) -> List[tuple]:
+        """Select the queues to monitor from those on the broker.
+
+        Queues configured by exact name are always selected, so they are still
+        reported when missing.
+
+        Args:
+            queue_names: The names of the queues on the broker
+
+        Returns:
+            Pairs of queue name and limit
+        """
+        queue_details = list(self.exact)
+        selected = {queue_name for queue_name, _ in self.exact}
+
+        for queue_name in queue_names:
+            if queue_name in selected:
+                continue
+
+            limit = self.match(queue_name)
+
+            if limit is not None:
+                selected.add(queue_name)
+                queue_details.append((queue_name, limit))
+
+        return queue_details
+
+
+class QueueDiscovery(object):
+    """Resolves queue patterns against the queues listed by the management API.
+
+    The listing is cached, so the broker is only listed again once it is
+    older than the TTL.
+    """
+
+    def __init__(
+        self,
+        connector: "ManagementConnector",
+        matcher: QueueMatcher,
+        ttl: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a QueueDiscovery with the given parameters.
+
+        Args:
+            connector: Connection details of the management API
+            matcher: The patterns of the queues to monitor
+            ttl: Seconds to keep using a listing before listing again
+            clock: Source of the current time
+        """
+        self.connector = connector
+        self.matcher = matcher
+        self.ttl = ttl
+        self.clock = clock
+        self.queue_details: List[tuple] = list(matcher.exact)
+        self.listed_at: Optional[float] = None
+
+    def resolve(self) -> List[tuple]:
+        """Get the queues to monitor, listing the broker when the cache is stale.
+
+        A ManagementApiError is raised when the broker cannot be listed, the
+        last resolved queues are kept in queue_details.
+
+        Returns:
+            Pairs of queue name and limit
+        """
+        now = self.clock()
+
+        if self.listed_at is not None and now - self.listed_at < self.ttl:
+            return self.queue_details
+
+        queue_names = [queue["name"] for queue in self.connector.iter_queues(["name"])]
+
+        self.queue_details = self.matcher.resolve(queue_names)
+        self.listed_at = now
+
+        logging.info(
+            "Discovered %d of %d queues", len(self.queue_details), len(queue_names)
+        )
+
+        return self.queue_details
@@ -11,3 +11,9 @@ class ConfigExistsError(AmqpeekException):
     """Attempting to create a configuration file, but it already exists."""
 
     pass
+
+
+class ManagementApiError(AmqpeekException):
+    """The RMQ management API could not be queried."""
+
+    pass
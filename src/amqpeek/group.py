@@ -0,0 +1,183 @@
+"""Monitoring of several RMQ brokers from one process."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from operator import itemgetter
+from typing import Any, List, Optional, Tuple, TYPE_CHECKING
+
+from amqpeek.monitor import Digest, Monitor
+from amqpeek.notifier import Notifier
+from amqpeek.stats import Stats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.reload import ConfigReloader
+
+
+class MonitorGroup(object):
+    """Runs the checks of several monitors, one per broker, in parallel.
+
+    Each cycle takes as long as the slowest broker, rather than the sum of
+    all of them. An error checking one broker is logged, and the other
+    brokers are still checked.
+    """
+
+    def __init__(
+        self,
+        monitors: List[Monitor],
+        interval: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        workers: Optional[int] = None,
+        digest: bool = False,
+        stats: Optional[Stats] = None,
+    ) -> None:
+        """Creates a MonitorGroup with the given parameters.
+
+        Args:
+            monitors: The monitors of each broker
+            interval: The time to wait between checks
+            max_connections: The max time to check the brokers before exiting
+            workers: The max number of brokers checked at once, defaults to
+                all of them
+            digest: Collect the alerts of all the brokers each cycle, and send
+                them as one message per notifier at the end of the cycle
+            stats: Times the phases of the checks of every broker, None to not
+                time them
+        """
+        self.monitors = monitors
+        self.interval = interval
+        self.max_connections = max_connections
+        self.workers = workers or len(monitors)
+        # Limits the checks at once, while every broker waits at once
+        self.check_slots = threading.BoundedSemaphore(self.workers)
+        self.connection_count = 0
+        self.notifiers: List[Notifier] = []
+        self.notify_lock = threading.Lock()
+        self.digest = Digest() if digest else None
+        self.stats = stats
+        self.reloader: Optional["ConfigReloader"] = None
+
+        for monitor in self.monitors:
+            monitor.notify_lock = self.notify_lock
+            monitor.digest = self.digest
+
+    def add_notifier(self, notifier: Notifier) -> None:
+        """Adds a notifier to every monitor in the group.
+
+        Args:
+            notifier: The notifier to add to the monitors
+        """
+        self.notifiers.append(notifier)
+
+        for monitor in self.monitors:
+            monitor.add_notifier(notifier)
+
+    def remove_notifier(self, notifier: Notifier) -> None:
+        """Removes a notifier from every monitor in the group.
+
+        Args:
+            notifier: The notifier to remove from the monitors
+        """
+        self.notifiers.remove(notifier)
+
+        for monitor in self.monitors:
+            monitor.remove_notifier(notifier)
+
+    def run(self) -> None:
+        """Main execution loop."""
+        with ThreadPoolExecutor(max_workers=len(self.monitors)) as executor:
+            deadline = None
+
+            while True:
+                start = time.monotonic()
+                self.each(executor, "run_cycle", deadline, limited=True)
+                logging.info(
+                    "Checked %d brokers in %.3fs",
+                    len(self.monitors),
+                    time.monotonic() - start,
+                )
+
+                if self.digest is not None:
+                    self.digest.send(self.notifiers)
+
+                if self.stats is not None:
+                    self.stats.end_cycle()
+
+                if self.interval is None:
+                    break
+
+                deadline, seconds = self.next_check()
+                self.each(executor, "wait", seconds)
+                self.connection_count += 1
+
+                if self.connection_count == self.max_connections:
+                    break
+
+                if self.reloader is not None:
+                    self.reloader.poll()
+
+            self.each(executor, "shutdown")
+
+    def next_check(self) -> Tuple[Optional[float], float]:
+        """Get when the next check of any of the brokers is due.
+
+        Returns:
+            The deadline of the next check, and the seconds until it. No
+            deadline and the interval when the monitors are not scheduled
+        """
+        upcoming = [
+            (scheduler.next_deadline(), scheduler)
+            for scheduler in (monitor.schedule() for monitor in self.monitors)
+            if scheduler is not None and scheduler.next_deadline() is not None
+        ]
+
+        if not upcoming:
+            return None, self.interval * 60  # type: ignore
+
+        deadline, scheduler = min(upcoming, key=itemgetter(0))
+
+        return deadline, scheduler.delay()
+
+    def each(
+        self,
+        executor: ThreadPoolExecutor,
+        method: str,
+        *args: Any,
+        limited: bool = False,
+    ) -> None:
+        """Call a method of every monitor in parallel, waiting for them all.
+
+        Args:
+            executor: The worker pool to run the calls on
+            method: The name of the monitor method to call
+            args: The arguments to call the method with
+            limited: Only call the method of as many monitors at once as
+                there are workers
+        """
+        futures = [
+            executor.submit(self.call, monitor, method, limited, *args)
+            for monitor in self.monitors
+        ]
+
+        for future in futures:
+            future.result()
+
+    def call(self, monitor: Monitor, method: str, limited: bool, *args: Any) -> None:
+        """Call a method of a monitor, logging any error so the others carry on.
+
+        Args:
+            monitor: The monitor of a broker
+            method: The name of the monitor method to call
+            limited: Wait for one of the workers before calling the method
+            args: The arguments to call the method with
+        """
+        try:
+            with self.check_slots if limited else nullcontext():
+                getattr(monitor, method)(*args)
+        except Exception:
+            logging.exception(
+                'Error in %s of broker "%s"',
+                method,
+                monitor.name or monitor.connector.host,
+            )
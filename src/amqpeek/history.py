@@ -0,0 +1,407 @@
+"""Recent history of the depth of each monitored queue."""
+import time
+from array import array
+from operator import itemgetter, mul, sub
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+DEFAULT_HISTORY_SIZE = 1440
+
+
+class DepthHistory(object):
+    """Ring buffer of the depths read from each queue over the last cycles.
+
+    Every queue is sampled at most once a cycle, so the time of each cycle
+    is held once, in a float array shared by all the queues, and each queue
+    only holds an unsigned 32 bit depth per cycle. 10,000 queues with 1,440
+    samples each take about 58MB. Cycles where a queue was not read, such
+    as when RMQ could not be reached or the queue was not due, hold no
+    sample.
+
+    A queue not read for a whole buffer of cycles is forgotten.
+    """
+
+    MISSING = 2 ** 32 - 1
+
+    def __init__(
+        self, size: int = DEFAULT_HISTORY_SIZE, clock: Callable[[], float] = time.time
+    ) -> None:
+        """Create an empty DepthHistory.
+
+        Args:
+            size: The number of cycles kept for each queue
+            clock: Source of the current time
+        """
+        self.size = size
+        self.clock = clock
+        self.cycles = 0
+        self.times = array("d", [0.0]) * size
+        self.blank = array("I", [self.MISSING]) * size
+        self.depths: Dict[str, array] = {}
+        self.last_seen: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        """Get the number of queues with a history.
+
+        Returns:
+            The number of queues
+        """
+        return len(self.depths)
+
+    def __contains__(self, queue_name: object) -> bool:
+        """Whether the given queue has a history.
+
+        Args:
+            queue_name: The name of the queue
+
+        Returns:
+            True if the queue has been read in the last cycles
+        """
+        return queue_name in self.depths
+
+    @property
+    def cursor(self) -> int:
+        """The slot of the current cycle in the buffers.
+
+        Returns:
+            The index of the current cycle
+        """
+        return (self.cycles - 1) % self.size
+
+    def start_cycle(self) -> None:
+        """Start a new cycle, overwriting the oldest when the buffer is full."""
+        self.cycles += 1
+        cursor = self.cursor
+        self.times[cursor] = self.clock()
+
+        for queue_name, depths in list(self.depths.items()):
+            if self.cycles - self.last_seen[queue_name] >= self.size:
+                del self.depths[queue_name]
+                del self.last_seen[queue_name]
+            else:
+                depths[cursor] = self.MISSING
+
+    def record(self, queue_name: str, depth: int) -> None:
+        """Record the depth read from a queue this cycle.
+
+        Args:
+            queue_name: The name of the queue
+            depth: The number of messages on the queue
+        """
+        if not self.cycles:
+            self.start_cycle()
+
+        depths = self.depths.get(queue_name)
+
+        if depths is None:
+            depths = self.depths[queue_name] = array("I", self.blank)
+
+        depths[self.cursor] = min(max(depth, 0), self.MISSING - 1)
+        self.last_seen[queue_name] = self.cycles
+
+    def queue_names(self) -> List[str]:
+        """Get the names of the queues with a history.
+
+        Returns:
+            The queue names
+        """
+        return list(self.depths)
+
+    def slots(self) -> Iterator[int]:
+        """Iterate over the slots of the cycles held, oldest first.
+
+        Yields:
+            The index of each cycle in the buffers
+        """
+        for cycle in range(max(self.cycles - self.size, 0), self.cycles):
+            yield cycle % self.size
+
+    def samples(
+        self, queue_name: str, since: Optional[float] = None
+    ) -> List[Tuple[float, int]]:
+        """Get the samples of a queue, oldest first.
+
+        Args:
+            queue_name: The name of the queue
+            since: Only get the samples taken at or after this time
+
+        Returns:
+            Pairs of time and depth, empty if the queue has no history
+        """
+        depths = self.depths.get(queue_name)
+
+        if depths is None:
+            return []
+
+        return [
+            (self.times[slot], depths[slot])
+            for slot in self.slots()
+            if depths[slot] != self.MISSING
+            and (since is None or self.times[slot] >= since)
+        ]
+
+    def latest(self, queue_name: str) -> Optional[Tuple[float, int]]:
+        """Get the most recent sample of a queue.
+
+        Args:
+            queue_name: The name of the queue
+
+        Returns:
+            The time and depth, None if the queue has no history
+        """
+        depths = self.depths.get(queue_name)
+
+        if depths is None:
+            return None
+
+        slot = (self.last_seen[queue_name] - 1) % self.size
+
+        return self.times[slot], depths[slot]
+
+    def current(self, queue_name: str) -> Optional[int]:
+        """Get the depth of a queue read this cycle.
+
+        Args:
+            queue_name: The name of the queue
+
+        Returns:
+            The depth, None if the queue has not been read this cycle
+        """
+        if self.last_seen.get(queue_name) != self.cycles:
+            return None
+
+        return self.depths[queue_name][self.cursor]
+
+    def recent(
+        self, depths: array, window: int
+    ) -> Optional[Tuple[List[float], List[int]]]:
+        """Get the last samples of a queue, skipping the cycles it was not read.
+
+        Args:
+            depths: The depths of the queue
+            window: The number of samples to get
+
+        Returns:
+            The times and depths of the samples, oldest first, None when the
+            queue has fewer samples
+        """
+        times: List[float] = []
+        window_depths: List[int] = []
+
+        for cycle in range(self.cycles - 1, max(self.cycles - self.size, 0) - 1, -1):
+            slot = cycle % self.size
+
+            if depths[slot] == self.MISSING:
+                continue
+
+            times.append(self.times[slot])
+            window_depths.append(depths[slot])
+
+            if len(times) == window:
+                return times[::-1], window_depths[::-1]
+
+        return None
+
+    def window_samples(
+        self, queue_name: str, window: int, slots: List[int]
+    ) -> Optional[Tuple[Optional[List[float]], Sequence[int]]]:
+        """Get the last samples of a queue, for a batch over the given slots.
+
+        Args:
+            queue_name: The name of the queue
+            window: The number of samples to get
+            slots: The slots of the last cycles, shared by the batch
+
+        Returns:
+            The times of the samples, None when they are the times of the
+            shared slots, and the depths of the samples, oldest first. None
+            when the queue has fewer samples
+        """
+        depths = self.depths.get(queue_name)
+
+        if depths is None:
+            return None
+
+        window_depths = itemgetter(*slots)(depths)
+
+        if self.MISSING not in window_depths:
+            return None, window_depths
+
+        # Read in other cycles than the last, such as a queue checked at
+        # its own interval
+        return self.recent(depths, window)
+
+    def slopes(
+        self, queue_names: Iterable[str], window: int
+    ) -> Dict[str, Tuple[int, float]]:
+        """Fit a least squares line to the last samples of each queue, in one batch.
+
+        The cycle times are shared by the queues read every cycle, so the
+        weight of each sample in the fit is worked out once, and the slope of
+        each queue is the dot product of those weights with its depths. A
+        queue not read in some of the last cycles, such as one checked at its
+        own interval or while RMQ could not be reached, is fitted to its own
+        last samples. Queues with fewer samples than the window are left out.
+
+        Args:
+            queue_names: The queues to fit
+            window: The number of most recent samples to fit, at least 2
+
+        Returns:
+            Map of queue name to its latest depth, and the slope of its depth
+            in messages per second
+        """
+        if min(self.cycles, self.size) < window:
+            return {}
+
+        slots = list(self.slots())[-window:]
+        shared_weights = fit_weights([self.times[slot] for slot in slots])
+        slopes = {}
+
+        for queue_name in queue_names:
+            samples = self.window_samples(queue_name, window, slots)
+
+            if samples is None:
+                continue
+
+            times, window_depths = samples
+            weights = shared_weights if times is None else fit_weights(times)
+
+            if weights is not None:
+                slopes[queue_name] = (
+                    window_depths[-1],
+                    sum(map(mul, weights, window_depths)),
+                )
+
+        return slopes
+
+    def flows(
+        self, queue_names: Iterable[str], window: int
+    ) -> Dict[str, Tuple[int, float, float]]:
+        """Add up the rises and falls in the depth of each queue, in one batch.
+
+        Only the depth of a queue is read, so messages published and consumed
+        between two samples cancel out. A rise between samples means at least
+        that many messages were published, and a fall that at least that many
+        were consumed, so the rates worked out are lower bounds. A queue not
+        read in some of the last cycles is added up over its own last
+        samples, and queues with fewer samples than the window are left out.
+
+        Args:
+            queue_names: The queues to add up
+            window: The number of most recent samples to add up, at least 2
+
+        Returns:
+            Map of queue name to its latest depth, and the rates its depth
+            rose and fell over the window, in messages per second
+        """
+        if min(self.cycles, self.size) < window:
+            return {}
+
+        slots = list(self.slots())[-window:]
+        shared_duration = self.times[slots[-1]] - self.times[slots[0]]
+        flows = {}
+
+        for queue_name in queue_names:
+            samples = self.window_samples(queue_name, window, slots)
+
+            if samples is None:
+                continue
+
+            times, window_depths = samples
+            duration = shared_duration if times is None else times[-1] - times[0]
+
+            if duration <= 0:
+                continue
+
+            rise = sum(
+                delta
+                for delta in map(sub, window_depths[1:], window_depths[:-1])
+                if delta > 0
+            )
+            # The changes add up to the net change over the window
+            fall = rise - (window_depths[-1] - window_depths[0])
+            flows[queue_name] = (window_depths[-1], rise / duration, fall / duration)
+
+        return flows
+
+    def dump(self) -> tuple:
+        """Get the history as plain values, to be stored between runs.
+
+        Returns:
+            The size, number of cycles and cycle times, and the depths and
+            last cycle read of each queue
+        """
+        return (
+            self.size,
+            self.cycles,
+            self.times.tobytes(),
+            {queue_name: depths.tobytes() for queue_name, depths in self.depths.items()},
+            self.last_seen,
+        )
+
+    def restore(self, state: tuple) -> bool:
+        """Restore the history stored by an earlier run.
+
+        Args:
+            state: The history, as given by dump
+
+        Returns:
+            True if restored, False when the history was kept with another
+            size and cannot be used
+        """
+        size, cycles, times, depths, last_seen = state
+
+        if size != self.size:
+            return False
+
+        self.cycles = cycles
+        self.times = array("d")
+        self.times.frombytes(times)
+        self.depths = {}
+
+        for queue_name, queue_depths in depths.items():
+            self.depths[queue_name] = array("I")
+            self.depths[queue_name].frombytes(queue_depths)
+
+        self.last_seen = dict(last_seen)
+
+        return True
+
+    def nbytes(self) -> int:
+        """Get the memory held by the buffers.
+
+        Returns:
+            The size of the buffers in bytes
+        """
+        return self.times.itemsize * len(self.times) + sum(
+            depths.itemsize * len(depths) for depths in self.depths.values()
+        )
+
+
+def fit_weights(times: List[float]) -> Optional[List[float]]:
+    """Get the weight of each sample in a least squares fit of its slope.
+
+    Args:
+        times: The time of each sample
+
+    Returns:
+        The weights, the slope being the sum of each weight times its
+        sample, None when every sample was taken at once
+    """
+    mean = sum(times) / len(times)
+    offsets = [sample_time - mean for sample_time in times]
+    spread = sum(offset * offset for offset in offsets)
+
+    if not spread:
+        return None
+
+    return [offset / spread for offset in offsets]
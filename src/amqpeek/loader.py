@@ -0,0 +1,17 @@
+"""Importing of the engines and notifiers only when they are used."""
+import importlib
+from typing import Any
+
+
+def load(path: str) -> Any:
+    """Import an object given by the path of its module and its name.
+
+    Args:
+        path: The module and name of the object, as "module:name"
+
+    Returns:
+        The object
+    """
+    module_name, _, name = path.partition(":")
+
+    return getattr(importlib.import_module(module_name), name)
@@ -0,0 +1,354 @@
+"""Checking of RMQ queues using the management plugin's HTTP API."""
+import base64
+import codecs
+import json
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+from urllib.error import URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+
+from amqpeek.exceptions import ManagementApiError
+from amqpeek.monitor import Monitor
+from amqpeek.stats import span
+
+DEFAULT_COLUMNS = ("name", "messages", "consumers")
+
+
+class JsonStreamReader(object):
+    """Reads JSON values one at a time from a stream of bytes.
+
+    Only the part of the document not yet read is held in memory, so large
+    arrays can be walked with flat memory use.
+    """
+
+    WHITESPACE = " \t\n\r"
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = 65536) -> None:
+        """Create a reader for the given stream.
+
+        Args:
+            stream: The stream of UTF-8 encoded JSON to read
+            chunk_size: The number of bytes to read from the stream at once
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk from the stream into the buffer.
+
+        Returns:
+            False when the end of the stream has been reached
+        """
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos :] + self.text_decoder.decode(
+            chunk, final=self.eof
+        )
+        self.pos = 0
+
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it.
+
+        Returns:
+            The next character, or an empty string at the end of the stream
+        """
+        while True:
+            while self.pos < len(self.buffer):
+                if self.buffer[self.pos] not in self.WHITESPACE:
+                    return self.buffer[self.pos]
+
+                self.pos += 1
+
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """Consume the given character.
+
+        Args:
+            char: The character expected next
+
+        Raises:
+            ValueError: When the next character is not the one expected
+        """
+        found = self.peek()
+
+        if found != char:
+            raise ValueError("Expected {!r} but found {!r}".format(char, found))
+
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Read the next complete JSON value.
+
+        Returns:
+            The decoded value
+
+        Raises:
+            ValueError: When the stream does not hold valid JSON
+        """
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer may carry on in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+
+            self.pos = end
+
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        """Read the items of the next JSON array, one at a time.
+
+        Yields:
+            Each item of the array
+        """
+        self.expect("[")
+
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+
+            if self.peek() == "]":
+                self.pos += 1
+                return
+
+            self.expect(",")
+
+
+def iter_json_items(
+    stream: BinaryIO, metadata: Dict[str, Any], key: str = "items"
+) -> Iterator[Any]:
+    """Stream the items of a management API listing.
+
+    Handles both a plain array and a paginated object, where the items are
+    held under the given key and the rest of the object is recorded in the
+    metadata as it is read.
+
+    Args:
+        stream: The response body
+        metadata: Map to record the other members of a paginated object in
+        key: The member of a paginated object holding the items
+
+    Yields:
+        Each item of the listing
+    """
+    reader = JsonStreamReader(stream)
+
+    if reader.peek() == "[":
+        yield from reader.array_items()
+        return
+
+    reader.expect("{")
+
+    while reader.peek() != "}":
+        name = reader.value()
+        reader.expect(":")
+
+        if name == key:
+            yield from reader.array_items()
+        else:
+            metadata[name] = reader.value()
+
+        if reader.peek() == ",":
+            reader.pos += 1
+
+
+class ManagementConnector(object):
+    """Connection details for the RMQ management HTTP API."""
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        passwd: str,
+        vhost: str = "/",
+        port: int = 15672,
+        scheme: str = "http",
+        page_size: int = 500,
+        timeout: float = 10,
+    ) -> None:
+        """Create ManagementConnector with given config.
+
+        Args:
+            host: Host of the RMQ management API
+            user: User name used to access the API
+            passwd: Password used to access the API
+            vhost: RMQ vhost of the queues
+            port: Port the management API is served on
+            scheme: Either http or https
+            page_size: The number of queues to fetch per request
+            timeout: Seconds to wait for the API to respond
+        """
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.vhost = vhost
+        self.port = port
+        self.scheme = scheme
+        self.page_size = page_size
+        self.timeout = timeout
+
+    def queues_url(self, page: int, columns: Iterable[str]) -> str:
+        """Build the URL of one page of the queue listing.
+
+        Args:
+            page: The page to fetch, starting at 1
+            columns: The queue fields to include
+
+        Returns:
+            The URL of the page
+        """
+        return "{scheme}://{host}:{port}/api/queues/{vhost}?{query}".format(
+            scheme=self.scheme,
+            host=self.host,
+            port=self.port,
+            vhost=quote(self.vhost, safe=""),
+            query=urlencode(
+                {
+                    "page": page,
+                    "page_size": self.page_size,
+                    "columns": ",".join(columns),
+                    "disable_stats": "true",
+                    "enable_queue_totals": "true",
+                }
+            ),
+        )
+
+    def open(self, url: str) -> BinaryIO:
+        """Open the given API URL.
+
+        Args:
+            url: The URL to open
+
+        Returns:
+            The response, to be read as a stream
+        """
+        credentials = "{}:{}".format(self.user, self.passwd).encode("utf-8")
+        request = Request(
+            url,
+            headers={
+                "Authorization": "Basic {}".format(
+                    base64.b64encode(credentials).decode("ascii")
+                )
+            },
+        )
+
+        return urlopen(request, timeout=self.timeout)  # noqa: S310
+
+    def iter_queues(self, columns: Iterable[str] = DEFAULT_COLUMNS) -> Iterator[dict]:
+        """Stream every queue in the vhost, a page at a time.
+
+        Args:
+            columns: The queue fields to fetch
+
+        Yields:
+            A map of the requested fields for each queue
+
+        Raises:
+            ManagementApiError: When the API cannot be queried
+        """
+        columns = tuple(columns)
+        page = 1
+
+        while True:
+            metadata: Dict[str, Any] = {}
+
+            try:
+                with self.open(self.queues_url(page, columns)) as response:
+                    yield from iter_json_items(response, metadata)
+            except (URLError, OSError, ValueError) as error:
+                raise ManagementApiError(str(error)) from error
+
+            if page >= metadata.get("page_count", 0):
+                return
+
+            page += 1
+
+    def get_queues(
+        self, queue_names: Optional[Iterable[str]] = None
+    ) -> Dict[str, dict]:
+        """Fetch the queues with the given names.
+
+        Args:
+            queue_names: The queues to keep, None to keep all of them
+
+        Returns:
+            A map of queue name to its fields
+        """
+        wanted = None if queue_names is None else set(queue_names)
+
+        return {
+            queue["name"]: queue
+            for queue in self.iter_queues()
+            if wanted is None or queue["name"] in wanted
+        }
+
+
+class ManagementMonitor(Monitor):
+    """Monitor that fetches every queue depth in bulk from the management API."""
+
+    connector: ManagementConnector
+
+    def check(self) -> None:
+        """Fetch and check all the monitored queues once."""
+        self.history.start_cycle()
+
+        if not self.connection_allowed():
+            return
+
+        queue_details = self.get_queue_details()
+
+        try:
+            with span(self.stats, "fetch_queues"):
+                queues = self.connector.get_queues(
+                    queue_name for queue_name, _ in queue_details
+                )
+        except ManagementApiError:
+            self.connection_error()
+        else:
+            self.connected()
+            self.check_results(queues, queue_details)
+
+    def get_queue_message_count(self, queue: Any) -> int:
+        """Get the number of messages on the given queue.
+
+        Args:
+            queue: The fields of the queue fetched from the API
+
+        Returns:
+            The number of messages on the queue, 0 if not yet known
+        """
+        return queue.get("messages") or 0
+
+    def get_queue_consumer_count(self, queue: Any) -> int:
+        """Get the number of consumers of the given queue.
+
+        Args:
+            queue: The fields of the queue fetched from the API
+
+        Returns:
+            The number of consumers of the queue, 0 if not yet known
+        """
+        return queue.get("consumers") or 0
@@ -0,0 +1,258 @@
+"""Export of the results of each check as Prometheus metrics."""
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.monitor import Monitor
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Name, type and help text of each metric exported
+METRIC_FAMILIES = (
+    ("amqpeek_queue_messages", "gauge", "Messages on the queue at the last check"),
+    ("amqpeek_queue_limit", "gauge", "Max messages allowed on the queue"),
+    (
+        "amqpeek_queue_limit_ratio",
+        "gauge",
+        "Messages on the queue at the last check, as a fraction of its limit",
+    ),
+    ("amqpeek_queue_consumers", "gauge", "Consumers of the queue at the last check"),
+    (
+        "amqpeek_queue_drain_rate",
+        "gauge",
+        "Lower bound of the messages consumed from the queue per second",
+    ),
+    (
+        "amqpeek_queue_ingress_rate",
+        "gauge",
+        "Lower bound of the messages published to the queue per second",
+    ),
+    (
+        "amqpeek_queue_seconds_to_empty",
+        "gauge",
+        "Time until the queue is empty at its current drain rate",
+    ),
+    (
+        "amqpeek_check_duration_seconds",
+        "gauge",
+        "Time taken by the last check of the broker",
+    ),
+    ("amqpeek_checks_total", "counter", "Checks of the broker"),
+    (
+        "amqpeek_connection_failures_total",
+        "counter",
+        "Checks where the broker could not be reached",
+    ),
+)
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text format.
+
+    Args:
+        value: The label value
+
+    Returns:
+        The value with backslashes, quotes and new lines escaped
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the metrics page of the exporter."""
+
+    server: "MetricsServer"
+
+    def do_GET(self) -> None:
+        """Send the metrics page, or not found for any other path."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        page = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests at debug level, rather than to stderr.
+
+        Args:
+            format: The log message format
+            args: The values of the log message
+        """
+        logging.debug("Metrics request: " + format, *args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server of the metrics page."""
+
+    daemon_threads = True
+
+    def __init__(self, exporter: "MetricsExporter") -> None:
+        """Listen on the address of the exporter.
+
+        Args:
+            exporter: The exporter whose metrics are served
+        """
+        super().__init__((exporter.host, exporter.port), MetricsHandler)
+        self.exporter = exporter
+
+
+class MetricsExporter(object):
+    """Serves the results of the last check of each broker at /metrics.
+
+    The metrics of each broker are rendered at the end of its check and
+    cached, so a scrape never touches the broker and only has to join the
+    cached lines, at most once per check.
+    """
+
+    def __init__(self, host: str = "", port: int = 9102) -> None:
+        """Create a MetricsExporter with the given parameters.
+
+        Args:
+            host: The address to listen on, all addresses when empty
+            port: The port to listen on, 0 for any free port
+        """
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.brokers: Dict[str, Dict[str, List[str]]] = {}
+        self.page: Optional[bytes] = None
+        self.server: Optional[MetricsServer] = None
+
+    def start(self) -> None:
+        """Start serving the metrics from a background thread."""
+        self.server = MetricsServer(self)
+        self.port = self.server.server_address[1]
+        threading.Thread(
+            target=self.server.serve_forever, name="amqpeek-metrics", daemon=True
+        ).start()
+        logging.info("Serving metrics on port %d", self.port)
+
+    def close(self) -> None:
+        """Stop serving the metrics."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def update(self, monitor: "Monitor") -> None:
+        """Render the metrics of a broker from the results of its last check.
+
+        Args:
+            monitor: The monitor of the broker, which has just been checked
+        """
+        broker = escape_label(monitor.name or monitor.connector.host)
+        lines: Dict[str, List[str]] = {name: [] for name, _, _ in METRIC_FAMILIES}
+
+        for queue_name, limit in monitor.last_queue_details:
+            depth = monitor.history.current(queue_name)
+
+            if depth is None and not monitor.is_due(queue_name):
+                # Not checked this cycle, so export its last depth read
+                latest = monitor.history.latest(queue_name)
+                depth = None if latest is None else latest[1]
+
+            if depth is None:
+                continue
+
+            labels = '{{broker="{}",queue="{}"}}'.format(
+                broker, escape_label(queue_name)
+            )
+            lines["amqpeek_queue_messages"].append(
+                "amqpeek_queue_messages{} {}".format(labels, depth)
+            )
+            lines["amqpeek_queue_limit"].append(
+                "amqpeek_queue_limit{} {}".format(labels, limit)
+            )
+
+            if limit:
+                lines["amqpeek_queue_limit_ratio"].append(
+                    "amqpeek_queue_limit_ratio{} {}".format(labels, depth / limit)
+                )
+
+            self.add_drain_lines(lines, monitor, queue_name, labels)
+
+        labels = '{{broker="{}"}}'.format(broker)
+        lines["amqpeek_check_duration_seconds"].append(
+            "amqpeek_check_duration_seconds{} {}".format(labels, monitor.check_duration)
+        )
+        lines["amqpeek_checks_total"].append(
+            "amqpeek_checks_total{} {}".format(labels, monitor.history.cycles)
+        )
+        lines["amqpeek_connection_failures_total"].append(
+            "amqpeek_connection_failures_total{} {}".format(
+                labels, monitor.connection_failures
+            )
+        )
+
+        with self.lock:
+            self.brokers[broker] = lines
+            self.page = None
+
+    def add_drain_lines(
+        self,
+        lines: Dict[str, List[str]],
+        monitor: "Monitor",
+        queue_name: str,
+        labels: str,
+    ) -> None:
+        """Add the consumers and drain rates of a queue, when they are read.
+
+        Args:
+            lines: Map of metric name to the lines of the broker
+            monitor: The monitor of the broker
+            queue_name: The name of the queue
+            labels: The labels of the queue
+        """
+        consumers = monitor.consumers.get(queue_name)
+
+        if consumers is not None:
+            lines["amqpeek_queue_consumers"].append(
+                "amqpeek_queue_consumers{} {}".format(labels, consumers)
+            )
+
+        drain = monitor.drain.get(queue_name)
+
+        if drain is None:
+            return
+
+        drain_rate, ingress_rate, seconds = drain
+        lines["amqpeek_queue_drain_rate"].append(
+            "amqpeek_queue_drain_rate{} {}".format(labels, drain_rate)
+        )
+        lines["amqpeek_queue_ingress_rate"].append(
+            "amqpeek_queue_ingress_rate{} {}".format(labels, ingress_rate)
+        )
+
+        if seconds is not None:
+            lines["amqpeek_queue_seconds_to_empty"].append(
+                "amqpeek_queue_seconds_to_empty{} {}".format(labels, seconds)
+            )
+
+    def render(self) -> bytes:
+        """Get the metrics page, rendering it again only after a check.
+
+        Returns:
+            The metrics of every broker, in the Prometheus text format
+        """
+        with self.lock:
+            if self.page is None:
+                lines = []
+
+                for name, metric_type, help_text in METRIC_FAMILIES:
+                    lines.append("# HELP {} {}".format(name, help_text))
+                    lines.append("# TYPE {} {}".format(name, metric_type))
+
+                    for broker_lines in self.brokers.values():
+                        lines.extend(broker_lines[name])
+
+                lines.append("")
+                self.page = "\n".join(lines).encode("utf-8")
+
+            return self.page
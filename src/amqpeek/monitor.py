@@ -1,13 +1,42 @@
 """Connecting to, and monitoring of RMQ."""
 import logging
+import threading
 import time
-from typing import Any, List, Optional
+from typing import (
+    Any,
+    cast,
+    Dict,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
 
 from pika import BlockingConnection, ConnectionParameters, PlainCredentials
 from pika.channel import Channel
-from pika.exceptions import AMQPConnectionError, ChannelClosed
+from pika.exceptions import AMQPConnectionError, AMQPError, ChannelClosed
 
+from amqpeek.alerts import AlertState
+from amqpeek.breaker import CircuitBreaker
+from amqpeek.exceptions import ManagementApiError
+from amqpeek.history import DEFAULT_HISTORY_SIZE, DepthHistory
 from amqpeek.notifier import Notifier
+from amqpeek.rules import DrainRule, GrowthRule
+from amqpeek.schedule import AdaptiveInterval, Scheduler
+from amqpeek.stats import span, Stats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.discovery import QueueDiscovery
+    from amqpeek.metrics import MetricsExporter
+    from amqpeek.reload import ConfigReloader
+
+
+class BrokerConnector(Protocol):
+    """Connection details of a broker, whichever engine checks it."""
+
+    host: str
 
 
 class Connector(object):
@@ -17,7 +46,13 @@ class Connector(object):
     """
 
     def __init__(
-        self, host: str, port: int, vhost: str, user: str, passwd: str
+        self,
+        host: str,
+        port: int,
+        vhost: str,
+        user: str,
+        passwd: str,
+        heartbeat: Optional[int] = None,
     ) -> None:
         """Create Connector with given config.
 
@@ -27,12 +62,34 @@ class Connector(object):
             vhost: RMQ vhost
             user: User name used to connection to RMQ server
             passwd: Password used to connect to RMQ server
+            heartbeat: AMQP heartbeat timeout in seconds, None to use the
+                value proposed by the server
         """
         self.host = host
         self.port = port
         self.vhost = vhost
         self.user = user
         self.passwd = passwd
+        self.heartbeat = heartbeat
+
+    def connection_parameters(self) -> ConnectionParameters:
+        """Build the connection parameters for the RMQ server.
+
+        Returns:
+            The parameters used by any of the pika connection adapters
+        """
+        parameters = {}
+
+        if self.heartbeat is not None:
+            parameters["heartbeat"] = self.heartbeat
+
+        return ConnectionParameters(
+            host=self.host,
+            port=self.port,
+            virtual_host=self.vhost,
+            credentials=PlainCredentials(username=self.user, password=self.passwd),
+            **parameters,
+        )
 
     def connect(self) -> BlockingConnection:
         """Create blocking connection in RMQ.
@@ -40,14 +97,101 @@ class Connector(object):
         Returns:
             A BlockingConnection to the RMQ server specified
         """
-        return BlockingConnection(
-            parameters=ConnectionParameters(
-                host=self.host,
-                port=self.port,
-                virtual_host=self.vhost,
-                credentials=PlainCredentials(username=self.user, password=self.passwd),
+        return BlockingConnection(parameters=self.connection_parameters())
+
+
+class ChannelPool(object):
+    """Small pool of channels on one connection.
+
+    The broker closes a channel when a passive declare fails, so closed
+    channels are dropped from the pool and replaced with new ones on the
+    same connection, rather than reconnecting.
+    """
+
+    def __init__(self, connection: BlockingConnection, size: int = 1) -> None:
+        """Create an empty pool for the given connection.
+
+        Args:
+            connection: The connection to open channels on
+            size: The max number of idle channels to keep open
+        """
+        self.connection = connection
+        self.size = size
+        self.idle: List[Channel] = []
+        self.channels_opened = 0
+
+    def acquire(self) -> Channel:
+        """Get an open channel, opening a new one when none are idle.
+
+        Returns:
+            An open channel
+        """
+        while self.idle:
+            channel = self.idle.pop()
+
+            if channel.is_open:
+                return channel
+
+        self.channels_opened += 1
+
+        return self.connection.channel()
+
+    def release(self, channel: Channel) -> None:
+        """Return a channel to the pool, so it can be used again.
+
+        Args:
+            channel: The channel to return
+        """
+        if channel.is_open and len(self.idle) < self.size:
+            self.idle.append(channel)
+
+
+class Digest(object):
+    """Collects the alerts raised during a cycle, to send them as one message."""
+
+    def __init__(self) -> None:
+        """Create an empty Digest."""
+        self.alerts: Dict[str, List[str]] = {}
+
+    def add(self, subject: str, message: str) -> None:
+        """Add an alert to the digest.
+
+        Args:
+            subject: The subject of the alert
+            message: The main body of the alert
+        """
+        self.alerts.setdefault(subject, []).append(message)
+
+    def send(self, notifiers: List[Notifier]) -> None:
+        """Send the collected alerts, grouped by subject, then empty the digest.
+
+        A single alert is sent as it is.
+
+        Args:
+            notifiers: The notifiers to send the digest with
+        """
+        alert_count = sum(len(messages) for messages in self.alerts.values())
+
+        if not alert_count:
+            return
+
+        if alert_count == 1:
+            ((subject, (message,)),) = self.alerts.items()
+        else:
+            subject = "{} alerts".format(alert_count)
+            message = "\n\n".join(
+                "{subject} ({count})\n{messages}".format(
+                    subject=alert_subject,
+                    count=len(messages),
+                    messages="\n".join("  " + message for message in messages),
+                )
+                for alert_subject, messages in self.alerts.items()
             )
-        )
+
+        self.alerts = {}
+
+        for notifier in notifiers:
+            notifier.notify(subject, message)
 
 
 class Monitor(object):
@@ -55,10 +199,23 @@ class Monitor(object):
 
     def __init__(
         self,
-        connector: Connector,
+        connector: BrokerConnector,
         queue_details: List[tuple],
         interval: Optional[float] = None,
         max_connections: Optional[int] = None,
+        persistent: bool = False,
+        name: Optional[str] = None,
+        discovery: Optional["QueueDiscovery"] = None,
+        digest: bool = False,
+        alert_state: Optional[AlertState] = None,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        growth_rule: Optional[GrowthRule] = None,
+        drain_rule: Optional[DrainRule] = None,
+        metrics: Optional["MetricsExporter"] = None,
+        stats: Optional[Stats] = None,
+        intervals: Optional[Dict[str, float]] = None,
+        adaptive: Optional[AdaptiveInterval] = None,
+        breaker: Optional[CircuitBreaker] = None,
     ) -> None:
         """Creates a Monitor with the given parameters.
 
@@ -68,13 +225,68 @@ class Monitor(object):
             queue_details: The map of the queues to connect to and there limits
             interval: The time to wait between checks
             max_connections: The max time to connect the RMQ server before exiting
+            persistent: Keep the connection to RMQ open between checks,
+                only reconnecting when it is lost
+            name: Name of the broker, used to tag notifications when several
+                brokers are monitored
+            discovery: Resolves any queue patterns against the queues on the
+                broker, None when queues are only given by exact name
+            digest: Collect the alerts of each cycle, and send them as one
+                message per notifier at the end of the cycle
+            alert_state: The alerts already sent, so alerts still active are
+                not sent again every cycle, None to send every alert
+            history_size: The number of cycles of queue depths to keep
+            growth_rule: Alerts on queues projected to reach their limit
+                soon, None to only alert once over the limit
+            drain_rule: Alerts on queues with consumers that are not draining
+                their backlog, None to not read the consumers of each queue
+            metrics: Exports the results of each check, None to not export them
+            stats: Times the phases of each check, None to not time them
+            intervals: Map of queue name to the time to wait between checks of
+                that queue, for queues not checked at the interval
+            adaptive: Works out the time to wait before the next check of the
+                queues at the interval from how close they are to their
+                limits, None to always wait the interval
+            breaker: Backs off from connecting to RMQ while it is down,
+                sending one notification when it goes down and one when it
+                recovers, None to connect and notify on every check
         """
         self.connector = connector
         self.queue_details = queue_details
         self.interval = interval
         self.max_connections = max_connections
+        self.persistent = persistent
+        self.name = name
+        self.discovery = discovery
+        self.digest = Digest() if digest else None
+        self.alert_state = alert_state
+        self.history = DepthHistory(history_size)
+        self.growth_rule = growth_rule
+        self.drain_rule = drain_rule
+        self.consumers: Dict[str, int] = {}
+        self.drain: Dict[str, Tuple[float, float, Optional[float]]] = {}
+        self.metrics = metrics
+        self.stats = stats
+        self.intervals = intervals or {}
+        self.adaptive = adaptive
+        self.breaker = breaker
+        self.scheduler: Optional[Scheduler] = None
+        self.due: Optional[Set[float]] = None
+        self.last_queue_details: List[tuple] = []
+        self.check_duration = 0.0
+        self.connection_failures = 0
         self.connection_count = 0
         self.notifiers: List[Notifier] = []
+        self.notify_lock = threading.Lock()
+        self.reloader: Optional["ConfigReloader"] = None
+
+        self.connection: Any = None
+        self.channel_pool: Optional[ChannelPool] = None
+        self.connection_lost = False
+        self.connections_opened = 0
+        self.reconnects = 0
+        self.handshake_time = 0.0
+        self.handshake_time_saved = 0.0
 
     def add_notifier(self, notifier: Notifier) -> None:
         """Adds a notifier to this monitor that will be used to send notifications to.
@@ -84,32 +296,325 @@ class Monitor(object):
         """
         self.notifiers.append(notifier)
 
+    def remove_notifier(self, notifier: Notifier) -> None:
+        """Stop sending notifications to a notifier added to this monitor.
+
+        Args:
+            notifier: The notifier to remove from the monitor
+        """
+        self.notifiers.remove(notifier)
+
+    def set_connector(self, connector: BrokerConnector) -> None:
+        """Connect to RMQ with a new connector from the next check.
+
+        Args:
+            connector: The connector used to create the connections to RMQ
+        """
+        # The long-lived connection was opened with the old settings
+        self.shutdown()
+        self.connector = connector
+
+    def set_breaker(self, breaker: Optional[CircuitBreaker]) -> None:
+        """Back off from RMQ with a new circuit breaker from the next check.
+
+        The new breaker takes over the state of the old one, so a broker that
+        is down is not notified as going down again, and is still notified
+        when it recovers.
+
+        Args:
+            breaker: Backs off from connecting to RMQ while it is down, None
+                to connect on every check
+        """
+        if breaker is not None and self.breaker is not None:
+            breaker.state = self.breaker.state
+            breaker.failures = self.breaker.failures
+            breaker.retry_at = self.breaker.retry_at
+
+        self.breaker = breaker
+
+    def set_queues(
+        self,
+        queue_details: List[tuple],
+        intervals: Optional[Dict[str, float]] = None,
+        discovery: Optional["QueueDiscovery"] = None,
+    ) -> None:
+        """Check the given queues from the next check.
+
+        Args:
+            queue_details: The map of the queues to connect to and there limits
+            intervals: Map of queue name to the time to wait between checks of
+                that queue, for queues not checked at the interval
+            discovery: Resolves any queue patterns against the queues on the
+                broker, None when queues are only given by exact name
+        """
+        self.queue_details = queue_details
+        self.discovery = discovery
+
+        if (intervals or {}) != self.intervals:
+            self.intervals = intervals or {}
+            # Scheduled again from the next check, when every queue is due
+            self.scheduler = None
+
     def run(self) -> None:
         """Main execution loop."""
+        deadline = None
+
         while True:
-            try:
-                connection = self.connector.connect()
-            except AMQPConnectionError:
-                subject = "Connection Error"
-                message = 'Error connecting to host: "{host}"'.format(
-                    host=self.connector.host
-                )
+            self.run_cycle(deadline)
+            self.send_digest()
 
-                logging.info("%s - %s", subject, message)
-                self.notify(subject, message)
-            else:
-                self.check_queues(connection, self.queue_details)
-                connection.close()
+            if self.stats is not None:
+                self.stats.end_cycle()
+
+            scheduler = self.schedule()
 
-            if self.interval is not None:
-                time.sleep(self.interval * 60)
+            if scheduler is not None:
+                deadline = scheduler.next_deadline()
+                self.wait(scheduler.delay())
                 self.connection_count += 1
 
                 if self.connection_count == self.max_connections:
-                    return
+                    break
+
+                if self.reloader is not None:
+                    self.reloader.poll()
             else:
+                break
+
+        self.shutdown()
+
+    def schedule(self) -> Optional[Scheduler]:
+        """Get the schedule of the checks, when checking at an interval.
+
+        Returns:
+            The scheduler of the checks, None when only checking once
+        """
+        if self.scheduler is None and self.interval is not None:
+            self.scheduler = Scheduler(
+                self.interval * 60,
+                {
+                    queue_name: interval * 60
+                    for queue_name, interval in self.intervals.items()
+                },
+            )
+
+        return self.scheduler
+
+    def run_cycle(self, deadline: Optional[float] = None) -> None:
+        """Check the queues due once, timing the check and exporting it.
+
+        Nothing is checked, and RMQ is not connected to, when no queue is due.
+
+        Args:
+            deadline: The deadline waited for, due even when the wait ended
+                a little early
+        """
+        scheduler = self.schedule()
+
+        if scheduler is not None:
+            self.due = scheduler.pop_due(deadline)
+
+            if not self.due:
                 return
 
+        start = time.perf_counter()
+        self.check()
+        self.check_duration = time.perf_counter() - start
+
+        if self.metrics is not None:
+            self.metrics.update(self)
+
+        self.adapt()
+
+    def adapt(self) -> None:
+        """Retime the next check of the queues at the interval, when adaptive.
+
+        The queues at the interval are polled less often while well under
+        their limits, and more often once any nears its limit or grows fast.
+        When no queue could be read, the next check is at the interval.
+        """
+        scheduler = self.scheduler
+
+        if (
+            self.adaptive is None
+            or scheduler is None
+            or scheduler.interval not in (self.due or set())
+        ):
+            return
+
+        pressure = self.adaptive.pressure(
+            self.history,
+            scheduler.select(self.last_queue_details, {scheduler.interval}),
+        )
+
+        if pressure is None:
+            return
+
+        period = self.adaptive.period(pressure)
+        logging.debug("Next check in %.0fs (pressure %.2f)", period, pressure)
+        scheduler.retime(scheduler.interval, period)
+
+    def check(self) -> None:
+        """Connect to RMQ and check all the monitored queues once."""
+        self.history.start_cycle()
+
+        if not self.connection_allowed():
+            return
+
+        try:
+            connection = self.get_connection()
+        except AMQPConnectionError:
+            self.connection_error()
+            return
+
+        self.connected()
+        queue_details = self.get_queue_details()
+
+        try:
+            self.check_queues(connection, queue_details)
+        except AMQPConnectionError:
+            if self.persistent:
+                self.drop_connection()
+            elif connection.is_open:
+                self.close_connection(connection)
+
+            self.connection_error()
+            return
+
+        if not self.persistent:
+            connection.close()
+
+    def wait(self, seconds: float) -> None:
+        """Wait between checks, keeping a long-lived connection serviced.
+
+        Args:
+            seconds: The time to wait
+        """
+        if self.connection is None:
+            time.sleep(seconds)
+            return
+
+        deadline = time.monotonic() + seconds
+
+        try:
+            # Processes heartbeats while waiting, so the broker keeps the
+            # connection open
+            self.connection.sleep(seconds)
+        except AMQPConnectionError:
+            logging.info("Connection to RMQ lost between checks")
+            self.drop_connection()
+            time.sleep(max(0.0, deadline - time.monotonic()))
+
+    def shutdown(self) -> None:
+        """Close any long-lived connection and report the connection stats."""
+        if self.persistent:
+            logging.info(
+                "%d connections opened, %d reconnects, %.3fs of handshakes saved",
+                self.connections_opened,
+                self.reconnects,
+                self.handshake_time_saved,
+            )
+
+        self.drop_connection()
+        self.connection_lost = False
+
+    def get_connection(self) -> BlockingConnection:
+        """Get a connection to RMQ, reusing the long-lived one when possible.
+
+        Returns:
+            An open connection to the RMQ server
+        """
+        if self.connection is not None:
+            if self.connection_alive(self.connection):
+                return self.reuse_connection()
+
+            logging.info("Connection to RMQ lost, reconnecting")
+            self.drop_connection()
+
+        start = time.monotonic()
+
+        # Only the engines checking over AMQP get connections
+        connector = cast(Connector, self.connector)
+
+        with span(self.stats, "connect"):
+            connection = connector.connect()
+
+        self.connection_opened(connection, time.monotonic() - start)
+
+        return connection
+
+    def connection_alive(self, connection: BlockingConnection) -> bool:
+        """Whether the given long-lived connection can still be used.
+
+        Args:
+            connection: The connection to check
+
+        Returns:
+            True when the connection is still open
+        """
+        if not connection.is_open:
+            return False
+
+        try:
+            connection.process_data_events(0)
+        except AMQPConnectionError:
+            return False
+
+        return True
+
+    def reuse_connection(self) -> Any:
+        """Reuse the long-lived connection, recording the handshake saved.
+
+        Returns:
+            The long-lived connection
+        """
+        self.handshake_time_saved += self.handshake_time
+
+        return self.connection
+
+    def connection_opened(self, connection: Any, handshake_time: float) -> None:
+        """Record a newly opened connection.
+
+        Args:
+            connection: The newly opened connection
+            handshake_time: The time taken to open the connection
+        """
+        self.connections_opened += 1
+        self.handshake_time = handshake_time
+
+        if self.connection_lost:
+            self.connection_lost = False
+            self.reconnects += 1
+            logging.info("Reconnected to RMQ (%d reconnects)", self.reconnects)
+
+        if self.persistent:
+            self.connection = connection
+
+    def drop_connection(self) -> None:
+        """Forget the long-lived connection, closing it if still open."""
+        connection = self.connection
+        self.connection = None
+        self.channel_pool = None
+
+        if connection is None:
+            return
+
+        self.connection_lost = True
+
+        if connection.is_open:
+            self.close_connection(connection)
+
+    def close_connection(self, connection: BlockingConnection) -> None:
+        """Close a connection to RMQ that may already be failing.
+
+        Args:
+            connection: The connection to close
+        """
+        try:
+            connection.close()
+        except AMQPError:
+            pass
+
     def check_queues(
         self, connection: BlockingConnection, queue_details: List[tuple]
     ) -> None:
@@ -123,31 +628,344 @@ class Monitor(object):
 
         for queue_name, queue_limit in queue_details:
             try:
-                queue = self.connect_to_queue(channel, queue_name)
+                with span(self.stats, "connect_to_queue", self.label(queue_name)):
+                    queue = self.connect_to_queue(channel, queue_name)
             except ChannelClosed:
-                subject = "Queue does not exist"
-                message = ('Queue "{queue}" has not been declared').format(
-                    queue=queue_name
-                )
+                self.queue_not_found(queue_name)
+                # The broker closed the channel, so carry on with a new one
+                channel = self.get_channel(connection)
+                continue
 
-                logging.info("%s - %s", subject, message)
-                self.notify(subject, message)
+            self.check_queue(queue_name, queue_limit, queue)
 
-                continue
+        if self.channel_pool is not None:
+            self.channel_pool.release(channel)
+
+        self.check_growth(queue_details)
+        self.check_drain(queue_details)
+
+    def check_results(
+        self, results: Dict[str, Any], queue_details: List[tuple]
+    ) -> None:
+        """Check the queues fetched in bulk are within limits.
+
+        Args:
+            results: Map of queue name to the queue fetched, None when the
+                queue has not been declared
+            queue_details: A map of the queues and thier specified limits
+        """
+        for queue_name, queue_limit in queue_details:
+            queue = results.get(queue_name)
+
+            if queue is None:
+                self.queue_not_found(queue_name)
+            else:
+                self.check_queue(queue_name, queue_limit, queue)
+
+        self.check_growth(queue_details)
+        self.check_drain(queue_details)
+
+    def get_queue_details(self) -> List[tuple]:
+        """Get the queues due to be checked this cycle.
+
+        Returns:
+            Pairs of queue name and limit
+        """
+        self.last_queue_details = self.resolve_queue_details()
+
+        if self.scheduler is None or self.due is None:
+            return self.last_queue_details
+
+        return self.scheduler.select(self.last_queue_details, self.due)
 
-            message_count = self.get_queue_message_count(queue)
+    def resolve_queue_details(self) -> List[tuple]:
+        """Get all the monitored queues, resolving any queue patterns.
 
-            if message_count > queue_limit:
-                subject = "Queue Length Error"
-                message = (
+        Returns:
+            Pairs of queue name and limit
+        """
+        if self.discovery is None:
+            return self.queue_details
+
+        try:
+            queue_details = self.discovery.resolve()
+        except ManagementApiError:
+            self.discovery_error()
+
+            return self.discovery.queue_details
+
+        self.recover(
+            None,
+            "Discovery Error",
+            'Listed queues on host: "{host}"'.format(
+                host=self.discovery.connector.host
+            ),
+        )
+
+        return queue_details
+
+    def is_due(self, queue_name: str) -> bool:
+        """Whether a queue was due to be checked in the last cycle.
+
+        Args:
+            queue_name: The name of the queue
+
+        Returns:
+            True if the queue was due, always when checking every queue
+        """
+        if self.scheduler is None or self.due is None:
+            return True
+
+        return self.scheduler.is_due(queue_name, self.due)
+
+    def discovery_error(self) -> None:
+        """Send notification that the queues on RMQ could not be listed."""
+        self.alert(
+            None,
+            "Discovery Error",
+            'Error listing queues on host: "{host}"'.format(
+                host=self.discovery.connector.host  # type: ignore
+            ),
+        )
+
+    def connection_allowed(self) -> bool:
+        """Whether RMQ may be connected to this check, backing off while down.
+
+        Returns:
+            False while the circuit breaker is open
+        """
+        if self.breaker is None or self.breaker.allow():
+            return True
+
+        logging.debug(
+            'Not connecting to host: "%s", next attempt in %.0fs',
+            self.connector.host,
+            self.breaker.retry_in(),
+        )
+
+        return False
+
+    def connected(self) -> None:
+        """Send notification that RMQ can be connected to again, after an error."""
+        message = 'Reconnected to host: "{host}"'.format(host=self.connector.host)
+
+        if self.breaker is not None and self.breaker.success():
+            # The breaker sent the one notification of the broker going down,
+            # whether or not the alerts are tracked
+            if self.alert_state is not None:
+                self.alert_state.clear((self.name, None, "Connection Error"))
+
+            logging.info("Recovered - %s", message)
+            self.notify("Recovered", message)
+            return
+
+        self.recover(None, "Connection Error", message)
+
+    def connection_error(self) -> None:
+        """Send notification that a connection to RMQ could not be made.
+
+        With a circuit breaker, only the failure that opens it is notified,
+        and the failed probes after it are only logged.
+        """
+        self.connection_failures += 1
+        message = 'Error connecting to host: "{host}"'.format(host=self.connector.host)
+
+        if self.breaker is not None and not self.breaker.failure():
+            logging.info(
+                "Still down - %s, next attempt in %.0fs",
+                message,
+                self.breaker.retry_in(),
+            )
+            return
+
+        self.alert(None, "Connection Error", message)
+
+    def queue_not_found(self, queue_name: str) -> None:
+        """Send notification that the given queue has not been declared.
+
+        Args:
+            queue_name: The queue that could not be found
+        """
+        self.alert(
+            queue_name,
+            "Queue does not exist",
+            ('Queue "{queue}" has not been declared').format(queue=queue_name),
+        )
+
+    def check_queue(self, queue_name: str, queue_limit: int, queue: Any) -> None:
+        """Check a queue read from RMQ, keeping its consumers for the drain rule.
+
+        Args:
+            queue_name: The queue that was checked
+            queue_limit: The max number of messages allowed on the queue
+            queue: The queue read from RMQ
+        """
+        if self.drain_rule is not None:
+            self.consumers[queue_name] = self.get_queue_consumer_count(queue)
+
+        self.check_queue_length(
+            queue_name, queue_limit, self.get_queue_message_count(queue)
+        )
+
+    def check_queue_length(
+        self, queue_name: str, queue_limit: int, message_count: int
+    ) -> None:
+        """Send notification if the message count of the queue is over its limit.
+
+        Args:
+            queue_name: The queue that was checked
+            queue_limit: The max number of messages allowed on the queue
+            message_count: The number of messages found on the queue
+        """
+        self.history.record(queue_name, message_count)
+        self.recover(
+            queue_name,
+            "Queue does not exist",
+            'Queue "{queue}" has been declared'.format(queue=queue_name),
+        )
+
+        if message_count > queue_limit:
+            self.alert(
+                queue_name,
+                "Queue Length Error",
+                (
                     'Queue "{queue}" is over specified limit!! '
                     "({message_count} > {limit})"
                 ).format(
                     queue=queue_name, message_count=message_count, limit=queue_limit
+                ),
+            )
+        else:
+            self.recover(
+                queue_name,
+                "Queue Length Error",
+                (
+                    'Queue "{queue}" is back within its limit '
+                    "({message_count} <= {limit})"
+                ).format(
+                    queue=queue_name, message_count=message_count, limit=queue_limit
+                ),
+            )
+
+    def check_growth(self, queue_details: List[tuple]) -> None:
+        """Send notification for queues projected to reach their limit soon.
+
+        Args:
+            queue_details: A map of the queues and thier specified limits
+        """
+        if self.growth_rule is None:
+            return
+
+        for queue_name, limit, depth, rate, seconds in self.growth_rule.check(
+            self.history, queue_details
+        ):
+            if seconds is None:
+                self.recover(
+                    queue_name,
+                    "Queue Growth Warning",
+                    'Queue "{queue}" is no longer due to hit its limit soon'.format(
+                        queue=queue_name
+                    ),
                 )
+                continue
+
+            self.alert(
+                queue_name,
+                "Queue Growth Warning",
+                (
+                    'Queue "{queue}" will hit its limit of {limit} in '
+                    "~{minutes} min ({depth} messages, growing {rate:.0f}/min)"
+                ).format(
+                    queue=queue_name,
+                    limit=limit,
+                    minutes=max(round(seconds / 60), 1),
+                    depth=depth,
+                    rate=rate * 60,
+                ),
+            )
+
+    def check_drain(self, queue_details: List[tuple]) -> None:
+        """Send notification for queues with consumers not draining their backlog.
+
+        Args:
+            queue_details: A map of the queues and thier specified limits
+        """
+        if self.drain_rule is None:
+            return
+
+        if len(self.consumers) > len(self.history):
+            # Forget the consumers of queues no longer monitored
+            self.consumers = {
+                queue_name: consumer_count
+                for queue_name, consumer_count in self.consumers.items()
+                if queue_name in self.history
+            }
+
+        results = self.drain_rule.check(self.history, self.consumers, queue_details)
+        self.drain = {}
 
-                logging.info("%s - %s", subject, message)
-                self.notify(subject, message)
+        for queue_name, depth, consumers, drain, ingress, seconds, stuck in results:
+            self.drain[queue_name] = (drain, ingress, seconds)
+
+            if not stuck:
+                self.recover(
+                    queue_name,
+                    "Queue Drain Warning",
+                    'Queue "{queue}" is draining again'.format(queue=queue_name),
+                )
+                continue
+
+            self.alert(
+                queue_name,
+                "Queue Drain Warning",
+                (
+                    'Queue "{queue}" is not draining with {consumers} consumers '
+                    "({depth} messages, {state}, "
+                    "draining {drain:.0f}/min, arriving {ingress:.0f}/min)"
+                ).format(
+                    queue=queue_name,
+                    consumers=consumers,
+                    depth=depth,
+                    state="consumers stuck" if not drain else "too few consumers",
+                    drain=drain * 60,
+                    ingress=ingress * 60,
+                ),
+            )
+
+    def alert(self, target: Optional[str], subject: str, message: str) -> None:
+        """Send an alert, unless it is still active and was sent recently.
+
+        Args:
+            target: The queue the alert is about, None for the broker itself
+            subject: The type of alert
+            message: The main body of the alert
+        """
+        logging.info("%s - %s", subject, message)
+
+        if self.alert_state is None or self.alert_state.should_send(
+            (self.name, target, subject)
+        ):
+            self.notify(subject, message)
+
+    def recover(self, target: Optional[str], subject: str, message: str) -> None:
+        """Send notification that an alert has recovered, if it was active.
+
+        Args:
+            target: The queue the alert is about, None for the broker itself
+            subject: The type of alert that has recovered
+            message: The main body of the notification
+        """
+        if self.alert_state is not None and self.alert_state.clear(
+            (self.name, target, subject)
+        ):
+            logging.info("Recovered - %s", message)
+            self.notify("Recovered", message)
+
+    def send_digest(self) -> None:
+        """Send the alerts collected this cycle, when collecting a digest."""
+        if self.digest is not None:
+            with self.notify_lock, span(self.stats, "notify"):
+                self.digest.send(self.notifiers)
 
     def notify(self, subject: str, message: str) -> None:
         """Main entry point for sending notifications using this monitors notifiers.
@@ -156,8 +974,33 @@ class Monitor(object):
             subject: The subject of the notification
             message: The main body of the notification
         """
-        for notifier in self.notifiers:
-            notifier.notify(subject, message)
+        if self.name:
+            subject = "[{name}] {subject}".format(name=self.name, subject=subject)
+
+        # Notifiers may be shared with monitors of other brokers, checked
+        # in other threads
+        with self.notify_lock:
+            if self.digest is not None:
+                self.digest.add(subject, message)
+                return
+
+            with span(self.stats, "notify"):
+                for notifier in self.notifiers:
+                    notifier.notify(subject, message)
+
+    def label(self, queue_name: str) -> str:
+        """Label a queue with the broker it is on, when several are monitored.
+
+        Args:
+            queue_name: The name of the queue
+
+        Returns:
+            The queue name, tagged with the name of the broker if it has one
+        """
+        if self.name:
+            return "[{name}] {queue}".format(name=self.name, queue=queue_name)
+
+        return queue_name
 
     def connect_to_queue(self, channel: Channel, queue_name: str) -> Any:
         """Connect to the given queue on the given channel.
@@ -173,7 +1016,7 @@ class Monitor(object):
         return channel.queue_declare(queue=queue_name, passive=True)
 
     def get_channel(self, connection: BlockingConnection) -> Channel:
-        """Get the channel from the given connection.
+        """Get an open channel from the pool for the given connection.
 
         Args:
             connection: The connection to the RMQ server
@@ -181,7 +1024,11 @@ class Monitor(object):
         Returns:
             The active channel to the RMQ server
         """
-        return connection.channel()
+        if self.channel_pool is None or self.channel_pool.connection is not connection:
+            self.channel_pool = ChannelPool(connection)
+
+        with span(self.stats, "get_channel"):
+            return self.channel_pool.acquire()
 
     def get_queue_message_count(self, queue: Any) -> int:
         """Get the number of messages on the given queue at time of connection.
@@ -193,3 +1040,14 @@ class Monitor(object):
             The number of messages on the queue at time of connection
         """
         return queue.method.message_count  # pragma: no cover
+
+    def get_queue_consumer_count(self, queue: Any) -> int:
+        """Get the number of consumers of the given queue at time of connection.
+
+        Args:
+            queue: The queue we want to get the count of consumers from
+
+        Returns:
+            The number of consumers of the queue at time of connection
+        """
+        return queue.method.consumer_count  # pragma: no cover
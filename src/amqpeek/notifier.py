@@ -1,8 +1,37 @@
 """Classes for connecting to different channels to send notifications."""
-from smtplib import SMTP
-from typing import List, Optional
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
 
-from slacker import Slacker
+from amqpeek.loader import load
+from amqpeek.stats import span, Stats
+
+# Notifiers are imported only when used, as their clients are slow to import
+NOTIFIER_MAP = {
+    "smtp": "amqpeek.smtp_notifier:SmtpNotifier",
+    "slack": "amqpeek.slack_notifier:SlackNotifier",
+}
+
+
+def __getattr__(name: str) -> type:
+    """Import the notifiers that moved out of this module when first used.
+
+    Args:
+        name: Name of the attribute not found in this module
+
+    Returns:
+        The notifier class of that name
+
+    Raises:
+        AttributeError: If there is no notifier of that name
+    """
+    for path in NOTIFIER_MAP.values():
+        if path.endswith(":" + name):
+            return load(path)
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def create_notifiers(notifier_data: dict) -> tuple:
@@ -18,7 +47,7 @@ def create_notifiers(notifier_data: dict) -> tuple:
         return tuple()
 
     return tuple(
-        NOTIFIER_MAP[notifier_type](**kwargs)
+        load(NOTIFIER_MAP[notifier_type])(**kwargs)
         for notifier_type, kwargs in notifier_data.items()
     )
 
@@ -35,96 +64,213 @@ class Notifier(object):
         """
         pass  # pragma: no cover
 
+    def close(self) -> None:
+        """Send any notifications still pending and release the channel."""
+
+
+class TokenBucket(object):
+    """Client side rate limit, allowing short bursts over the steady rate."""
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Create a full TokenBucket.
+
+        Args:
+            rate: The number of tokens added each second
+            burst: The max number of tokens held
+            clock: Source of the current time
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, borrowing from the future when there are none left.
+
+        Returns:
+            Seconds to wait before the token may be used
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+
+            return max(0.0, -self.tokens / self.rate)
+
 
-class SmtpNotifier(Notifier):
-    """Sends Notifications via SMTP."""
+class QueuedNotifier(Notifier):
+    """Sends notifications through another notifier from a background thread.
 
-    MAIL_TEMPLATE = """\
-    From: {from_addr}
-    To: {to_addr}
-    Subject: {subject}
+    Notifications are put on a bounded queue and sent by a worker thread, so
+    a slow notification channel does not hold up the checks.
 
-    {message}
+    When the queue is full the overflow policy decides what gives:
+    "drop_oldest" drops the oldest notification waiting to be sent, and
+    "coalesce" merges the new notification into the last one waiting with the
+    same subject, only dropping the oldest when there is none.
     """
 
+    OVERFLOW_POLICIES = ("drop_oldest", "coalesce")
+
     def __init__(
         self,
-        host: str,
-        to_addr: List[str],
-        from_addr: str,
-        subject: str,
-        user: Optional[str] = None,
-        passwd: Optional[str] = None,
+        notifier: Notifier,
+        max_size: int = 100,
+        overflow: str = "drop_oldest",
+        flush_timeout: float = 30,
+        stats: Optional[Stats] = None,
     ) -> None:
-        """Creates an SMTP notifier with the given parameters.
+        """Create a QueuedNotifier and start its worker thread.
 
         Args:
-            host: The host of the SMTP server
-            user: The username to use when conencting to the server
-            passwd: The password to use to connect to the server
-            to_addr: The address to send the emails to
-            from_addr: The from address of the emails sent from this notifier
-            subject: The subject of the emails
+            notifier: The notifier used to send the notifications
+            max_size: The max number of notifications waiting to be sent
+            overflow: What to do when the queue is full, either
+                "drop_oldest" or "coalesce"
+            flush_timeout: Seconds to wait for the notifications still waiting
+                to be sent when closed
+            stats: Times sending each notification, None to not time it
+
+        Raises:
+            ValueError: When the overflow policy is not known
         """
-        self.host = host
-        self.to_addr = to_addr
-        self.from_addr = from_addr
-        self.subject = subject
-        self.user = user
-        self.passwd = passwd
-        self.server = SMTP(self.host)
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy "{}"'.format(overflow))
 
-        if self.user and self.passwd:
-            self.server.login(self.user, self.passwd)
+        self.notifier = notifier
+        self.max_size = max_size
+        self.overflow = overflow
+        self.flush_timeout = flush_timeout
+        self.stats = stats
+        self.pending: Deque[Tuple[str, str]] = deque()
+        self.condition = threading.Condition()
+        self.sending = False
+        self.closed = False
+        self.dropped = 0
+        self.worker = threading.Thread(
+            target=self.work,
+            name="notifier-{}".format(type(notifier).__name__),
+            daemon=True,
+        )
+        self.worker.start()
 
     def notify(self, subject: str, message: str) -> None:
-        """Send notification via email.
+        """Queue a notification to be sent.
 
         Args:
-            subject: The subject of the email
-            message: The body of the email
+            subject: The subject of the notification
+            message: The body of the notification
         """
-        subject = "{base_subject} - {subject}".format(
-            base_subject=self.subject, subject=subject
-        )
+        with self.condition:
+            if len(self.pending) >= self.max_size and not self.make_room(
+                subject, message
+            ):
+                return
+
+            self.pending.append((subject, message))
+            self.condition.notify_all()
+
+    def make_room(self, subject: str, message: str) -> bool:
+        """Apply the overflow policy to the full queue.
+
+        Args:
+            subject: The subject of the new notification
+            message: The body of the new notification
+
+        Returns:
+            True if the new notification still needs to be queued, False when
+            it has been merged into one already waiting
+        """
+        if self.overflow == "coalesce":
+            for index in range(len(self.pending) - 1, -1, -1):
+                if self.pending[index][0] == subject:
+                    self.pending[index] = (
+                        subject,
+                        "{}\n{}".format(self.pending[index][1], message),
+                    )
+                    return False
 
-        mail_message = self.MAIL_TEMPLATE.format(
-            from_addr=self.from_addr,
-            to_addr=", ".join(self.to_addr),
-            subject=subject,
-            message=message,
+        dropped_subject, _ = self.pending.popleft()
+        self.dropped += 1
+        logging.info(
+            'Notification queue full, dropped "%s" (%d dropped)',
+            dropped_subject,
+            self.dropped,
         )
 
-        self.server.sendmail(self.from_addr, self.to_addr, mail_message)
+        return True
 
+    def work(self) -> None:
+        """Send the queued notifications until closed and the queue is empty."""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
 
-class SlackNotifier(Notifier):
-    """Send notifications via Slack."""
+                if not self.pending:
+                    return
 
-    def __init__(self, api_key: str, username: str, channel: str) -> None:
-        """Create a Slack notifier with the given parameters.
+                subject, message = self.pending.popleft()
+                self.sending = True
 
-        Args:
-            api_key: The API key used to connect to Slack
-            username: The username of the message sender on Slack
-            channel: The channel to send the message to
-        """
-        self.username = username
-        self.channel = channel
-        self.slack = Slacker(api_key)
+            try:
+                with span(self.stats, "send"):
+                    self.notifier.notify(subject, message)
+            except Exception:
+                logging.exception('Error sending notification "%s"', subject)
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
 
-    def notify(self, subject: str, message: str) -> None:
-        """Send notification via Slack.
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the queued notifications to be sent.
 
         Args:
-            subject: The subject of the message
-            message: The message body
-        """
-        message = "{subject}: {message}".format(subject=subject, message=message)
+            timeout: Seconds to wait, defaults to the flush timeout
 
-        self.slack.chat.post_message(
-            channel=self.channel, text=message, username=self.username
+        Returns:
+            True if every notification was sent in time
+        """
+        deadline = time.monotonic() + (
+            self.flush_timeout if timeout is None else timeout
         )
 
+        with self.condition:
+            while self.pending or self.sending:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    return False
+
+                self.condition.wait(remaining)
+
+        return True
+
+    def close(self) -> None:
+        """Send the notifications still queued, then stop the worker thread."""
+        flushed = self.flush()
+
+        with self.condition:
+            if not flushed:
+                logging.error(
+                    "Gave up sending %d notifications after %ss",
+                    len(self.pending),
+                    self.flush_timeout,
+                )
+
+            self.closed = True
+            self.pending.clear()
+            self.condition.notify_all()
 
-NOTIFIER_MAP = {"smtp": SmtpNotifier, "slack": SlackNotifier}
+        # A worker stuck sending is left behind, it is a daemon thread
+        if flushed:
+            self.worker.join()
+            self.notifier.close()
@@ -0,0 +1,318 @@
+"""Reloading of the config while monitoring, without restarting."""
+import logging
+import os
+import signal
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING, Union
+
+import yaml
+
+from amqpeek.cli import (
+    build_broker_configs,
+    build_queue_data,
+    build_queue_intervals,
+    create_breaker,
+    create_connector,
+    create_discovery,
+    create_queued_notifiers,
+    read_config,
+    validate_monitor_settings,
+)
+from amqpeek.config_cache import ConfigCache
+from amqpeek.notifier import QueuedNotifier
+from amqpeek.stats import Stats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.group import MonitorGroup
+    from amqpeek.monitor import BrokerConnector, Monitor
+
+# Config sections only read at startup, so changes to them need a restart
+RESTART_SECTIONS = ("monitor", "metrics", "notification_queue")
+
+# Config sections deciding the queues checked on a broker
+QUEUE_SECTIONS = ("queues", "queue_limits", "management")
+
+
+class ConfigReloader(object):
+    """Applies changes to the config file to the running monitors.
+
+    The config is read again when the process is sent SIGHUP, or when the
+    config file has been modified, and applied between checks. Queues,
+    limits, queue intervals, reconnect settings and notifiers are updated
+    in place, and the connection to a broker is only reopened when its
+    connection settings change. A config that cannot be read or applied is
+    logged and ignored, and the monitors carry on with the config they have.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        app_config: dict,
+        settings: dict,
+        monitor: Union["Monitor", "MonitorGroup"],
+        monitors: List["Monitor"],
+        notifiers: Dict[str, QueuedNotifier],
+        cache: Optional[ConfigCache] = None,
+        stats: Optional[Stats] = None,
+    ) -> None:
+        """Create a ConfigReloader for the running monitors.
+
+        Args:
+            config_path: The config file to read from
+            app_config: Map containing the config the monitors were created with
+            settings: The monitor settings for this session
+            monitor: The monitor run, sending notifications to the notifiers
+            monitors: The monitor of each broker, in the order of the brokers
+                in the config
+            notifiers: Map of notifier type to the notifier, updated in place
+            cache: The parsed configs, None to always parse the file
+            stats: Times sending each notification, None to not time it
+        """
+        self.config_path = config_path
+        self.app_config = app_config
+        self.settings = settings
+        self.monitor = monitor
+        self.monitors = monitors
+        self.notifiers = notifiers
+        self.cache = cache
+        self.stats = stats
+        self.requested = False
+        self.mtime_ns = self.modified()
+        self.previous_handler: Any = None
+
+    def install(self) -> None:
+        """Reload the config when the process is sent SIGHUP, where supported."""
+        if hasattr(signal, "SIGHUP"):
+            self.previous_handler = signal.signal(signal.SIGHUP, self.request)
+
+    def uninstall(self) -> None:
+        """Restore the SIGHUP handler replaced by install."""
+        if self.previous_handler is not None:
+            signal.signal(signal.SIGHUP, self.previous_handler)
+            self.previous_handler = None
+
+    def request(self, signum: int = 0, frame: Any = None) -> None:
+        """Reload the config before the next check.
+
+        Args:
+            signum: The signal received, when called as a signal handler
+            frame: The stack frame interrupted by the signal
+        """
+        self.requested = True
+
+    def modified(self) -> Optional[int]:
+        """Get the modification time of the config file.
+
+        Returns:
+            The modification time in ns, None when the file cannot be read
+        """
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self) -> bool:
+        """Reload the config when requested, or when the config file has changed.
+
+        Returns:
+            True if a new config was applied
+        """
+        mtime_ns = self.modified()
+
+        if not self.requested and mtime_ns == self.mtime_ns:
+            return False
+
+        self.requested = False
+        self.mtime_ns = mtime_ns
+
+        return self.reload()
+
+    def reload(self) -> bool:
+        """Read the config file again, applying it when valid.
+
+        Returns:
+            True if the config was applied
+        """
+        try:
+            app_config = read_config(self.config_path, self.cache)
+            error = self.validate(app_config)
+
+            if error is None:
+                self.apply(app_config)
+        except (OSError, KeyError, TypeError, yaml.YAMLError) as exc:
+            error = "{}: {}".format(type(exc).__name__, exc)
+
+        if error is not None:
+            logging.error("Config not reloaded, keeping the running config: %s", error)
+            return False
+
+        logging.info("Reloaded the config from %s", self.config_path)
+
+        return True
+
+    def validate(self, app_config: Any) -> Optional[str]:
+        """Check a reloaded config can be applied to the running monitors.
+
+        Args:
+            app_config: The reloaded config
+
+        Returns:
+            A description of the problem, None when the config is valid
+        """
+        if not isinstance(app_config, dict) or not isinstance(
+            app_config.get("rabbit_connection"), (dict, list)
+        ):
+            return "No rabbit_connection in configuration file"
+
+        if self.brokers(app_config) != self.brokers(self.app_config):
+            return "Adding or removing brokers requires a restart"
+
+        return validate_monitor_settings(self.settings, app_config)
+
+    def brokers(self, app_config: dict) -> Tuple[bool, List[Optional[str]]]:
+        """Get the brokers monitored with a config.
+
+        Args:
+            app_config: Map containing the config
+
+        Returns:
+            Whether a list of brokers is given, and the name of each broker
+        """
+        return (
+            isinstance(app_config["rabbit_connection"], list),
+            [
+                broker_config.get("name")
+                for broker_config in build_broker_configs(app_config)
+            ],
+        )
+
+    def apply(self, app_config: dict) -> None:
+        """Apply a valid config to the running monitors.
+
+        Everything is created before any monitor is changed, so a config that
+        fails to apply leaves the monitors as they were.
+
+        Args:
+            app_config: The reloaded config
+        """
+        old_broker_configs = build_broker_configs(self.app_config)
+        broker_configs = build_broker_configs(app_config)
+        changes = [
+            self.broker_changes(old_broker_configs[index], broker_config)
+            for index, broker_config in enumerate(broker_configs)
+        ]
+        breakers = {
+            index: create_breaker(broker_config)
+            for index, broker_config in enumerate(broker_configs)
+            if broker_config.get("reconnect")
+            != old_broker_configs[index].get("reconnect")
+        }
+        old_notifiers = self.app_config.get("notifiers") or {}
+        new_notifiers = app_config.get("notifiers") or {}
+        added = create_queued_notifiers(
+            {
+                notifier_type: kwargs
+                for notifier_type, kwargs in new_notifiers.items()
+                if old_notifiers.get(notifier_type) != kwargs
+            },
+            self.app_config.get("notification_queue") or {},
+            self.stats,
+        )
+
+        for index, (connector, queues) in enumerate(changes):
+            if connector is not None:
+                self.monitors[index].set_connector(connector)
+
+            if queues is not None:
+                self.monitors[index].set_queues(*queues)
+
+        for index, breaker in breakers.items():
+            self.monitors[index].set_breaker(breaker)
+
+        self.replace_notifiers(
+            [
+                notifier_type
+                for notifier_type, kwargs in old_notifiers.items()
+                if new_notifiers.get(notifier_type) != kwargs
+            ],
+            added,
+        )
+        self.app_config = self.keep_restart_sections(app_config)
+
+    def broker_changes(
+        self, old_broker_config: dict, broker_config: dict
+    ) -> Tuple[Optional["BrokerConnector"], Optional[tuple]]:
+        """Create what has changed in the config of a broker.
+
+        Args:
+            old_broker_config: The config the broker is monitored with
+            broker_config: The reloaded config of the broker
+
+        Returns:
+            The new connector, None when the connection settings are unchanged,
+            and the new queues, intervals and discovery, None when the
+            queues are unchanged
+        """
+        engine = self.settings["engine"]
+        connection_section = (
+            "management" if engine == "management" else "rabbit_connection"
+        )
+        connector = None
+        queues = None
+
+        if broker_config.get(connection_section) != old_broker_config.get(
+            connection_section
+        ):
+            connector = create_connector(engine, broker_config)
+
+        if any(
+            broker_config.get(section) != old_broker_config.get(section)
+            for section in QUEUE_SECTIONS
+        ):
+            queues = (
+                build_queue_data(broker_config),
+                build_queue_intervals(broker_config),
+                create_discovery(self.settings, broker_config),
+            )
+
+        return connector, queues
+
+    def replace_notifiers(
+        self, removed: List[str], added: Dict[str, QueuedNotifier]
+    ) -> None:
+        """Swap the notifiers removed from the config for the ones added.
+
+        The removed notifiers send the notifications they have waiting first.
+
+        Args:
+            removed: The types of the notifiers removed or changed
+            added: Map of notifier type to the notifiers added or changed
+        """
+        for notifier_type in removed:
+            notifier = self.notifiers.pop(notifier_type)
+            self.monitor.remove_notifier(notifier)
+            notifier.close()
+
+        for notifier_type, notifier in added.items():
+            self.notifiers[notifier_type] = notifier
+            self.monitor.add_notifier(notifier)
+
+    def keep_restart_sections(self, app_config: dict) -> dict:
+        """Keep the sections only read at startup, warning when they changed.
+
+        Args:
+            app_config: The reloaded config
+
+        Returns:
+            The reloaded config, with the sections read at startup unchanged
+        """
+        app_config = dict(app_config)
+
+        for section in RESTART_SECTIONS:
+            if app_config.get(section) != self.app_config.get(section):
+                logging.warning(
+                    'Changes to "%s" in the config require a restart', section
+                )
+
+            app_config[section] = self.app_config.get(section)
+
+        return app_config
@@ -0,0 +1,112 @@
+"""Alerting rules worked out from the recent history of the queues."""
+from typing import Dict, List, Optional, Tuple
+
+from amqpeek.history import DepthHistory
+
+
+class GrowthRule(object):
+    """Projects when each growing queue will reach its limit.
+
+    A line is fitted to the last samples of every queue, and a queue is
+    reported when, growing at that rate, it would reach its limit within the
+    time to limit.
+    """
+
+    def __init__(self, window: int = 10, time_to_limit: float = 300) -> None:
+        """Create a GrowthRule with the given parameters.
+
+        Args:
+            window: The number of most recent samples the rate is fitted to
+            time_to_limit: Seconds from the limit at which a queue is reported
+        """
+        self.window = window
+        self.time_to_limit = time_to_limit
+
+    def check(
+        self, history: DepthHistory, queue_details: List[tuple]
+    ) -> List[Tuple[str, int, int, float, Optional[float]]]:
+        """Project the time each queue will take to reach its limit.
+
+        Args:
+            history: The recent depths of the queues
+            queue_details: Pairs of queue name and limit
+
+        Returns:
+            The queue name, limit, latest depth, rate in messages per second
+            and projected seconds to the limit of every queue with enough
+            samples. The projection is None when the queue is not due to
+            reach its limit within the time to limit, or is already over it
+        """
+        limits = dict(queue_details)
+        results = []
+
+        for queue_name, (depth, rate) in history.slopes(limits, self.window).items():
+            limit = limits[queue_name]
+            seconds: Optional[float] = None
+
+            if depth <= limit and rate > 0:
+                seconds = (limit - depth) / rate
+
+                if seconds > self.time_to_limit:
+                    seconds = None
+
+            results.append((queue_name, limit, depth, rate, seconds))
+
+        return results
+
+
+class DrainRule(object):
+    """Finds queues with consumers that are not working through their backlog.
+
+    The rises and falls in the depth of each queue over the last samples
+    give an estimate of the rate messages arrive and are drained. A queue
+    holding a backlog is reported when it has consumers but is not getting
+    shorter, as its consumers are stuck or too few to keep up, rather than
+    the queue just being long.
+    """
+
+    def __init__(self, window: int = 10, backlog: int = 1000) -> None:
+        """Create a DrainRule with the given parameters.
+
+        Args:
+            window: The number of most recent samples the rates are worked out
+                from
+            backlog: The number of messages at which a queue not draining is
+                reported
+        """
+        self.window = window
+        self.backlog = backlog
+
+    def check(
+        self,
+        history: DepthHistory,
+        consumers: Dict[str, int],
+        queue_details: List[tuple],
+    ) -> List[Tuple[str, int, int, float, float, Optional[float], bool]]:
+        """Work out how fast each queue is being drained.
+
+        Args:
+            history: The recent depths of the queues
+            consumers: Map of queue name to the number of consumers last read
+            queue_details: Pairs of queue name and limit
+
+        Returns:
+            The queue name, latest depth, consumers, drain and ingress rates in
+            messages per second, seconds to empty and whether the backlog is
+            stuck, for every queue with enough samples. The seconds to empty
+            is None when the queue is not getting shorter
+        """
+        results = []
+
+        for queue_name, (depth, ingress, drain) in history.flows(
+            dict(queue_details), self.window
+        ).items():
+            consumer_count = consumers.get(queue_name, 0)
+            seconds = depth / (drain - ingress) if drain > ingress else None
+            stuck = consumer_count > 0 and depth >= self.backlog and seconds is None
+
+            results.append(
+                (queue_name, depth, consumer_count, drain, ingress, seconds, stuck)
+            )
+
+        return results
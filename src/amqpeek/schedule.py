@@ -0,0 +1,243 @@
+"""Scheduling of the checks of queues polled at different intervals."""
+import heapq
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from amqpeek.history import DepthHistory
+
+# Fraction of its limit a queue is projected to reach, below which the
+# queues are polled at the longest period
+CALM_PRESSURE = 0.5
+
+
+class Scheduler(object):
+    """Priority queue of the next check of each interval queues are polled at.
+
+    Each interval ticks on a fixed grid from the first check, measured with
+    a monotonic clock, so the time taken by the checks does not add to the
+    interval. Queues with the same interval are checked together, and every
+    interval due at the same moment is checked in one batch. When checks
+    overrun, missed ticks are skipped rather than run back to back.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        intervals: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a Scheduler with nothing checked yet.
+
+        Args:
+            interval: Seconds between checks of the queues without an interval
+                of their own
+            intervals: Map of queue name to the seconds between its checks
+            clock: Source of the current time
+        """
+        self.interval = interval
+        self.intervals = intervals or {}
+        self.clock = clock
+        self.deadlines: List[Tuple[float, float]] = []
+        self.last_deadlines: Dict[float, float] = {}
+        self.started = False
+
+    def pop_due(self, deadline: Optional[float] = None) -> Set[float]:
+        """Get the intervals due to be checked, and schedule their next check.
+
+        Every interval is due the first time.
+
+        Args:
+            deadline: The deadline waited for, due even when the wait ended
+                a little early
+
+        Returns:
+            The intervals due
+        """
+        now = self.clock()
+
+        if deadline is not None:
+            now = max(now, deadline)
+
+        if not self.started:
+            self.started = True
+            self.deadlines = [
+                (now, interval)
+                for interval in sorted({self.interval, *self.intervals.values()})
+            ]
+
+        popped = []
+
+        while self.deadlines and self.deadlines[0][0] <= now:
+            popped.append(heapq.heappop(self.deadlines))
+
+        for deadline, interval in popped:
+            self.last_deadlines[interval] = deadline
+            next_deadline = deadline + interval
+
+            if interval > 0 and next_deadline <= now:
+                next_deadline += ((now - next_deadline) // interval + 1) * interval
+
+            heapq.heappush(self.deadlines, (next_deadline, interval))
+
+        return {interval for _, interval in popped}
+
+    def retime(self, interval: float, period: float) -> None:
+        """Move the next check of an interval to a period after its last check.
+
+        Args:
+            interval: The interval to move, as given when created
+            period: Seconds from the last check of the interval to its next
+        """
+        last_deadline = self.last_deadlines.get(interval)
+
+        if last_deadline is None:
+            return
+
+        next_deadline = max(last_deadline + period, self.clock())
+        self.deadlines = [
+            (next_deadline if queued == interval else deadline, queued)
+            for deadline, queued in self.deadlines
+        ]
+        heapq.heapify(self.deadlines)
+
+    def next_deadline(self) -> Optional[float]:
+        """Get the time the next check is due.
+
+        Returns:
+            The deadline of the next check, None before the first check
+        """
+        if not self.deadlines:
+            return None
+
+        return self.deadlines[0][0]
+
+    def delay(self) -> float:
+        """Get the time until the next check is due.
+
+        Returns:
+            Seconds until the next check, 0 when one is already due
+        """
+        deadline = self.next_deadline()
+
+        if deadline is None:
+            return 0.0
+
+        return max(deadline - self.clock(), 0.0)
+
+    def is_due(self, queue_name: str, due: Set[float]) -> bool:
+        """Whether a queue is polled at one of the given intervals.
+
+        Args:
+            queue_name: The name of the queue
+            due: The intervals due to be checked
+
+        Returns:
+            True if the queue is due to be checked
+        """
+        return self.intervals.get(queue_name, self.interval) in due
+
+    def select(self, queue_details: List[tuple], due: Set[float]) -> List[tuple]:
+        """Select the queues polled at the given intervals.
+
+        Args:
+            queue_details: Pairs of queue name and limit
+            due: The intervals due to be checked
+
+        Returns:
+            The pairs of the queues due to be checked
+        """
+        if not self.intervals:
+            return queue_details if self.interval in due else []
+
+        return [
+            (queue_name, limit)
+            for queue_name, limit in queue_details
+            if self.is_due(queue_name, due)
+        ]
+
+
+class AdaptiveInterval(object):
+    """Works out how long to wait before the next check from the state of the queues.
+
+    Each queue read is projected forward by its growth since the last check,
+    over the longest period, as a fraction of its limit. While every queue
+    stays below the calm pressure the queues are polled at the longest
+    period, and once any queue is projected to reach its limit they are
+    polled at the shortest. In between, the period shrinks geometrically
+    as the pressure rises.
+    """
+
+    def __init__(
+        self,
+        min_period: float,
+        max_period: float,
+        calm_pressure: float = CALM_PRESSURE,
+    ) -> None:
+        """Create an AdaptiveInterval with the given parameters.
+
+        Args:
+            min_period: Seconds between checks when a queue nears its limit
+            max_period: Seconds between checks when every queue is calm
+            calm_pressure: Fraction of its limit a queue is projected to
+                reach, below which the longest period is used
+        """
+        self.min_period = min_period
+        self.max_period = max_period
+        self.calm_pressure = calm_pressure
+
+    def pressure(
+        self, history: DepthHistory, queue_details: List[tuple]
+    ) -> Optional[float]:
+        """Get the highest fraction of its limit any queue is projected to reach.
+
+        Args:
+            history: The recent depths of the queues
+            queue_details: Pairs of queue name and limit
+
+        Returns:
+            The highest projected fraction of a limit, None when no queue was
+            read this cycle
+        """
+        rates = history.slopes([queue_name for queue_name, _ in queue_details], 2)
+        pressure = None
+
+        for queue_name, limit in queue_details:
+            depth = history.current(queue_name)
+
+            if depth is None:
+                continue
+
+            rate = rates[queue_name][1] if queue_name in rates else 0.0
+            projected = depth + max(rate, 0.0) * self.max_period
+
+            if limit:
+                ratio = projected / limit
+            else:
+                # Any message on a queue with no room is over its limit
+                ratio = 1.0 if projected else 0.0
+
+            if pressure is None or ratio > pressure:
+                pressure = ratio
+
+        return pressure
+
+    def period(self, pressure: float) -> float:
+        """Get the time to wait before the next check, under the given pressure.
+
+        Args:
+            pressure: The highest fraction of its limit any queue is projected
+                to reach
+
+        Returns:
+            Seconds until the next check, between the shortest and longest
+            periods
+        """
+        if pressure <= self.calm_pressure:
+            return self.max_period
+
+        if pressure >= 1:
+            return self.min_period
+
+        scale = (pressure - self.calm_pressure) / (1 - self.calm_pressure)
+
+        return self.max_period * (self.min_period / self.max_period) ** scale
@@ -0,0 +1,228 @@
+"""Checking of queues split into shards, across a pool of worker processes."""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from pika.exceptions import AMQPConnectionError
+
+from amqpeek.async_monitor import AsyncioMonitor, DEFAULT_CONCURRENCY
+from amqpeek.monitor import Connector, Monitor
+from amqpeek.stats import span
+
+# Shards per worker process, so a worker given the slow queues does not hold
+# up the others
+SHARDS_PER_PROCESS = 4
+
+# The monitor of a worker process, created when the worker starts
+worker_monitor: Optional[AsyncioMonitor] = None
+
+
+def init_worker(connector: Connector, concurrency: int) -> None:
+    """Create the monitor of a worker process, with its own connection to RMQ.
+
+    Args:
+        connector: The connector used to create the connection to RMQ
+        concurrency: The max number of passive declares in flight at once
+    """
+    global worker_monitor
+
+    worker_monitor = AsyncioMonitor(
+        connector=connector, queue_details=[], persistent=True, concurrency=concurrency
+    )
+
+
+def fetch_shard(
+    queue_names: List[str],
+) -> Optional[Dict[str, Optional[Tuple[int, int]]]]:
+    """Passively declare a shard of the queues, in a worker process.
+
+    Args:
+        queue_names: The queues of the shard
+
+    Returns:
+        Map of queue name to the number of messages on the queue and its
+        consumers, None when the queue has not been declared. None when RMQ
+        cannot be connected to
+    """
+    monitor: AsyncioMonitor = worker_monitor  # type: ignore
+
+    return monitor.get_loop().run_until_complete(fetch_counts(monitor, queue_names))
+
+
+async def fetch_counts(
+    monitor: AsyncioMonitor, queue_names: List[str]
+) -> Optional[Dict[str, Optional[Tuple[int, int]]]]:
+    """Passively declare the given queues on the connection of a monitor.
+
+    A connection kept open since the last shard may have been closed by the
+    broker while the worker was idle, so a failure on it is retried once on
+    a new connection.
+
+    Args:
+        monitor: The monitor of the worker process
+        queue_names: The queues to declare
+
+    Returns:
+        Map of queue name to the number of messages on the queue and its
+        consumers, None when the queue has not been declared. None when RMQ
+        cannot be connected to
+    """
+    queue_details = [(queue_name, 0) for queue_name in queue_names]
+    attempts = 1 if monitor.connection is None else 2
+
+    for _ in range(attempts):
+        try:
+            connection = await monitor.get_connection_async()
+            results = await monitor.fetch_queues(connection, queue_details)
+        except AMQPConnectionError:
+            monitor.drop_connection()
+        else:
+            return {
+                queue_name: (
+                    None
+                    if queue is None
+                    else (
+                        monitor.get_queue_message_count(queue),
+                        monitor.get_queue_consumer_count(queue),
+                    )
+                )
+                for queue_name, queue in results.items()
+            }
+
+    return None
+
+
+class ShardedMonitor(Monitor):
+    """Monitor that splits the queues into shards, checked by worker processes.
+
+    Each worker process keeps its own connection to RMQ, and declares the
+    queues of a shard many at a time, as the asyncio engine does. The
+    message and consumer counts are sent back and checked in this process,
+    so each alert is only sent once and the rules see every queue.
+    """
+
+    connector: Connector
+
+    def __init__(
+        self,
+        connector: Connector,
+        queue_details: List[tuple],
+        processes: Optional[int] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs: Any,
+    ) -> None:
+        """Creates a ShardedMonitor with the given parameters.
+
+        Args:
+            connector: The connector object used to create a connection to the
+                RMQ server to be monitored
+            queue_details: The map of the queues to connect to and there limits
+            processes: The number of worker processes, defaults to the number
+                of CPUs
+            concurrency: The max number of passive declares in flight at once
+                in each worker process
+            kwargs: Any other Monitor settings
+        """
+        super().__init__(connector=connector, queue_details=queue_details, **kwargs)
+        self.processes = processes or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        """Get the pool of worker processes, started when first used.
+
+        Returns:
+            The pool of worker processes
+        """
+        if self.pool is None:
+            # Spawned, as forking a process running threads can deadlock
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.connector, self.concurrency),
+            )
+
+        return self.pool
+
+    def split(self, queue_details: List[tuple]) -> List[List[str]]:
+        """Split the queues into shards of about the same size.
+
+        Args:
+            queue_details: A map of the queues and thier specified limits
+
+        Returns:
+            The names of the queues in each shard
+        """
+        shard_count = min(len(queue_details), self.processes * SHARDS_PER_PROCESS)
+
+        return [
+            [queue_name for queue_name, _ in queue_details[index::shard_count]]
+            for index in range(shard_count)
+        ]
+
+    def check(self) -> None:
+        """Check all the monitored queues once, a shard in each worker."""
+        self.history.start_cycle()
+
+        if not self.connection_allowed():
+            return
+
+        queue_details = self.get_queue_details()
+
+        try:
+            with span(self.stats, "fetch_queues"):
+                shards = list(
+                    self.get_pool().map(fetch_shard, self.split(queue_details))
+                )
+        except BrokenProcessPool:
+            logging.error("A worker process died, starting new workers next check")
+            self.shutdown()
+            return
+
+        if any(shard is None for shard in shards):
+            self.connection_error()
+            return
+
+        self.connected()
+        results: Dict[str, Optional[Tuple[int, int]]] = {}
+
+        for shard in shards:
+            results.update(shard)  # type: ignore
+
+        self.check_results(results, queue_details)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, their connections closing as they exit."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+        super().shutdown()
+
+    def get_queue_message_count(self, queue: Any) -> int:
+        """Get the number of messages on the given queue.
+
+        Args:
+            queue: The number of messages and consumers counted by a worker
+                process
+
+        Returns:
+            The number of messages on the queue
+        """
+        return queue[0]
+
+    def get_queue_consumer_count(self, queue: Any) -> int:
+        """Get the number of consumers of the given queue.
+
+        Args:
+            queue: The number of messages and consumers counted by a worker
+                process
+
+        Returns:
+            The number of consumers of the queue
+        """
+        return queue[1]
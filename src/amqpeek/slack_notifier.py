@@ -0,0 +1,105 @@
+"""Sending of notifications to Slack."""
+import logging
+import time
+
+import requests
+from slacker import Error as SlackerError, Slacker
+
+from amqpeek.notifier import Notifier, TokenBucket
+
+
+class SlackNotifier(Notifier):
+    """Send notifications via Slack.
+
+    Messages are sent over one keep-alive HTTP session, no faster than the
+    rate Slack allows for a channel. When Slack still answers 429, the
+    message is retried once the Retry-After time has passed.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        username: str,
+        channel: str,
+        timeout: float = 10,
+        rate: float = 1,
+        burst: int = 5,
+        retries: int = 3,
+    ) -> None:
+        """Create a Slack notifier with the given parameters.
+
+        Args:
+            api_key: The API key used to connect to Slack
+            username: The username of the message sender on Slack
+            channel: The channel to send the message to
+            timeout: Seconds to wait for Slack to respond
+            rate: The max number of messages sent each second
+            burst: The max number of messages sent at once, before rate applies
+            retries: The number of times to retry a message Slack has rate
+                limited
+        """
+        self.username = username
+        self.channel = channel
+        self.retries = retries
+        self.session = requests.Session()
+        self.slack = Slacker(api_key, timeout=timeout, session=self.session)
+        self.bucket = TokenBucket(rate, burst)
+        self.retry_at = 0.0
+
+    def notify(self, subject: str, message: str) -> None:
+        """Send notification via Slack.
+
+        This waits for the rate limit, so is best sent from a QueuedNotifier,
+        which holds the messages that come in meanwhile. Messages that cannot
+        be sent are logged and dropped.
+
+        Args:
+            subject: The subject of the message
+            message: The message body
+        """
+        message = "{subject}: {message}".format(subject=subject, message=message)
+
+        for attempt in range(self.retries + 1):
+            self.wait()
+
+            try:
+                self.slack.chat.post_message(
+                    channel=self.channel, text=message, username=self.username
+                )
+            except requests.HTTPError as error:
+                if error.response is None or error.response.status_code != 429:
+                    logging.error(
+                        'Error sending Slack message "%s": %s', subject, error
+                    )
+                    return
+
+                retry_after = float(error.response.headers.get("Retry-After", 1))
+                self.retry_at = time.monotonic() + retry_after
+                logging.info(
+                    "Rate limited by Slack, attempt %d, retrying in %ss",
+                    attempt + 1,
+                    retry_after,
+                )
+                continue
+            except (requests.RequestException, SlackerError) as error:
+                logging.error('Error sending Slack message "%s": %s', subject, error)
+                return
+
+            return
+
+        logging.error(
+            'Gave up sending Slack message "%s" after %d attempts',
+            subject,
+            self.retries + 1,
+        )
+
+    def wait(self) -> None:
+        """Wait until a message may be sent, by Slack and by the rate limit."""
+        delay = max(self.retry_at - time.monotonic(), self.bucket.reserve())
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """Close the HTTP session."""
+        self.session.close()
@@ -0,0 +1,195 @@
+"""Sending of notifications by email."""
+import logging
+import time
+from smtplib import SMTP, SMTPConnectError, SMTPException, SMTPServerDisconnected
+from typing import List, Optional
+
+from amqpeek.notifier import Notifier
+
+
+class SmtpNotifier(Notifier):
+    """Sends Notifications via SMTP."""
+
+    MAIL_TEMPLATE = """\
+    From: {from_addr}
+    To: {to_addr}
+    Subject: {subject}
+
+    {message}
+    """
+
+    def __init__(
+        self,
+        host: str,
+        to_addr: List[str],
+        from_addr: str,
+        subject: str,
+        user: Optional[str] = None,
+        passwd: Optional[str] = None,
+        timeout: float = 10,
+        port: int = 0,
+        starttls: bool = False,
+        retries: int = 2,
+        retry_delay: float = 1,
+        noop_after: float = 30,
+    ) -> None:
+        """Creates an SMTP notifier with the given parameters.
+
+        The connection to the server is made when the first email is sent, and
+        reused for the emails after it.
+
+        Args:
+            host: The host of the SMTP server
+            user: The username to use when conencting to the server
+            passwd: The password to use to connect to the server
+            to_addr: The address to send the emails to
+            from_addr: The from address of the emails sent from this notifier
+            subject: The subject of the emails
+            timeout: Seconds to wait for the SMTP server to respond
+            port: The port of the SMTP server, 0 for the standard port
+            starttls: Upgrade the connection to TLS before logging in
+            retries: The number of times to retry sending an email after the
+                connection to the server fails
+            retry_delay: Seconds to wait before retrying
+            noop_after: Seconds a connection can sit idle before it is checked
+                with a NOOP before use
+        """
+        self.host = host
+        self.to_addr = to_addr
+        self.from_addr = from_addr
+        self.subject = subject
+        self.user = user
+        self.passwd = passwd
+        self.timeout = timeout
+        self.port = port
+        self.starttls = starttls
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.noop_after = noop_after
+        self.server: Optional[SMTP] = None
+        self.last_used = 0.0
+        self.connections_opened = 0
+
+    def connect(self) -> SMTP:
+        """Open a session with the SMTP server, logging in if credentials are set.
+
+        Returns:
+            The SMTP session
+
+        Raises:
+            OSError: When connecting, STARTTLS or logging in fails, including
+                any SMTPException
+        """
+        server = SMTP(self.host, self.port, timeout=self.timeout)
+
+        try:
+            if self.starttls:
+                server.starttls()
+
+            if self.user and self.passwd:
+                server.login(self.user, self.passwd)
+        except OSError:
+            server.close()
+            raise
+
+        self.connections_opened += 1
+
+        return server
+
+    def get_server(self) -> SMTP:
+        """Get a session with the SMTP server, reconnecting if it has been dropped.
+
+        A session idle for longer than noop_after is checked with a NOOP, as
+        servers drop idle connections.
+
+        Returns:
+            The SMTP session
+        """
+        if self.server is not None and (
+            time.monotonic() - self.last_used < self.noop_after or self.session_alive()
+        ):
+            return self.server
+
+        self.drop_server()
+        self.server = self.connect()
+
+        return self.server
+
+    def session_alive(self) -> bool:
+        """Check the session with the SMTP server can still be used.
+
+        Returns:
+            True if the server answered a NOOP
+        """
+        try:
+            code, _ = self.server.noop()  # type: ignore
+        except OSError:
+            return False
+
+        return bool(code == 250)
+
+    def drop_server(self) -> None:
+        """Forget the session with the SMTP server, closing its socket."""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def notify(self, subject: str, message: str) -> None:
+        """Send notification via email.
+
+        Sending is retried on a new connection when the connection to the
+        server fails. Emails that cannot be sent are logged and dropped.
+
+        Args:
+            subject: The subject of the email
+            message: The body of the email
+        """
+        subject = "{base_subject} - {subject}".format(
+            base_subject=self.subject, subject=subject
+        )
+
+        mail_message = self.MAIL_TEMPLATE.format(
+            from_addr=self.from_addr,
+            to_addr=", ".join(self.to_addr),
+            subject=subject,
+            message=message,
+        )
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay)
+
+            try:
+                self.get_server().sendmail(self.from_addr, self.to_addr, mail_message)
+            except OSError as error:
+                # SMTP errors are OSErrors too, only connection failures are retried
+                if isinstance(error, SMTPException) and not isinstance(
+                    error, (SMTPServerDisconnected, SMTPConnectError)
+                ):
+                    logging.error('Error sending email "%s": %s', subject, error)
+                    return
+
+                logging.info(
+                    "SMTP connection failed, attempt %d: %s", attempt + 1, error
+                )
+                self.drop_server()
+                continue
+
+            self.last_used = time.monotonic()
+            return
+
+        logging.error(
+            'Gave up sending email "%s" after %d attempts', subject, self.retries + 1
+        )
+
+    def close(self) -> None:
+        """Close the connection to the SMTP server."""
+        if self.server is None:
+            return
+
+        try:
+            self.server.quit()
+        except OSError:
+            self.server.close()
+
+        self.server = None
@@ -0,0 +1,190 @@
+"""Local store of the state of the monitors, so separate runs carry on as one."""
+import hashlib
+import logging
+import marshal
+import os
+import time
+from typing import Callable, IO, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from amqpeek.monitor import Monitor
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+# Changed whenever the layout of the state files changes
+STATE_VERSION = 1
+
+# Seconds to wait for another run to release the state of a config
+LOCK_TIMEOUT = 60
+
+# Seconds between attempts to take the lock
+LOCK_POLL_INTERVAL = 0.1
+
+
+def default_state_dir() -> str:
+    """Get the directory the state of the monitors is stored in.
+
+    Returns:
+        The amqpeek directory under $XDG_STATE_HOME, or ~/.local/state when
+        unset
+    """
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "state"
+    )
+
+    return os.path.join(state_home, "amqpeek")
+
+
+class StateStore(object):
+    """The queue depth history and active alerts of the monitors of a config.
+
+    The state is stored in marshal format, one file per config file, with
+    the state of each broker keyed by its name, or its host when unnamed.
+    The file is written whole to a temporary file and moved into place, so
+    it never holds more than the history size of each queue and the active
+    alerts, and a run never reads part of a file.
+
+    A run takes a lock on the state of its config before reading it and
+    holds it until the state is saved, so runs that overlap, such as a slow
+    run from cron and the next one, take turns instead of both sending the
+    same alerts. Failures reading or writing the state are logged, and the
+    run carries on without it.
+    """
+
+    def __init__(
+        self,
+        state_dir: str,
+        config_path: str,
+        lock_timeout: float = LOCK_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a StateStore of a config, storing its files in the given directory.
+
+        Args:
+            state_dir: The directory of the state files, created when needed
+            config_path: The path of the config file the state belongs to
+            lock_timeout: Seconds to wait for another run holding the lock
+            clock: Source of the current time
+        """
+        name = hashlib.sha256(os.path.abspath(config_path).encode("utf-8")).hexdigest()
+
+        self.state_dir = state_dir
+        self.path = os.path.join(state_dir, "{}.state".format(name[:32]))
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+        self.lock_file: Optional[IO] = None
+
+    def lock(self) -> bool:
+        """Take the lock on the state, waiting for another run to release it.
+
+        Returns:
+            True if locked, False when the lock could not be taken in time
+        """
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            lock_file = open("{}.lock".format(self.path), "a")
+        except OSError as error:
+            logging.warning("Unable to open the state store: %s", error)
+            return False
+
+        if fcntl is None:  # pragma: no cover
+            self.lock_file = lock_file
+            return True
+
+        deadline = self.clock() + self.lock_timeout
+
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if self.clock() >= deadline:
+                    lock_file.close()
+                    logging.warning(
+                        "State store in use by another run, running without it"
+                    )
+                    return False
+
+                time.sleep(LOCK_POLL_INTERVAL)
+            else:
+                self.lock_file = lock_file
+                return True
+
+    def unlock(self) -> None:
+        """Release the lock on the state, for the next run to take."""
+        if self.lock_file is not None:
+            # Closing the file releases the lock
+            self.lock_file.close()
+            self.lock_file = None
+
+    def broker_key(self, monitor: "Monitor") -> str:
+        """Get the key the state of a monitor is stored under.
+
+        Args:
+            monitor: The monitor of a broker
+
+        Returns:
+            The name of the broker, or its host when unnamed
+        """
+        return monitor.name or monitor.connector.host
+
+    def load(self, monitors: List["Monitor"]) -> None:
+        """Restore the state stored by the last run into the monitors.
+
+        Args:
+            monitors: The monitor of each broker
+        """
+        try:
+            with open(self.path, "rb") as state_file:
+                # Read whole, as marshal reads a file object a value at a time
+                version, brokers = marshal.loads(state_file.read())
+        except FileNotFoundError:
+            return
+        except (OSError, EOFError, ValueError, TypeError) as error:
+            logging.info("Ignoring unreadable state store: %s", error)
+            return
+
+        if version != STATE_VERSION:
+            return
+
+        for monitor in monitors:
+            state = brokers.get(self.broker_key(monitor))
+
+            if state is None:
+                continue
+
+            if not monitor.history.restore(state["history"]):
+                logging.info("History size changed, not restoring the history")
+
+            if monitor.alert_state is not None:
+                monitor.alert_state.restore(state["alerts"])
+
+    def save(self, monitors: List["Monitor"]) -> None:
+        """Store the state of the monitors for the next run, replacing the last.
+
+        Args:
+            monitors: The monitor of each broker
+        """
+        brokers = {
+            self.broker_key(monitor): {
+                "history": monitor.history.dump(),
+                "alerts": (
+                    [] if monitor.alert_state is None else monitor.alert_state.dump()
+                ),
+            }
+            for monitor in monitors
+        }
+        temp_path = "{}.{}.tmp".format(self.path, os.getpid())
+
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+
+            with open(temp_path, "wb") as state_file:
+                state_file.write(marshal.dumps((STATE_VERSION, brokers)))
+
+            # Replaced in one step, so other processes never read part of it
+            os.replace(temp_path, self.path)
+        except (OSError, ValueError) as error:
+            logging.warning("Unable to write the state store: %s", error)
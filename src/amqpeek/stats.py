@@ -0,0 +1,259 @@
+"""Timing of the phases of each check, to find where a slow check spends its time."""
+import heapq
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+# Upper bounds of the histogram buckets, four per doubling from 1us to 2 minutes
+BUCKET_BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(108)]
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram(object):
+    """Counts of latencies in log scale buckets, for approximate percentiles.
+
+    Recording is a binary search and an increment, and each bucket is at
+    most 19% wider than the one before, so the percentiles are within that
+    of the true values.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty LatencyHistogram."""
+        self.counts = array("Q", [0]) * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record a latency.
+
+        Args:
+            seconds: The time taken
+        """
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """Get the latency under which the given percent of latencies fall.
+
+        Args:
+            percent: The percentile, from 0 to 100
+
+        Returns:
+            The upper bound of the bucket holding the percentile, capped at
+            the largest latency recorded. 0 when nothing has been recorded
+        """
+        rank = self.count * percent / 100
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+
+            if count and seen >= rank and index < len(BUCKET_BOUNDS):
+                return min(BUCKET_BOUNDS[index], self.max)
+
+        return self.max
+
+
+class Span(object):
+    """Times the code run inside it, recording the time in the stats."""
+
+    __slots__ = ("stats", "phase", "label", "start")
+
+    def __init__(self, stats: "Stats", phase: str, label: Optional[str]) -> None:
+        """Create a Span of the given phase.
+
+        Args:
+            stats: The stats to record the time in
+            phase: The phase of the check being timed
+            label: The queue being timed, to find the slowest queues
+        """
+        self.stats = stats
+        self.phase = phase
+        self.label = label
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        """Start timing.
+
+        Returns:
+            This span
+        """
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop timing and record the time, whether or not the code raised.
+
+        Args:
+            exc_info: The exception raised, if any
+        """
+        self.stats.record(self.phase, time.perf_counter() - self.start, self.label)
+
+
+class Stats(object):
+    """Latency histograms of each phase of the checks, and the slowest queues.
+
+    The percentiles of each phase are logged at most once every log
+    interval, with the slowest queues of the last cycle.
+    """
+
+    def __init__(
+        self,
+        slowest: int = 5,
+        log_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create empty Stats.
+
+        Args:
+            slowest: The number of slowest queues kept each cycle
+            log_interval: Seconds between logging the stats
+            clock: Source of the current time
+        """
+        self.slowest = slowest
+        self.log_interval = log_interval
+        self.clock = clock
+        self.phases: Dict[str, LatencyHistogram] = {}
+        self.slowest_queues: List[Tuple[float, str]] = []
+        self.last_slowest_queues: List[Tuple[float, str]] = []
+        self.logged_at = clock()
+        self.lock = threading.Lock()
+
+    def span(self, phase: str, label: Optional[str] = None) -> Span:
+        """Time a phase of the check.
+
+        Args:
+            phase: The phase being timed
+            label: The queue being timed, to find the slowest queues
+
+        Returns:
+            A context manager timing the code run inside it
+        """
+        return Span(self, phase, label)
+
+    def record(self, phase: str, seconds: float, label: Optional[str] = None) -> None:
+        """Record the time taken by a phase.
+
+        Args:
+            phase: The phase timed
+            seconds: The time taken
+            label: The queue timed, to find the slowest queues
+        """
+        with self.lock:
+            histogram = self.phases.get(phase)
+
+            if histogram is None:
+                histogram = self.phases[phase] = LatencyHistogram()
+
+            histogram.record(seconds)
+
+            if label is None:
+                return
+
+            if len(self.slowest_queues) < self.slowest:
+                heapq.heappush(self.slowest_queues, (seconds, label))
+            elif seconds > self.slowest_queues[0][0]:
+                heapq.heapreplace(self.slowest_queues, (seconds, label))
+
+    def end_cycle(self) -> None:
+        """Keep the slowest queues of the cycle, logging the stats when due."""
+        with self.lock:
+            self.last_slowest_queues = sorted(self.slowest_queues, reverse=True)
+            self.slowest_queues = []
+
+        now = self.clock()
+
+        if now - self.logged_at >= self.log_interval:
+            self.logged_at = now
+            logging.info("Check stats: %s", self.log_line())
+
+    def log_line(self) -> str:
+        """Summarise the stats on one line.
+
+        Returns:
+            The percentiles of each phase and the slowest queues
+        """
+        with self.lock:
+            histograms = sorted(self.phases.items())
+
+        phases = "; ".join(
+            "{} {}".format(
+                phase,
+                " ".join(
+                    "p{}={:.1f}ms".format(percent, histogram.percentile(percent) * 1000)
+                    for percent in PERCENTILES
+                ),
+            )
+            for phase, histogram in histograms
+        )
+        slowest = ", ".join(
+            "{} {:.1f}ms".format(label, seconds * 1000)
+            for seconds, label in self.last_slowest_queues
+        )
+
+        return "{}; slowest: {}".format(phases, slowest or "none")
+
+    def summary(self) -> str:
+        """Summarise the stats as a table.
+
+        Returns:
+            The count and percentiles of each phase, and the slowest queues
+            of the last cycle
+        """
+        with self.lock:
+            histograms = sorted(self.phases.items())
+
+        lines = [
+            "{:<18} {:>8} {:>9} {:>9} {:>9} {:>9}".format(
+                "phase", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"
+            )
+        ]
+
+        for phase, histogram in histograms:
+            lines.append(
+                "{:<18} {:>8} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                    phase,
+                    histogram.count,
+                    *(histogram.percentile(percent) * 1000 for percent in PERCENTILES),
+                    histogram.max * 1000,
+                )
+            )
+
+        if self.last_slowest_queues:
+            lines.append("")
+            lines.append("Slowest queues of the last test:")
+            lines.extend(
+                "  {:<40} {:>9.2f} ms".format(label, seconds * 1000)
+                for seconds, label in self.last_slowest_queues
+            )
+
+        return "\n".join(lines)
+
+
+def span(
+    stats: Optional[Stats], phase: str, label: Optional[str] = None
+) -> ContextManager[Any]:
+    """Time a phase of the check, when stats are being collected.
+
+    Args:
+        stats: The stats to record the time in, None when not collected
+        phase: The phase being timed
+        label: The queue being timed, to find the slowest queues
+
+    Returns:
+        A context manager timing the code run inside it, or doing nothing
+        when stats are not collected
+    """
+    if stats is None:
+        return nullcontext()
+
+    return stats.span(phase, label)
@@ -1,9 +1,33 @@
 """Fixtures availiable to the entire suite."""
 import os
+import sys
+from pathlib import Path
 from typing import Generator
 
 import pytest
 import yaml
+from _pytest.monkeypatch import MonkeyPatch
+
+# The fake broker used by the benchmarks is also used to test against
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: MonkeyPatch) -> str:
+    """Keep the config cache of every test in its own directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    return str(tmp_path / "amqpeek")
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path: Path, monkeypatch: MonkeyPatch) -> str:
+    """Keep the state stored between runs by every test in its own directory."""
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+
+    return str(tmp_path / "state" / "amqpeek")
 
 
 @pytest.fixture
@@ -1,8 +1,11 @@
 """Tests for the CLI entry point."""
 
+import os
+import signal
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
+import yaml
 from click.testing import CliRunner
 from pika.exceptions import AMQPConnectionError
 
@@ -111,7 +114,250 @@ class TestCli(object):
         result = cli_runner.invoke(main, ["-c{}".format(config_file), "-i1", "-m1"])
 
         assert result.exit_code == 0
-        time_mock.sleep.assert_called_once_with(1 * 60)
+        time_mock.sleep.assert_called_once_with(pytest.approx(1 * 60, abs=1))
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_engine_and_concurrency(
+        self, cli_runner: CliRunner, config_file: str
+    ) -> None:
+        """Test the engine and concurrency given on the command line are used."""
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock):
+            result = cli_runner.invoke(
+                main,
+                ["-c{}".format(config_file), "-e", "asyncio", "--concurrency", "5"],
+            )
+
+        assert result.exit_code == 0
+        assert engine_mock.call_args.kwargs["concurrency"] == 5
+        engine_mock.return_value.run.assert_called_once_with()
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_sharded_engine(self, cli_runner: CliRunner, config_file: str) -> None:
+        """Test the processes and concurrency of the sharded engine are used."""
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock) as load_mock:
+            result = cli_runner.invoke(
+                main,
+                [
+                    "-c{}".format(config_file),
+                    "-e",
+                    "sharded",
+                    "--processes",
+                    "4",
+                    "--concurrency",
+                    "8",
+                ],
+            )
+
+        assert result.exit_code == 0
+        load_mock.assert_called_once_with("sharded")
+        assert engine_mock.call_args.kwargs["processes"] == 4
+        assert engine_mock.call_args.kwargs["concurrency"] == 8
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_history_size(self, cli_runner: CliRunner, config_data: dict) -> None:
+        """Test the history size in the config is used."""
+        config_data["monitor"] = {"history_size": 60}
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock), patch(
+            "amqpeek.cli.read_config", return_value=config_data
+        ):
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        assert engine_mock.call_args.kwargs["history_size"] == 60
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_adaptive_interval(
+        self, cli_runner: CliRunner, config_data: dict
+    ) -> None:
+        """Test the interval adapts between the min and max intervals given."""
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock), patch(
+            "amqpeek.cli.read_config", return_value=config_data
+        ):
+            result = cli_runner.invoke(
+                main, ["-i1", "--min_interval", "0.25", "--max_interval", "10"]
+            )
+
+        adaptive = engine_mock.call_args.kwargs["adaptive"]
+
+        assert result.exit_code == 0
+        assert (adaptive.min_period, adaptive.max_period) == (15, 600)
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_reconnect(self, cli_runner: CliRunner, config_data: dict) -> None:
+        """Test each broker backs off with its own reconnect settings."""
+        connection = config_data["rabbit_connection"]
+        config_data["reconnect"] = {"max_delay": 60}
+        config_data["rabbit_connection"] = [
+            dict(connection, name="eu-1", reconnect={"max_delay": 600}),
+            dict(connection, name="us-1"),
+        ]
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock), patch(
+            "amqpeek.cli.read_config", return_value=config_data
+        ), patch("amqpeek.group.MonitorGroup"):
+            result = cli_runner.invoke(main, ["-i1"])
+
+        assert result.exit_code == 0
+        assert [
+            call.kwargs["breaker"].max_delay for call in engine_mock.call_args_list
+        ] == [600, 60]
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_queue_intervals(
+        self, cli_runner: CliRunner, config_data: dict
+    ) -> None:
+        """Test the queues with their own interval in the config are scheduled."""
+        config_data["queues"]["audit"] = {"limit": 10, "interval": 5}
+        engine_mock = MagicMock()
+
+        with patch("amqpeek.cli.load_engine", return_value=engine_mock), patch(
+            "amqpeek.cli.read_config", return_value=config_data
+        ):
+            result = cli_runner.invoke(main, ["-i1"])
+
+        assert result.exit_code == 0
+        assert engine_mock.call_args.kwargs["intervals"] == {"audit": 5}
+
+    @patch("amqpeek.monitor.time")
+    @pytest.mark.usefixtures("connector_patch")
+    def test_cli_reload(
+        self,
+        time_mock: MagicMock,
+        mock_notifiers: tuple,
+        queue_count_patch: MagicMock,
+        cli_runner: CliRunner,
+        config_data: dict,
+        config_file: str,
+    ) -> None:
+        """Test changes to the config file are applied between tests."""
+        queue_count_patch.return_value = 1
+        config_data["queue_limits"] = {5: ["my_queue", "my_other_queue"]}
+        del config_data["queues"]
+
+        def edit_config(seconds: float) -> None:
+            with open(config_file, "w") as config:
+                config.write(yaml.dump(config_data))
+
+            stat = os.stat(config_file)
+            os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        time_mock.sleep.side_effect = edit_config
+        previous_handler = signal.getsignal(signal.SIGHUP)
+
+        result = cli_runner.invoke(main, ["-c{}".format(config_file), "-i1", "-m2"])
+
+        assert result.exit_code == 0
+        mock_notifiers[0].notify.assert_called_once_with(
+            "Queue Length Error", 'Queue "my_queue" is over specified limit!! (1 > 0)'
+        )
+        assert signal.getsignal(signal.SIGHUP) == previous_handler
+
+    @pytest.mark.usefixtures("connector_patch", "mock_notifiers", "queue_count_patch")
+    def test_cli_metrics(self, cli_runner: CliRunner, config_data: dict) -> None:
+        """Test the metrics are served while monitoring, then stopped."""
+        config_data["metrics"] = {"host": "127.0.0.1", "port": 0}
+
+        with patch("amqpeek.cli.read_config", return_value=config_data), patch(
+            "amqpeek.metrics.MetricsExporter.update"
+        ) as update_mock:
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        exporter = update_mock.call_args.args[0].metrics
+        assert exporter.port != 0
+        assert exporter.server is None
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_metrics_port_in_use(
+        self, cli_runner: CliRunner, config_data: dict
+    ) -> None:
+        """Test an error is shown when the metrics cannot be served."""
+        config_data["metrics"] = {"port": 9102}
+
+        with patch("amqpeek.cli.read_config", return_value=config_data), patch(
+            "amqpeek.metrics.MetricsExporter.start", side_effect=OSError("in use")
+        ):
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        assert "Unable to serve metrics on port 9102: in use" in result.output
+
+    @pytest.mark.usefixtures("connector_patch", "mock_notifiers", "queue_count_patch")
+    def test_cli_stats(self, cli_runner: CliRunner, config_file: str) -> None:
+        """Test the timings of the tests are shown on exit with --stats."""
+        result = cli_runner.invoke(main, ["-c{}".format(config_file), "--stats"])
+
+        assert result.exit_code == 0
+        assert result.output.startswith("phase ")
+        assert "\nconnect_to_queue " in result.output
+        assert "Slowest queues of the last test:" in result.output
+
+    @pytest.mark.usefixtures("connector_patch")
+    def test_cli_state(
+        self,
+        mock_notifiers: tuple,
+        queue_count_patch: MagicMock,
+        cli_runner: CliRunner,
+        config_data: dict,
+    ) -> None:
+        """Test runs with --state carry on the alerts of the run before."""
+        config_data["monitor"] = {"renotify_after": 60}
+
+        with patch("amqpeek.cli.read_config", return_value=config_data):
+            for count in (1, 1, 0):
+                queue_count_patch.return_value = count
+                result = cli_runner.invoke(main, ["--state"])
+
+                assert result.exit_code == 0
+
+        assert [call.args for call in mock_notifiers[0].notify.call_args_list] == [
+            ("Queue Length Error", 'Queue "my_queue" is over specified limit!! (1 > 0)'),
+            ("Recovered", 'Queue "my_queue" is back within its limit (0 <= 0)'),
+        ]
+
+    @pytest.mark.usefixtures("connector_patch")
+    def test_cli_state_in_use(
+        self,
+        mock_notifiers: tuple,
+        queue_count_patch: MagicMock,
+        cli_runner: CliRunner,
+        config_data: dict,
+    ) -> None:
+        """Test a run carries on without the state while another run holds it."""
+        config_data["monitor"] = {"renotify_after": 60, "state": True}
+        queue_count_patch.return_value = 1
+
+        with patch("amqpeek.cli.read_config", return_value=config_data), patch(
+            "amqpeek.state.StateStore.lock", return_value=False
+        ):
+            for _ in range(2):
+                cli_runner.invoke(main)
+
+        assert mock_notifiers[0].notify.call_count == 2
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_unknown_engine_in_config(
+        self, cli_runner: CliRunner, config_data: dict
+    ) -> None:
+        """Test an error is shown when the config names an unknown engine."""
+        config_data["monitor"] = {"engine": "carrier-pigeon"}
+
+        with patch("amqpeek.cli.read_config", return_value=config_data):
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        assert result.output == (
+            'Unknown engine "carrier-pigeon" in configuration file\n'
+        )
 
     @patch("amqpeek.cli.open")
     def test_cli_no_config(
@@ -159,3 +405,79 @@ class TestCli(object):
         assert result.output == (
             "An AMQPeek config already exists in the current directory\n"
         )
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_concurrency_must_be_positive(
+        self, cli_runner: CliRunner, config_file: str
+    ) -> None:
+        """Test a concurrency below 1 is rejected on the command line."""
+        result = cli_runner.invoke(
+            main, ["-c{}".format(config_file), "-e", "asyncio", "--concurrency", "0"]
+        )
+
+        assert result.exit_code == 2
+
+    @pytest.mark.usefixtures("mock_notifiers")
+    def test_cli_invalid_concurrency_in_config(
+        self, cli_runner: CliRunner, config_data: dict
+    ) -> None:
+        """Test an error is shown when the config concurrency is below 1."""
+        config_data["monitor"] = {"engine": "asyncio", "concurrency": 0}
+
+        with patch("amqpeek.cli.read_config", return_value=config_data):
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        assert result.output == (
+            "Concurrency in configuration file must be a whole number of at least 1\n"
+        )
+
+    @pytest.mark.usefixtures("queue_count_patch")
+    def test_cli_several_brokers(
+        self,
+        mock_notifiers: tuple,
+        cli_runner: CliRunner,
+        config_data: dict,
+        connector_patch: MagicMock,
+    ) -> None:
+        """Test every broker in the config is checked, tagging its notifications."""
+        connection = config_data["rabbit_connection"]
+        config_data["rabbit_connection"] = [
+            dict(connection, name="eu-1", host="rmq-eu-1"),
+            dict(connection, name="us-1", host="rmq-us-1"),
+        ]
+        config_data["monitor"] = {"workers": 2}
+        connector_patch.side_effect = AMQPConnectionError
+
+        with patch("amqpeek.cli.read_config", return_value=config_data):
+            result = cli_runner.invoke(main)
+
+        assert result.exit_code == 0
+        assert connector_patch.call_count == 2
+        mock_notifiers[0].notify.assert_any_call(
+            "[eu-1] Connection Error", 'Error connecting to host: "rmq-eu-1"'
+        )
+        mock_notifiers[0].notify.assert_any_call(
+            "[us-1] Connection Error", 'Error connecting to host: "rmq-us-1"'
+        )
+
+    @pytest.mark.usefixtures("connector_patch")
+    def test_cli_digest(
+        self,
+        mock_notifiers: tuple,
+        queue_count_patch: MagicMock,
+        cli_runner: CliRunner,
+        config_file: str,
+    ) -> None:
+        """Test the alerts of a test are sent as one message with --digest."""
+        queue_count_patch.return_value = 2
+        result = cli_runner.invoke(main, ["-c{}".format(config_file), "--digest"])
+
+        assert result.exit_code == 0
+        mock_notifiers[0].notify.assert_called_once()
+        subject, message = mock_notifiers[0].notify.call_args.args
+
+        assert subject == "2 alerts"
+        assert message.startswith("Queue Length Error (2)\n")
+        assert 'Queue "my_queue" is over specified limit!! (2 > 0)' in message
+        assert 'Queue "my_other_queue" is over specified limit!! (2 > 1)' in message
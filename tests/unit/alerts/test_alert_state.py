@@ -0,0 +1,92 @@
+"""Tests for the alerts module."""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from amqpeek.alerts import AlertState
+
+
+class TestAlertState(object):
+    """Tests for the AlertState class."""
+
+    @pytest.fixture
+    def alert_state(self) -> AlertState:
+        """Alert state re-notifying after a minute, tracking three alerts."""
+        return AlertState(renotify_after=60, max_size=3, clock=Mock(return_value=0.0))
+
+    def test_new_alert_sent(self, alert_state: AlertState) -> None:
+        """Test an alert is sent the first time it is seen."""
+        assert alert_state.should_send(("eu-1", "orders", "Queue Length Error"))
+        assert len(alert_state) == 1
+
+    def test_active_alert_suppressed(self, alert_state: AlertState) -> None:
+        """Test an active alert is not sent again until the TTL has passed."""
+        alert_state.should_send("orders")
+        alert_state.clock.return_value = 59.0
+
+        assert not alert_state.should_send("orders")
+
+        alert_state.clock.return_value = 60.0
+
+        assert alert_state.should_send("orders")
+        assert not alert_state.should_send("orders")
+
+    def test_clear(self, alert_state: AlertState) -> None:
+        """Test clearing an active alert reports its recovery, once."""
+        alert_state.should_send("orders")
+
+        assert alert_state.clear("orders")
+        assert not alert_state.clear("orders")
+        assert alert_state.should_send("orders")
+
+    def test_least_recently_seen_evicted_when_full(
+        self, alert_state: AlertState
+    ) -> None:
+        """Test the least recently seen alert makes room for a new one."""
+        for key in ("a", "b", "c"):
+            alert_state.should_send(key)
+
+        # Seeing "a" again makes "b" the least recently seen
+        alert_state.should_send("a")
+        alert_state.should_send("d")
+
+        assert list(alert_state.active) == ["c", "a", "d"]
+
+    def test_alerts_not_seen_for_ttl_evicted(self, alert_state: AlertState) -> None:
+        """Test alerts no longer seen are dropped once the TTL has passed."""
+        alert_state.should_send("a")
+        alert_state.clock.return_value = 30.0
+        alert_state.should_send("b")
+        alert_state.clock.return_value = 60.0
+        alert_state.should_send("c")
+
+        assert list(alert_state.active) == ["b", "c"]
+
+        alert_state.clock.return_value = 200.0
+        alert_state.should_send("d")
+
+        assert list(alert_state.active) == ["d"]
+
+    def test_dump_and_restore(self, alert_state: AlertState) -> None:
+        """Test active alerts carry over to another clock, by wall clock time."""
+        alert_state.should_send("orders")
+        alert_state.clock.return_value = 50.0
+        alert_state.should_send("refunds")
+
+        with patch("amqpeek.alerts.time.time", return_value=1050.0):
+            alerts = alert_state.dump()
+
+        assert alerts == [("orders", 1000.0, 1000.0), ("refunds", 1050.0, 1050.0)]
+
+        restored = AlertState(renotify_after=60, clock=Mock(return_value=5.0))
+
+        # The next run starts 20 seconds later, on a clock that started since
+        with patch("amqpeek.alerts.time.time", return_value=1070.0):
+            restored.restore(alerts)
+
+        # "orders" was last seen 70 seconds ago, so has been evicted
+        assert list(restored.active) == ["refunds"]
+        restored.clock.return_value = 44.0
+        assert not restored.should_send("refunds")
+        restored.clock.return_value = 45.0
+        assert restored.should_send("refunds")
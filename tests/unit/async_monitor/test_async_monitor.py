@@ -0,0 +1,391 @@
+"""Tests for the asyncio monitor module."""
+import asyncio
+from types import SimpleNamespace
+from typing import Callable, Dict, Generator, List, Optional
+from unittest.mock import Mock, patch
+
+import pytest
+from fake_broker import FakeBroker
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPConnectionError, ChannelClosedByBroker
+
+from amqpeek.async_monitor import AsyncChannel, AsyncioMonitor
+from amqpeek.monitor import Connector
+
+
+class FakeChannel(object):
+    """Stand-in for a pika channel on an asyncio connection."""
+
+    def __init__(self, connection: "FakeConnection") -> None:
+        """Create an open channel on the given connection."""
+        self.connection = connection
+        self.is_open = True
+        self.close_callbacks: List[Callable] = []
+
+    def add_on_close_callback(self, callback: Callable) -> None:
+        """Register a close callback."""
+        self.close_callbacks.append(callback)
+
+    def queue_declare(self, queue: str, passive: bool, callback: Callable) -> None:
+        """Reply to the passive declare on the next loop iteration."""
+        assert passive
+        self.connection.in_flight += 1
+        self.connection.max_in_flight = max(
+            self.connection.max_in_flight, self.connection.in_flight
+        )
+        asyncio.get_running_loop().call_soon(self.reply, queue, callback)
+
+    def reply(self, queue: str, callback: Callable) -> None:
+        """Send declare-ok, or close the channel when the queue is missing."""
+        self.connection.in_flight -= 1
+        message_count = self.connection.queues.get(queue)
+
+        if message_count is None:
+            self.is_open = False
+            for close_callback in self.close_callbacks:
+                close_callback(self, ChannelClosedByBroker(404, "NOT_FOUND"))
+        else:
+            callback(
+                SimpleNamespace(method=SimpleNamespace(message_count=message_count))
+            )
+
+    def close(self) -> None:
+        """Close the channel."""
+        self.is_open = False
+
+
+class FakeConnection(object):
+    """Stand-in for an asyncio connection holding some queues."""
+
+    def __init__(self, queues: Dict[str, int]) -> None:
+        """Create a connection to a broker with the given queues."""
+        self.queues = queues
+        self.is_open = True
+        self.is_closing = False
+        self.is_closed = False
+        self.close_callbacks: List[Callable] = []
+        self.channels_opened = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def add_on_close_callback(self, callback: Callable) -> None:
+        """Register a close callback."""
+        self.close_callbacks.append(callback)
+
+    def close(self) -> None:
+        """Close the connection, completing on the next loop iteration."""
+        self.is_open = False
+        self.is_closing = True
+        asyncio.get_running_loop().call_soon(self.closed)
+
+    def closed(self) -> None:
+        """Finish closing the connection."""
+        self.is_closing = False
+        self.is_closed = True
+
+        for callback in self.close_callbacks:
+            callback(self, None)
+
+    def channel(self, on_open_callback: Callable) -> FakeChannel:
+        """Open a channel."""
+        self.channels_opened += 1
+        channel = FakeChannel(self)
+        asyncio.get_running_loop().call_soon(on_open_callback, channel)
+
+        return channel
+
+
+class TestAsyncioMonitor(object):
+    """Tests for the AsyncioMonitor class."""
+
+    @pytest.fixture
+    def queues(self) -> Dict[str, int]:
+        """The queues known to the broker."""
+        return {"queue_{}".format(i): i for i in range(20)}
+
+    @pytest.fixture
+    def connection(self, queues: Dict[str, int]) -> FakeConnection:
+        """A stand-in connection to the broker."""
+        return FakeConnection(queues)
+
+    @pytest.fixture
+    def monitor(self, connection: FakeConnection) -> AsyncioMonitor:
+        """Creates an asyncio monitor using the stand-in connection."""
+        queue_details = [("queue_{}".format(i), 10) for i in range(20)]
+        monitor = AsyncioMonitor(
+            connector=Mock(), queue_details=queue_details, concurrency=4
+        )
+        monitor.notifiers = [Mock()]
+
+        async def connect() -> FakeConnection:
+            return connection
+
+        async def close(connection: Optional[FakeConnection]) -> None:
+            pass
+
+        monitor.connect = connect  # type: ignore
+        monitor.close = close  # type: ignore
+
+        return monitor
+
+    def test_queue_length_errors_notified_in_queue_order(
+        self, monitor: AsyncioMonitor
+    ) -> None:
+        """Test queues over their limit are notified, in the configured order."""
+        monitor.run()
+
+        assert [call.args for call in monitor.notifiers[0].notify.call_args_list] == [
+            (
+                "Queue Length Error",
+                'Queue "queue_{0}" is over specified limit!! ({0} > 10)'.format(i),
+            )
+            for i in range(11, 20)
+        ]
+
+    def test_concurrency_is_limited(
+        self, monitor: AsyncioMonitor, connection: FakeConnection
+    ) -> None:
+        """Test declares are in flight at once, but never more than the limit."""
+        monitor.run()
+
+        assert connection.max_in_flight == 4
+        assert connection.channels_opened == 4
+
+    def test_missing_queue_replaces_channel(
+        self, monitor: AsyncioMonitor, connection: FakeConnection, queues: dict
+    ) -> None:
+        """Test a missing queue is notified and does not affect the other queues."""
+        del queues["queue_0"]
+        del queues["queue_15"]
+
+        monitor.run()
+
+        notify = monitor.notifiers[0].notify
+        notify.assert_any_call(
+            "Queue does not exist", 'Queue "queue_0" has not been declared'
+        )
+        notify.assert_any_call(
+            "Queue does not exist", 'Queue "queue_15" has not been declared'
+        )
+        assert notify.call_count == 10
+        assert connection.channels_opened == 6
+
+    def test_connection_error_sends_correct_notification(
+        self, monitor: AsyncioMonitor
+    ) -> None:
+        """Test the correct notification is sent when failing to connect to RMQ."""
+
+        async def connect() -> None:
+            raise AMQPConnectionError
+
+        monitor.connect = connect  # type: ignore
+        monitor.connector.host = "localhost"
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "localhost"'
+        )
+
+    def test_not_connected_while_breaker_open(self, monitor: AsyncioMonitor) -> None:
+        """Test RMQ is not connected to while backing off from it."""
+        monitor.connect = Mock()  # type: ignore
+        monitor.breaker = Mock()
+        monitor.breaker.allow.return_value = False
+
+        monitor.run()
+
+        monitor.connect.assert_not_called()
+        monitor.notifiers[0].notify.assert_not_called()
+
+    @patch("amqpeek.async_monitor.AsyncioConnection")
+    def test_connect_failure_raises_connection_error(
+        self, connection_mock: Mock
+    ) -> None:
+        """Test connection failures reported by pika raise AMQPConnectionError."""
+
+        def fail(**kwargs: Callable) -> None:
+            kwargs["on_open_error_callback"](None, OSError("refused"))
+
+        connection_mock.side_effect = fail
+        monitor = AsyncioMonitor(connector=Mock(), queue_details=[])
+
+        with pytest.raises(AMQPConnectionError):
+            asyncio.run(monitor.connect())
+
+    def test_persistent_connection_reused(
+        self, monitor: AsyncioMonitor, connection: FakeConnection
+    ) -> None:
+        """Test a persistent monitor connects once and waits on its event loop."""
+        connects = []
+
+        async def connect() -> FakeConnection:
+            connects.append(connection)
+            return connection
+
+        monitor.connect = connect  # type: ignore
+        del monitor.close
+        monitor.persistent = True
+        monitor.interval = 0
+        monitor.max_connections = 2
+
+        monitor.run()
+
+        assert len(connects) == 1
+        assert monitor.reconnects == 0
+        assert connection.is_closed
+        assert monitor.loop is None
+
+    @patch("amqpeek.monitor.time")
+    def test_waits_without_connection(
+        self, time_mock: Mock, monitor: AsyncioMonitor
+    ) -> None:
+        """Test a monitor without a long-lived connection sleeps between checks."""
+        monitor.interval = 1
+        monitor.max_connections = 2
+        clock = monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+        time_mock.sleep.side_effect = lambda seconds: setattr(
+            clock, "return_value", clock.return_value + seconds
+        )
+
+        monitor.run()
+
+        time_mock.sleep.assert_called_with(60)
+
+    def test_lost_persistent_connection_reestablished(
+        self, monitor: AsyncioMonitor, queues: Dict[str, int]
+    ) -> None:
+        """Test a long-lived connection closed between checks is replaced."""
+        connections = [FakeConnection(queues), FakeConnection(queues)]
+        opened = iter(connections)
+
+        async def connect() -> FakeConnection:
+            return next(opened)
+
+        async def wait(seconds: float) -> None:
+            connections[0].is_open = False
+
+        monitor.connect = connect  # type: ignore
+        del monitor.close
+        monitor.persistent = True
+        monitor.interval = 0
+        monitor.max_connections = 2
+        monitor.wait = lambda seconds: (  # type: ignore
+            monitor.get_loop().run_until_complete(wait(seconds))
+        )
+
+        monitor.run()
+
+        assert monitor.reconnects == 1
+        assert connections[1].is_closed
+
+    def test_connection_lost_during_check(
+        self, monitor: AsyncioMonitor, connection: FakeConnection
+    ) -> None:
+        """Test a connection lost mid check is dropped, closed and notified."""
+
+        async def fetch_queues(connection: FakeConnection, queue_details: list) -> None:
+            raise AMQPConnectionError
+
+        monitor.fetch_queues = fetch_queues  # type: ignore
+        del monitor.close
+        monitor.persistent = True
+        monitor.connector.host = "localhost"
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "localhost"'
+        )
+        assert connection.is_closed
+        assert monitor.connection is None
+
+    def test_shutdown_before_check(self, monitor: AsyncioMonitor) -> None:
+        """Test shutting down before any check does not create an event loop."""
+        monitor.shutdown()
+
+        assert monitor.loop is None
+
+
+class TestAsyncChannel(object):
+    """Tests for the AsyncChannel class."""
+
+    def test_close_without_pending_declare(self) -> None:
+        """Test closing a channel with no declare in flight is ignored."""
+        channel = AsyncChannel(Mock())
+
+        channel.on_close(channel.channel, ChannelClosedByBroker(404, "NOT_FOUND"))
+
+        assert channel.pending is None
+
+
+class TestAsyncioMonitorWithBroker(object):
+    """Tests for the AsyncioMonitor against the fake AMQP broker."""
+
+    @pytest.fixture
+    def broker(self) -> Generator:
+        """A running fake broker holding a few queues."""
+        with FakeBroker({"queue_{}".format(i): i for i in range(5)}) as broker:
+            yield broker
+
+    @pytest.fixture
+    def monitor(self, broker: FakeBroker) -> AsyncioMonitor:
+        """Creates an asyncio monitor connected to the fake broker."""
+        connector = Connector(
+            host=broker.host, port=broker.port, vhost="/", user="guest", passwd="guest"
+        )
+        queue_details = [("queue_{}".format(i), 2) for i in range(7)]
+        monitor = AsyncioMonitor(
+            connector=connector, queue_details=queue_details, concurrency=2
+        )
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_check_against_broker(self, monitor: AsyncioMonitor) -> None:
+        """Test queues over their limit and missing queues are notified."""
+        monitor.run()
+
+        assert [call.args for call in monitor.notifiers[0].notify.call_args_list] == [
+            ("Queue Length Error", 'Queue "queue_3" is over specified limit!! (3 > 2)'),
+            ("Queue Length Error", 'Queue "queue_4" is over specified limit!! (4 > 2)'),
+            ("Queue does not exist", 'Queue "queue_5" has not been declared'),
+            ("Queue does not exist", 'Queue "queue_6" has not been declared'),
+        ]
+
+    def test_connection_closed_after_check(self, monitor: AsyncioMonitor) -> None:
+        """Test the connection is closed cleanly at the end of the check."""
+        opened = []
+        connect = monitor.connect
+
+        async def record_connect() -> AsyncioConnection:
+            opened.append(await connect())
+            return opened[-1]
+
+        monitor.connect = record_connect  # type: ignore
+
+        monitor.run()
+
+        assert opened[0].is_closed
+
+    def test_connection_lost_while_opening_channel(
+        self, monitor: AsyncioMonitor, broker: FakeBroker
+    ) -> None:
+        """Test a connection dropped while opening a channel is notified."""
+        broker.drop_on_channel_open = True
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "127.0.0.1"'
+        )
+
+    def test_connection_refused(self, monitor: AsyncioMonitor) -> None:
+        """Test a refused connection is notified."""
+        monitor.connector.port = 1
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "127.0.0.1"'
+        )
@@ -0,0 +1,96 @@
+"""Tests for the breaker module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+class TestCircuitBreaker(object):
+    """Tests for the CircuitBreaker class."""
+
+    @pytest.fixture
+    def breaker(self) -> CircuitBreaker:
+        """Creates a breaker waiting 10 seconds, doubling up to 60, without jitter."""
+        return CircuitBreaker(
+            base_delay=10,
+            max_delay=60,
+            jitter=0,
+            clock=Mock(return_value=0.0),
+            rng=Mock(return_value=0.5),
+        )
+
+    def test_closed_allows(self, breaker: CircuitBreaker) -> None:
+        """Test connections are attempted until one fails."""
+        assert breaker.allow()
+        assert breaker.state == CLOSED
+        assert breaker.retry_in() == 0
+
+    def test_failure_opens(self, breaker: CircuitBreaker) -> None:
+        """Test a failure opens the breaker until its delay has passed."""
+        assert breaker.failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+        breaker.clock.return_value = 9.0  # type: ignore
+
+        assert breaker.retry_in() == 1
+        assert not breaker.allow()
+
+        breaker.clock.return_value = 10.0  # type: ignore
+
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert breaker.retry_in() == 0
+
+    def test_backoff(self, breaker: CircuitBreaker) -> None:
+        """Test each failed probe doubles the delay, up to the max delay."""
+        delays = []
+
+        for _ in range(5):
+            breaker.failure()
+            delays.append(breaker.retry_in())
+
+        assert delays == [10, 20, 40, 60, 60]
+
+    def test_failed_probe_not_new(self, breaker: CircuitBreaker) -> None:
+        """Test only the failure of a closed breaker is reported as going down."""
+        assert breaker.failure()
+
+        breaker.clock.return_value = 10.0  # type: ignore
+        breaker.allow()
+
+        assert not breaker.failure()
+        assert breaker.state == OPEN
+
+    def test_success_closes(self, breaker: CircuitBreaker) -> None:
+        """Test a successful probe closes the breaker, starting the backoff again."""
+        assert not breaker.success()
+
+        breaker.failure()
+        breaker.failure()
+        breaker.clock.return_value = 100.0  # type: ignore
+
+        assert breaker.allow()
+        assert breaker.success()
+        assert breaker.state == CLOSED
+
+        breaker.failure()
+
+        assert breaker.retry_in() == 10
+
+    def test_jitter(self, breaker: CircuitBreaker) -> None:
+        """Test up to the jitter of each delay is taken off at random."""
+        breaker.jitter = 0.5
+
+        breaker.failure()
+
+        assert breaker.retry_in() == 7.5
+
+    def test_long_outage(self, breaker: CircuitBreaker) -> None:
+        """Test the delay stays at the max delay however long the broker is down."""
+        breaker.failures = 5000
+
+        breaker.failure()
+
+        assert breaker.retry_in() == 60
@@ -1,7 +1,7 @@
 """Tests for the correct reading of the queue config."""
 from copy import deepcopy
 
-from amqpeek.cli import build_queue_data
+from amqpeek.cli import build_queue_data, build_queue_intervals
 
 
 class TestFormatQueues:
@@ -50,3 +50,11 @@ class TestFormatQueues:
         result = build_queue_data({})
 
         assert result == []
+
+    def test_queue_intervals(self, config_data: dict) -> None:
+        """Test only queues with an interval of their own are scheduled apart."""
+        config_data = deepcopy(config_data)
+        config_data["queues"]["audit"] = {"limit": 10, "interval": 5}
+
+        assert build_queue_intervals(config_data) == {"audit": 5}
+        assert build_queue_intervals({}) == {}
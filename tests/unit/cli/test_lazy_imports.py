@@ -0,0 +1,30 @@
+"""Tests for importing the engines and notifiers only when used."""
+import subprocess
+import sys
+
+from amqpeek.cli import ENGINE_MAP, load_engine
+from amqpeek.management import ManagementMonitor
+
+
+def test_slow_clients_not_imported_at_startup() -> None:
+    """Test the command line starts without importing any engine or notifier."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, amqpeek.cli; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set(result.stdout.split())
+
+    for module in ("asyncio", "http.server", "pika", "requests", "slacker", "yaml"):
+        assert module not in modules
+
+
+def test_load_engine() -> None:
+    """Test each engine is imported when loaded."""
+    assert load_engine("management") is ManagementMonitor
+    assert all(load_engine(engine) for engine in ENGINE_MAP)
@@ -0,0 +1,463 @@
+"""Tests for merging the monitor settings."""
+from amqpeek.cli import (
+    build_broker_configs,
+    build_monitor_settings,
+    build_queue_data,
+    create_adaptive_interval,
+    create_alert_state,
+    create_breaker,
+    create_connector,
+    create_discovery,
+    create_drain_rule,
+    create_growth_rule,
+    validate_monitor_settings,
+)
+from amqpeek.discovery import QueueDiscovery
+from amqpeek.management import ManagementConnector
+from amqpeek.monitor import Connector
+
+
+class TestBuildMonitorSettings(object):
+    """Tests for merging the monitor settings from config and command line."""
+
+    def test_defaults(self) -> None:
+        """Test the blocking engine is used when nothing is configured."""
+        assert build_monitor_settings({}) == {"engine": "blocking"}
+
+    def test_config_settings_used(self) -> None:
+        """Test the settings in the config file are used."""
+        app_config = {"monitor": {"engine": "asyncio", "concurrency": 10}}
+
+        assert build_monitor_settings(app_config, engine=None, concurrency=None) == {
+            "engine": "asyncio",
+            "concurrency": 10,
+        }
+
+    def test_command_line_overrides_config(self) -> None:
+        """Test settings given on the command line win over the config file."""
+        app_config = {"monitor": {"engine": "blocking", "concurrency": 10}}
+
+        assert build_monitor_settings(app_config, engine="asyncio", concurrency=5) == {
+            "engine": "asyncio",
+            "concurrency": 5,
+        }
+
+
+class TestValidateMonitorSettings(object):
+    """Tests for validating the monitor settings."""
+
+    def test_valid_settings(self) -> None:
+        """Test valid settings have no error."""
+        settings = {"engine": "asyncio", "concurrency": 4}
+
+        assert validate_monitor_settings(settings, {}) is None
+
+    def test_management_engine_needs_management_config(self) -> None:
+        """Test the management engine is rejected without management settings."""
+        assert validate_monitor_settings({"engine": "management"}, {}) == (
+            "The management engine requires management settings "
+            "in the configuration file"
+        )
+
+    def test_management_engine_needs_management_config_per_broker(self) -> None:
+        """Test every broker needs management settings for the management engine."""
+        app_config = {
+            "rabbit_connection": [
+                {"host": "rmq-eu-1", "management": {"host": "rmq-eu-1"}},
+                {"host": "rmq-us-1"},
+            ]
+        }
+
+        assert validate_monitor_settings({"engine": "management"}, app_config) == (
+            "The management engine requires management settings "
+            "in the configuration file"
+        )
+
+    def test_patterns_need_management_config(self, config_data: dict) -> None:
+        """Test queue patterns are rejected without management settings."""
+        config_data["queues"]["orders.*"] = {"limit": 10}
+
+        assert validate_monitor_settings({"engine": "blocking"}, config_data) == (
+            "Queue patterns require management settings in the configuration file"
+        )
+
+    def test_invalid_pattern(self, config_data: dict) -> None:
+        """Test a regex that does not compile is rejected."""
+        config_data["management"] = {"host": "rmq"}
+        config_data["queue_limits"][1].append("re:orders[")
+
+        error = validate_monitor_settings({"engine": "blocking"}, config_data)
+
+        assert error.startswith(
+            'Invalid queue pattern "re:orders[" in configuration file: '
+        )
+
+    def test_valid_patterns(self, config_data: dict) -> None:
+        """Test valid patterns with management settings have no error."""
+        config_data["management"] = {"host": "rmq"}
+        config_data["queue_limits"][1].append("re:orders\\.\\d+")
+
+        assert validate_monitor_settings({"engine": "blocking"}, config_data) is None
+
+    def test_inline_flags_pattern(self, config_data: dict) -> None:
+        """Test a regex starting with global inline flags is not rejected."""
+        config_data["management"] = {"host": "rmq"}
+        config_data["queue_limits"][1].append("re:(?i)orders.*")
+
+        assert validate_monitor_settings({"engine": "blocking"}, config_data) is None
+
+    def test_queue_interval_must_be_positive(self, config_data: dict) -> None:
+        """Test a queue interval that is not a number above 0 is rejected."""
+        for interval in (0, -1, "5", True):
+            config_data["queues"]["audit"] = {"limit": 10, "interval": interval}
+
+            assert validate_monitor_settings({"engine": "blocking"}, config_data) == (
+                'Interval of queue "audit" in configuration file '
+                "must be a number above 0"
+            )
+
+    def test_queue_interval_not_for_patterns(self, config_data: dict) -> None:
+        """Test a queue pattern cannot have an interval of its own."""
+        config_data["management"] = {"host": "rmq"}
+        config_data["queues"]["orders.*"] = {"limit": 10, "interval": 5}
+
+        assert validate_monitor_settings({"engine": "blocking"}, config_data) == (
+            'Queue pattern "orders.*" in configuration file '
+            "cannot have its own interval"
+        )
+
+    def test_valid_queue_interval(self, config_data: dict) -> None:
+        """Test a queue interval above 0 has no error."""
+        config_data["queues"]["audit"] = {"limit": 10, "interval": 0.5}
+
+        assert validate_monitor_settings({"engine": "blocking"}, config_data) is None
+
+    def test_unknown_overflow_policy(self) -> None:
+        """Test an unknown notification queue overflow policy is rejected."""
+        app_config = {"notification_queue": {"overflow": "shrug"}}
+
+        assert validate_monitor_settings({"engine": "blocking"}, app_config) == (
+            'Unknown overflow policy "shrug" in configuration file'
+        )
+
+    def test_alert_state_size_must_be_positive(self) -> None:
+        """Test an alert state size below 1 is rejected."""
+        settings = {"engine": "blocking", "alert_state_size": 0}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "Alert state size in configuration file must be a whole number "
+            "of at least 1"
+        )
+
+    def test_workers_must_be_positive(self) -> None:
+        """Test a workers setting below 1 is rejected."""
+        settings = {"engine": "blocking", "workers": 0}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "Workers in configuration file must be a whole number of at least 1"
+        )
+
+    def test_processes_must_be_positive(self) -> None:
+        """Test a processes setting below 1 is rejected."""
+        settings = {"engine": "sharded", "processes": 0}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "Processes in configuration file must be a whole number of at least 1"
+        )
+
+    def test_history_size_must_be_positive(self) -> None:
+        """Test a history size below 1 is rejected."""
+        settings = {"engine": "blocking", "history_size": 0}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "History size in configuration file must be a whole number of at least 1"
+        )
+
+    def test_growth_window_within_history(self) -> None:
+        """Test a growth window of one sample, or longer than the history, is rejected."""
+        for settings in [
+            {"engine": "blocking", "growth_window": 1},
+            {"engine": "blocking", "growth_window": 11, "history_size": 10},
+        ]:
+            assert validate_monitor_settings(settings, {}) == (
+                "Growth window in configuration file must be at least 2 "
+                "and no more than the history size"
+            )
+
+    def test_drain_window_within_history(self) -> None:
+        """Test a drain window of one sample, or longer than the history, is rejected."""
+        for settings in [
+            {"engine": "blocking", "drain_window": 1},
+            {"engine": "blocking", "drain_window": 11, "history_size": 10},
+        ]:
+            assert validate_monitor_settings(settings, {}) == (
+                "Drain window in configuration file must be at least 2 "
+                "and no more than the history size"
+            )
+
+    def test_drain_backlog_must_be_positive(self) -> None:
+        """Test a drain backlog of no messages is rejected."""
+        settings = {"engine": "blocking", "drain_backlog": 0}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "Drain backlog in configuration file must be a whole number of at least 1"
+        )
+
+    def test_adaptive_intervals_must_be_positive(self) -> None:
+        """Test adaptive intervals that are not numbers above 0 are rejected."""
+        for setting, label in (("min_interval", "Min"), ("max_interval", "Max")):
+            error = "{} interval in configuration file must be a number above 0"
+
+            for value in (0, -1, "1", True):
+                settings = {"engine": "blocking", setting: value}
+
+                assert validate_monitor_settings(settings, {}) == error.format(label)
+
+    def test_min_interval_not_above_max(self) -> None:
+        """Test a shortest interval longer than the longest is rejected."""
+        settings = {"engine": "blocking", "min_interval": 5, "max_interval": 1}
+
+        assert validate_monitor_settings(settings, {}) == (
+            "Min interval in configuration file must not be above the max interval"
+        )
+        assert (
+            validate_monitor_settings(
+                {"engine": "blocking", "min_interval": 0.5, "max_interval": 1}, {}
+            )
+            is None
+        )
+
+    def test_reconnect_settings(self, config_data: dict) -> None:
+        """Test reconnect settings out of range are rejected, for any broker."""
+        settings = {"engine": "blocking"}
+        config_data["rabbit_connection"] = [
+            {"host": "rmq-eu-1", "reconnect": {"base_delay": 1, "jitter": 0.2}},
+            {"host": "rmq-us-1"},
+        ]
+
+        assert validate_monitor_settings(settings, config_data) is None
+
+        for reconnect, error in (
+            ([1], "Reconnect in configuration file must be a map of settings"),
+            (
+                {"delay": 1},
+                'Unknown reconnect setting "delay" in configuration file',
+            ),
+            (
+                {"base_delay": 0},
+                "Reconnect base_delay in configuration file must be a number above 0",
+            ),
+            (
+                {"max_delay": "1"},
+                "Reconnect max_delay in configuration file must be a number above 0",
+            ),
+            (
+                {"multiplier": 0.5},
+                "Reconnect multiplier in configuration file must be a number "
+                "of at least 1",
+            ),
+            (
+                {"jitter": 2},
+                "Reconnect jitter in configuration file must be from 0 to 1",
+            ),
+            (
+                {"base_delay": 10, "max_delay": 5},
+                "Reconnect base_delay in configuration file must not be above "
+                "the max_delay",
+            ),
+        ):
+            config_data["rabbit_connection"][1]["reconnect"] = reconnect
+
+            assert validate_monitor_settings(settings, config_data) == error
+
+
+class TestCreateConnector(object):
+    """Tests for creating the connector used by the engine."""
+
+    def test_management_connector(self, config_data: dict) -> None:
+        """Test the management engine connects to the management API."""
+        config_data["management"] = {"host": "rmq", "user": "guest", "passwd": "guest"}
+
+        connector = create_connector("management", config_data)
+
+        assert isinstance(connector, ManagementConnector)
+        assert connector.host == "rmq"
+
+    def test_amqp_connector(self, config_data: dict) -> None:
+        """Test the AMQP engines connect to RMQ."""
+        assert isinstance(create_connector("asyncio", config_data), Connector)
+
+
+class TestBuildBrokerConfigs(object):
+    """Tests for splitting the config per broker."""
+
+    def test_single_connection(self, config_data: dict) -> None:
+        """Test a single connection is used as it is."""
+        assert build_broker_configs(config_data) == [config_data]
+
+    def test_list_of_connections(self, config_data: dict) -> None:
+        """Test each connection gets its own config, falling back to the top level."""
+        config_data["rabbit_connection"] = [
+            {
+                "name": "eu-1",
+                "host": "rmq-eu-1",
+                "queues": {"orders": {"limit": 5}},
+                "queue_limits": {},
+            },
+            {"host": "rmq-us-1", "management": {"host": "rmq-us-1"}},
+        ]
+
+        eu_config, us_config = build_broker_configs(config_data)
+
+        assert eu_config["name"] == "eu-1"
+        assert eu_config["rabbit_connection"] == {"host": "rmq-eu-1"}
+        assert build_queue_data(eu_config) == [("orders", 5)]
+        assert "management" not in eu_config
+
+        assert us_config["name"] == "rmq-us-1"
+        assert us_config["rabbit_connection"] == {"host": "rmq-us-1"}
+        assert us_config["queues"] == config_data["queues"]
+        assert us_config["management"] == {"host": "rmq-us-1"}
+
+    def test_reconnect_per_connection(self, config_data: dict) -> None:
+        """Test each connection may have its own reconnect settings."""
+        config_data["reconnect"] = {"max_delay": 60}
+        config_data["rabbit_connection"] = [
+            {"host": "rmq-eu-1", "reconnect": {"max_delay": 600}},
+            {"host": "rmq-us-1"},
+        ]
+
+        eu_config, us_config = build_broker_configs(config_data)
+
+        assert eu_config["rabbit_connection"] == {"host": "rmq-eu-1"}
+        assert eu_config["reconnect"] == {"max_delay": 600}
+        assert us_config["reconnect"] == {"max_delay": 60}
+
+
+class TestCreateDiscovery(object):
+    """Tests for creating the discovery of queues selected by pattern."""
+
+    def test_no_patterns(self, config_data: dict) -> None:
+        """Test there is no discovery when every queue is given by name."""
+        assert create_discovery({}, config_data) is None
+
+    def test_patterns(self, config_data: dict) -> None:
+        """Test queues given by pattern are discovered through the management API."""
+        config_data["management"] = {"host": "rmq", "user": "guest", "passwd": "guest"}
+        config_data["queues"]["orders.*"] = {"limit": 10}
+
+        discovery = create_discovery({"discovery_ttl": 30}, config_data)
+
+        assert isinstance(discovery, QueueDiscovery)
+        assert discovery.connector.host == "rmq"
+        assert discovery.ttl == 30
+        assert discovery.matcher.match("orders.eu") == 10
+        assert create_discovery({}, config_data).ttl == 300
+
+
+class TestCreateAlertState(object):
+    """Tests for creating the table of alerts sent."""
+
+    def test_every_alert_sent(self) -> None:
+        """Test there is no alert state unless a re-notify time is given."""
+        assert create_alert_state({}) is None
+
+    def test_alert_state(self) -> None:
+        """Test the re-notify time is given in minutes."""
+        alert_state = create_alert_state({"renotify_after": 30})
+
+        assert alert_state.renotify_after == 30 * 60
+        assert alert_state.max_size == 10000
+
+    def test_alert_state_size(self) -> None:
+        """Test the number of alerts tracked can be set."""
+        alert_state = create_alert_state(
+            {"renotify_after": 30, "alert_state_size": 100}
+        )
+
+        assert alert_state.max_size == 100
+
+
+class TestCreateGrowthRule(object):
+    """Tests for creating the rule alerting on fast growing queues."""
+
+    def test_no_growth_rule(self) -> None:
+        """Test there is no growth rule unless a time to limit is set."""
+        assert create_growth_rule({"growth_window": 5}) is None
+
+    def test_growth_rule(self) -> None:
+        """Test the time to limit is converted from minutes."""
+        growth_rule = create_growth_rule({"time_to_limit": 5})
+
+        assert growth_rule.time_to_limit == 5 * 60
+        assert growth_rule.window == 10
+
+    def test_growth_window(self) -> None:
+        """Test the growth window in the config is used."""
+        growth_rule = create_growth_rule({"time_to_limit": 5, "growth_window": 3})
+
+        assert growth_rule.window == 3
+
+
+class TestCreateDrainRule(object):
+    """Tests for creating the rule alerting on queues not draining."""
+
+    def test_no_drain_rule(self) -> None:
+        """Test there is no drain rule unless a backlog is set."""
+        assert create_drain_rule({"drain_window": 5}) is None
+
+    def test_drain_rule(self) -> None:
+        """Test the backlog and drain window in the config are used."""
+        drain_rule = create_drain_rule({"drain_backlog": 50, "drain_window": 3})
+
+        assert drain_rule.backlog == 50
+        assert drain_rule.window == 3
+        assert create_drain_rule({"drain_backlog": 50}).window == 10
+
+
+class TestCreateAdaptiveInterval(object):
+    """Tests for creating the policy adapting the interval between tests."""
+
+    def test_not_adaptive(self) -> None:
+        """Test the interval is fixed unless a min or max interval is set."""
+        assert create_adaptive_interval({}, 1) is None
+        assert create_adaptive_interval({"max_interval": 5}, None) is None
+
+    def test_adaptive(self) -> None:
+        """Test the intervals are converted from minutes."""
+        adaptive = create_adaptive_interval({"min_interval": 0.5, "max_interval": 5}, 1)
+
+        assert adaptive.min_period == 30
+        assert adaptive.max_period == 300
+
+    def test_interval_as_default(self) -> None:
+        """Test the interval is used for the bound not set."""
+        adaptive = create_adaptive_interval({"max_interval": 5}, 1)
+
+        assert (adaptive.min_period, adaptive.max_period) == (60, 300)
+
+        adaptive = create_adaptive_interval({"min_interval": 0.5}, 1)
+
+        assert (adaptive.min_period, adaptive.max_period) == (30, 60)
+
+        adaptive = create_adaptive_interval({"max_interval": 0.5}, 1)
+
+        assert (adaptive.min_period, adaptive.max_period) == (30, 30)
+
+
+class TestCreateBreaker(object):
+    """Tests for creating the circuit breaker of a broker."""
+
+    def test_no_breaker(self, config_data: dict) -> None:
+        """Test RMQ is connected to every test without reconnect settings."""
+        assert create_breaker(config_data) is None
+
+    def test_breaker(self, config_data: dict) -> None:
+        """Test the reconnect settings are used, with defaults for the rest."""
+        config_data["reconnect"] = {"base_delay": 1, "jitter": 0.1}
+
+        breaker = create_breaker(config_data)
+
+        assert (breaker.base_delay, breaker.max_delay) == (1, 300)
+        assert (breaker.multiplier, breaker.jitter) == (2, 0.1)
+        assert create_breaker({"reconnect": {}}).base_delay == 5
@@ -1,7 +1,14 @@
 """Tests for reading the config file."""
+import os
+from pathlib import Path
+from unittest.mock import patch
+
 import pytest
+import yaml
+from _pytest.monkeypatch import MonkeyPatch
 
 from amqpeek import cli
+from amqpeek.config_cache import ConfigCache, default_cache_dir
 
 
 class TestReadConfig(object):
@@ -19,3 +26,86 @@ class TestReadConfig(object):
         """Tests the correct exception is raised when the config is not found."""
         with pytest.raises(IOError):
             cli.read_config("non_existent_file")
+
+
+class TestConfigCache(object):
+    """Tests reading the config through the cache of parsed configs."""
+
+    @pytest.fixture
+    def cache(self, cache_dir: str) -> ConfigCache:
+        """A cache in a directory of its own."""
+        return ConfigCache(cache_dir)
+
+    def test_default_cache_dir(self, cache_dir: str) -> None:
+        """Test the cache is kept under the XDG cache directory."""
+        assert default_cache_dir() == cache_dir
+
+    def test_default_cache_dir_in_home(self, monkeypatch: MonkeyPatch) -> None:
+        """Test the cache is kept under ~/.cache without an XDG cache directory."""
+        monkeypatch.delenv("XDG_CACHE_HOME")
+
+        assert default_cache_dir() == os.path.join(
+            os.path.expanduser("~"), ".cache", "amqpeek"
+        )
+
+    def test_cached_config_not_parsed(
+        self, cache: ConfigCache, config_data: dict, config_file: str
+    ) -> None:
+        """Test an unchanged config is read from the cache without parsing it."""
+        assert cli.read_config(config_file, cache) == config_data
+
+        with patch("yaml.load") as load_mock:
+            assert cli.read_config(config_file, cache) == config_data
+
+        load_mock.assert_not_called()
+
+    def test_changed_config_parsed(
+        self, cache: ConfigCache, config_data: dict, config_file: str
+    ) -> None:
+        """Test a config changed since it was cached is parsed again."""
+        cli.read_config(config_file, cache)
+        stat = os.stat(config_file)
+        config_data["queues"]["my_queue"]["limit"] = 5
+
+        with open(config_file, "w") as config:
+            config.write(yaml.dump(config_data))
+
+        # Even with the modification time unchanged
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        assert cli.read_config(config_file, cache) == config_data
+
+    def test_config_not_marshallable(self, cache: ConfigCache, tmp_path: Path) -> None:
+        """Test a config with values marshal cannot store is parsed every time."""
+        config_file = str(tmp_path / "config.yaml")
+
+        with open(config_file, "w") as config:
+            config.write("released: 2020-01-01\n")
+
+        cli.read_config(config_file, cache)
+
+        assert not os.path.exists(cache.cache_dir)
+        assert str(cli.read_config(config_file, cache)["released"]) == "2020-01-01"
+
+    def test_unreadable_cache_ignored(
+        self, cache: ConfigCache, config_data: dict, config_file: str
+    ) -> None:
+        """Test a corrupt cache file is ignored and replaced."""
+        cli.read_config(config_file, cache)
+        (cache_file,) = os.listdir(cache.cache_dir)
+
+        with open(os.path.join(cache.cache_dir, cache_file), "wb") as corrupt:
+            corrupt.write(b"not marshal")
+
+        assert cli.read_config(config_file, cache) == config_data
+        assert cli.read_config(config_file, cache) == config_data
+
+    def test_unwritable_cache_ignored(
+        self, config_data: dict, config_file: str, tmp_path: Path
+    ) -> None:
+        """Test the config is still read when the cache cannot be written."""
+        blocker = tmp_path / "blocker"
+        blocker.touch()
+        cache = ConfigCache(str(blocker / "amqpeek"))
+
+        assert cli.read_config(config_file, cache) == config_data
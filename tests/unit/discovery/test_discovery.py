@@ -0,0 +1,295 @@
+"""Tests for the discovery module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.async_monitor import AsyncioMonitor
+from amqpeek.discovery import (
+    compile_pattern,
+    is_pattern,
+    QueueDiscovery,
+    QueueMatcher,
+)
+from amqpeek.exceptions import ManagementApiError
+from amqpeek.management import ManagementMonitor
+from amqpeek.monitor import Monitor
+
+QUEUE_NAMES = [
+    "orders",
+    "orders.tenant-1",
+    "orders.tenant-22",
+    "orders.tenant-x",
+    "invoices.eu",
+    "invoices.us",
+    "audit",
+]
+
+
+class TestPatterns(object):
+    """Tests for telling patterns from queue names and compiling them."""
+
+    @pytest.mark.parametrize(
+        "queue_name, expected",
+        [
+            ("orders", False),
+            ("orders.tenant-*", True),
+            ("orders.tenant-?", True),
+            ("orders.[ab]", True),
+            ("re:orders", True),
+        ],
+    )
+    def test_is_pattern(self, queue_name: str, expected: bool) -> None:
+        """Test globs and regexes are told apart from exact queue names."""
+        assert is_pattern(queue_name) is expected
+
+    @pytest.mark.parametrize(
+        "pattern, prefix",
+        [
+            ("orders.tenant-*", "orders.tenant-"),
+            ("orders.[ab]?", "orders."),
+            ("re:orders\\.tenant-\\d+", "orders"),
+            ("re:orders+", "order"),
+            ("re:o*", ""),
+            ("re:orders|invoices", ""),
+            ("re:orders", "orders"),
+        ],
+    )
+    def test_compile_pattern_prefix(self, pattern: str, prefix: str) -> None:
+        """Test the literal prefix shared by every match of a pattern."""
+        assert compile_pattern(pattern)[1] == prefix
+
+
+class TestQueueMatcher(object):
+    """Tests for the QueueMatcher class."""
+
+    def test_exact_names_kept(self) -> None:
+        """Test queues given by exact name are always selected, even when missing."""
+        matcher = QueueMatcher([("orders", 5), ("missing", 1)])
+
+        assert sorted(matcher.resolve(QUEUE_NAMES)) == [("missing", 1), ("orders", 5)]
+
+    def test_glob(self) -> None:
+        """Test a glob selects every queue it matches."""
+        matcher = QueueMatcher([("orders.tenant-*", 10)])
+
+        assert matcher.resolve(QUEUE_NAMES) == [
+            ("orders.tenant-1", 10),
+            ("orders.tenant-22", 10),
+            ("orders.tenant-x", 10),
+        ]
+
+    def test_regex(self) -> None:
+        """Test a regex must match the whole queue name."""
+        matcher = QueueMatcher([("re:orders\\.tenant-\\d+", 10), ("re:invoices", 1)])
+
+        assert matcher.resolve(QUEUE_NAMES) == [
+            ("orders.tenant-1", 10),
+            ("orders.tenant-22", 10),
+        ]
+
+    def test_lowest_limit_used(self) -> None:
+        """Test the lowest limit is used when a queue matches several patterns."""
+        matcher = QueueMatcher(
+            [
+                ("orders.*", 10),
+                ("re:orders\\.tenant-(\\d)(\\d)", 2),
+                ("re:.*\\.tenant-.*", 5),
+            ]
+        )
+
+        assert matcher.match("orders.tenant-22") == 2
+        assert matcher.match("orders.tenant-1") == 5
+        assert matcher.match("orders.eu") == 10
+        assert matcher.match("orders") is None
+
+    def test_exact_name_wins(self) -> None:
+        """Test the limit given for an exact name is used over any pattern."""
+        matcher = QueueMatcher([("orders.tenant-1", 50), ("orders.*", 10)])
+
+        assert sorted(matcher.resolve(QUEUE_NAMES)) == [
+            ("orders.tenant-1", 50),
+            ("orders.tenant-22", 10),
+            ("orders.tenant-x", 10),
+        ]
+
+    def test_names_shorter_than_prefix(self) -> None:
+        """Test names shorter than a pattern's prefix are not matched."""
+        matcher = QueueMatcher([("a*", 1), ("invoices.*", 1)])
+
+        assert matcher.resolve(["a", "audit", "inv"]) == [("a", 1), ("audit", 1)]
+
+    def test_backreferences(self) -> None:
+        """Test backreferences match their own groups, wherever their pattern is."""
+        matcher = QueueMatcher([("re:(x)\\1", 1), ("re:(y)\\1", 2), ("re:z+", 3)])
+
+        assert matcher.match("xx") == 1
+        assert matcher.match("yy") == 2
+        assert matcher.match("zz") == 3
+        assert matcher.match("xy") is None
+
+    def test_named_groups(self) -> None:
+        """Test patterns may use the same group names."""
+        matcher = QueueMatcher([("re:(?P<n>a)b", 1), ("re:(?P<n>a)c", 2)])
+
+        assert matcher.match("ab") == 1
+        assert matcher.match("ac") == 2
+
+    def test_inline_flags(self) -> None:
+        """Test global inline flags apply to their own pattern only."""
+        matcher = QueueMatcher([("re:(?i)orders.*", 10), ("re:audit.*", 1)])
+
+        assert matcher.match("ORDERS.1") == 10
+        assert matcher.match("audit.eu") == 1
+        assert matcher.match("AUDIT.eu") is None
+
+    def test_lowest_limit_over_standalone(self) -> None:
+        """Test a combined pattern with a lower limit wins over a standalone one."""
+        matcher = QueueMatcher([("re:(o)\\1.*", 10), ("re:oo.*", 5)])
+
+        assert matcher.match("oops") == 5
+
+
+class TestQueueDiscovery(object):
+    """Tests for the QueueDiscovery class."""
+
+    @pytest.fixture
+    def discovery(self) -> QueueDiscovery:
+        """Discovery of tenant queues, listing from a mocked connector."""
+        connector = Mock()
+        connector.host = "rmq"
+        connector.iter_queues.return_value = [{"name": name} for name in QUEUE_NAMES]
+
+        return QueueDiscovery(
+            connector,
+            QueueMatcher([("orders", 5), ("orders.tenant-*", 10)]),
+            ttl=60,
+            clock=Mock(return_value=0.0),
+        )
+
+    def test_resolve(self, discovery: QueueDiscovery) -> None:
+        """Test the patterns are resolved against the listed queues."""
+        assert discovery.resolve() == [
+            ("orders", 5),
+            ("orders.tenant-1", 10),
+            ("orders.tenant-22", 10),
+            ("orders.tenant-x", 10),
+        ]
+        discovery.connector.iter_queues.assert_called_once_with(["name"])
+
+    def test_listing_cached(self, discovery: QueueDiscovery) -> None:
+        """Test the broker is only listed again once the TTL has passed."""
+        discovery.resolve()
+        discovery.clock.return_value = 59.0
+        discovery.resolve()
+
+        assert discovery.connector.iter_queues.call_count == 1
+
+        discovery.clock.return_value = 60.0
+        discovery.connector.iter_queues.return_value = [{"name": "orders.tenant-3"}]
+
+        assert discovery.resolve() == [("orders", 5), ("orders.tenant-3", 10)]
+        assert discovery.connector.iter_queues.call_count == 2
+
+    def test_listing_error(self, discovery: QueueDiscovery) -> None:
+        """Test the last resolved queues are kept when the broker cannot be listed."""
+        resolved = discovery.resolve()
+        discovery.clock.return_value = 60.0
+        discovery.connector.iter_queues.side_effect = ManagementApiError
+
+        with pytest.raises(ManagementApiError):
+            discovery.resolve()
+
+        assert discovery.queue_details == resolved
+
+
+class TestMonitorDiscovery(object):
+    """Tests for monitors checking queues selected by pattern."""
+
+    @pytest.fixture
+    def discovery(self) -> Mock:
+        """Mocked discovery of tenant queues."""
+        discovery = Mock()
+        discovery.connector.host = "rmq-api"
+        discovery.resolve.return_value = [("orders.tenant-1", 10)]
+        discovery.queue_details = [("orders", 5)]
+
+        return discovery
+
+    def test_discovered_queues_checked(self, discovery: Mock) -> None:
+        """Test the discovered queues are checked rather than the patterns."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders.tenant-*", 10)],
+            discovery=discovery,
+        )
+        monitor.check_queues = Mock()
+
+        monitor.check()
+
+        monitor.check_queues.assert_called_once_with(
+            monitor.connector.connect.return_value, [("orders.tenant-1", 10)]
+        )
+
+    def test_discovery_error(self, discovery: Mock) -> None:
+        """Test a notification is sent and the last known queues checked on error."""
+        discovery.resolve.side_effect = ManagementApiError
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders.tenant-*", 10)],
+            discovery=discovery,
+        )
+        monitor.notifiers = [Mock()]
+        monitor.check_queues = Mock()
+
+        monitor.check()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Discovery Error", 'Error listing queues on host: "rmq-api"'
+        )
+        monitor.check_queues.assert_called_once_with(
+            monitor.connector.connect.return_value, [("orders", 5)]
+        )
+
+    def test_management_monitor(self, discovery: Mock) -> None:
+        """Test the management engine fetches the discovered queues."""
+        monitor = ManagementMonitor(
+            connector=Mock(), queue_details=[("orders.*", 10)], discovery=discovery
+        )
+        monitor.connector.get_queues.return_value = {
+            "orders.tenant-1": {"messages": 11}
+        }
+        monitor.notifiers = [Mock()]
+
+        monitor.check()
+
+        assert list(monitor.connector.get_queues.call_args.args[0]) == [
+            "orders.tenant-1"
+        ]
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Queue Length Error",
+            'Queue "orders.tenant-1" is over specified limit!! (11 > 10)',
+        )
+
+    def test_asyncio_monitor(self, discovery: Mock) -> None:
+        """Test the asyncio engine declares the discovered queues."""
+        monitor = AsyncioMonitor(
+            connector=Mock(), queue_details=[("orders.*", 10)], discovery=discovery
+        )
+        fetched = []
+
+        async def connect() -> Mock:
+            return Mock(is_closed=True)
+
+        async def fetch_queues(connection: Mock, queue_details: list) -> dict:
+            fetched.extend(queue_details)
+
+            return {queue_name: Mock() for queue_name, _ in queue_details}
+
+        monitor.connect = connect  # type: ignore
+        monitor.fetch_queues = fetch_queues  # type: ignore
+        monitor.get_queue_message_count = Mock(return_value=0)  # type: ignore
+
+        monitor.check()
+        monitor.shutdown()
+
+        assert fetched == [("orders.tenant-1", 10)]
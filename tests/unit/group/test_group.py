@@ -0,0 +1,220 @@
+"""Tests for the group module."""
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from amqpeek.group import MonitorGroup
+from amqpeek.monitor import Monitor
+
+
+class TestMonitorGroup(object):
+    """Tests for the MonitorGroup class."""
+
+    @pytest.fixture
+    def monitors(self) -> list:
+        """Create monitors of two brokers with mocked checks."""
+        monitors = []
+
+        for name in ("eu-1", "us-1"):
+            monitor = Monitor(connector=Mock(), queue_details=[], name=name)
+            monitor.check = Mock()
+            monitor.wait = Mock()
+            monitor.shutdown = Mock()
+            monitors.append(monitor)
+
+        return monitors
+
+    def test_stats_cycle_ended(self, monitors: list) -> None:
+        """Test the stats of the checks are kept once every broker is checked."""
+        stats = Mock()
+        MonitorGroup(monitors, interval=1, max_connections=2, stats=stats).run()
+
+        assert stats.end_cycle.call_count == 2
+
+    def test_monitors_share_notify_lock(self, monitors: list) -> None:
+        """Test notifications of all the brokers are serialised by one lock."""
+        MonitorGroup(monitors)
+
+        assert monitors[0].notify_lock is monitors[1].notify_lock
+
+    def test_workers_default_to_all_monitors(self, monitors: list) -> None:
+        """Test every broker is checked at once unless told otherwise."""
+        assert MonitorGroup(monitors).workers == 2
+        assert MonitorGroup(monitors, workers=1).workers == 1
+
+    def test_add_notifier(self, monitors: list) -> None:
+        """Test the notifier is added to every monitor."""
+        notifier = Mock()
+        group = MonitorGroup(monitors)
+
+        group.add_notifier(notifier)
+
+        assert monitors[0].notifiers == [notifier]
+        assert monitors[1].notifiers == [notifier]
+
+    def test_remove_notifier(self, monitors: list) -> None:
+        """Test the notifier is removed from every monitor."""
+        notifier = Mock()
+        group = MonitorGroup(monitors)
+        group.add_notifier(notifier)
+
+        group.remove_notifier(notifier)
+
+        assert group.notifiers == []
+        assert monitors[0].notifiers == []
+        assert monitors[1].notifiers == []
+
+    def test_reloader_polled_between_checks(self, monitors: list) -> None:
+        """Test changes to the config are looked for after each wait."""
+        group = MonitorGroup(monitors, interval=1, max_connections=3)
+        group.reloader = Mock()
+
+        group.run()
+
+        assert group.reloader.poll.call_count == 2
+
+    def test_run_once(self, monitors: list) -> None:
+        """Test every broker is checked then shut down when there is no interval."""
+        MonitorGroup(monitors).run()
+
+        for monitor in monitors:
+            monitor.check.assert_called_once_with()
+            monitor.wait.assert_not_called()
+            monitor.shutdown.assert_called_once_with()
+
+    def test_run_interval_and_max_connections(self, monitors: list) -> None:
+        """Test the brokers are checked until max_connections is reached."""
+        MonitorGroup(monitors, interval=1, max_connections=3).run()
+
+        for monitor in monitors:
+            assert monitor.check.call_count == 3
+            assert monitor.wait.call_count == 3
+            monitor.wait.assert_called_with(60)
+            monitor.shutdown.assert_called_once_with()
+
+    def test_waits_until_next_broker_due(self, monitors: list) -> None:
+        """Test the brokers wait until the next check of any of them is due."""
+        monitors[0].interval = 1
+        monitors[1].interval = 2
+
+        for monitor in monitors:
+            monitor.schedule().clock = Mock(side_effect=[0.0, 10.0])
+
+        MonitorGroup(monitors, interval=1, max_connections=1).run()
+
+        for monitor in monitors:
+            monitor.wait.assert_called_once_with(50.0)
+
+    def test_brokers_checked_in_parallel(self, monitors: list) -> None:
+        """Test a cycle takes as long as the slowest broker, not the sum."""
+        started = threading.Barrier(len(monitors), timeout=5)
+
+        for monitor in monitors:
+            # Each check only finishes once all of them have started
+            monitor.check = Mock(side_effect=started.wait)
+
+        MonitorGroup(monitors).run()
+
+        for monitor in monitors:
+            monitor.check.assert_called_once_with()
+
+    def test_checks_limited_to_workers(self, monitors: list) -> None:
+        """Test no more brokers are checked at once than there are workers."""
+        running = []
+        most_running = []
+
+        def check() -> None:
+            running.append(None)
+            most_running.append(len(running))
+            time.sleep(0.01)
+            running.pop()
+
+        for monitor in monitors:
+            monitor.check = Mock(side_effect=check)
+
+        MonitorGroup(monitors, workers=1).run()
+
+        assert max(most_running) == 1
+
+    def test_waits_not_limited_by_workers(self, monitors: list) -> None:
+        """Test every broker waits at once, however few workers there are."""
+        started = threading.Barrier(len(monitors), timeout=5)
+
+        for monitor in monitors:
+            # Each wait only finishes once all of them have started
+            monitor.wait = Mock(side_effect=lambda seconds: started.wait())
+
+        MonitorGroup(monitors, interval=1, max_connections=1, workers=1).run()
+
+        for monitor in monitors:
+            monitor.wait.assert_called_once_with(60)
+
+    @patch("amqpeek.group.logging")
+    def test_errors_contained(self, logging_mock: Mock, monitors: list) -> None:
+        """Test an unexpected error checking one broker is logged, and not raised."""
+        monitors[0].check.side_effect = RuntimeError
+
+        MonitorGroup(monitors, interval=1, max_connections=2).run()
+
+        assert monitors[1].check.call_count == 2
+        logging_mock.exception.assert_called_with(
+            'Error in %s of broker "%s"', "run_cycle", "eu-1"
+        )
+
+    @patch("amqpeek.group.logging")
+    def test_cycle_time_logged(self, logging_mock: Mock, monitors: list) -> None:
+        """Test the time taken to check all the brokers is logged."""
+        with patch("amqpeek.group.time.monotonic", side_effect=[10.0, 10.5]):
+            MonitorGroup(monitors).run()
+
+        logging_mock.info.assert_called_once_with("Checked %d brokers in %.3fs", 2, 0.5)
+
+    def test_notifications_tagged_with_broker(self, monitors: list) -> None:
+        """Test notifications sent by each broker are tagged with its name."""
+        notifier = Mock()
+        group = MonitorGroup(monitors)
+        group.add_notifier(notifier)
+
+        for monitor in monitors:
+            monitor.check = Mock(side_effect=monitor.connection_error)
+
+        monitors[0].connector.host = "rmq-eu-1"
+        monitors[1].connector.host = "rmq-us-1"
+
+        group.run()
+
+        notifier.notify.assert_any_call(
+            "[eu-1] Connection Error", 'Error connecting to host: "rmq-eu-1"'
+        )
+        notifier.notify.assert_any_call(
+            "[us-1] Connection Error", 'Error connecting to host: "rmq-us-1"'
+        )
+
+    def test_digest(self, monitors: list) -> None:
+        """Test the alerts of every broker are sent as one message per notifier."""
+        notifier = Mock()
+        group = MonitorGroup(monitors, digest=True)
+        group.add_notifier(notifier)
+
+        for monitor in monitors:
+            monitor.check = Mock(side_effect=monitor.connection_error)
+
+        monitors[0].connector.host = "rmq-eu-1"
+        monitors[1].connector.host = "rmq-us-1"
+
+        group.run()
+
+        notifier.notify.assert_called_once()
+        subject, message = notifier.notify.call_args.args
+
+        assert subject == "2 alerts"
+        assert (
+            '[eu-1] Connection Error (1)\n  Error connecting to host: "rmq-eu-1"'
+            in message
+        )
+        assert (
+            '[us-1] Connection Error (1)\n  Error connecting to host: "rmq-us-1"'
+            in message
+        )
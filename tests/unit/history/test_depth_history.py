@@ -0,0 +1,238 @@
+"""Tests for the history module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.history import DepthHistory
+
+
+class TestDepthHistory(object):
+    """Tests for the DepthHistory class."""
+
+    @pytest.fixture
+    def history(self) -> DepthHistory:
+        """History of the last three cycles, with a cycle every minute."""
+        return DepthHistory(size=3, clock=Mock(side_effect=[60.0, 120.0, 180.0, 240.0]))
+
+    def test_empty(self, history: DepthHistory) -> None:
+        """Test a queue never read has no history."""
+        assert len(history) == 0
+        assert "orders" not in history
+        assert history.samples("orders") == []
+        assert history.latest("orders") is None
+
+    def test_samples(self, history: DepthHistory) -> None:
+        """Test the samples of a queue are kept, oldest first."""
+        history.start_cycle()
+        history.record("orders", 5)
+        history.start_cycle()
+        history.record("orders", 8)
+
+        assert history.samples("orders") == [(60.0, 5), (120.0, 8)]
+        assert history.samples("orders", since=120.0) == [(120.0, 8)]
+        assert history.latest("orders") == (120.0, 8)
+        assert history.queue_names() == ["orders"]
+
+    def test_current(self, history: DepthHistory) -> None:
+        """Test the depth read this cycle is only current until the next cycle."""
+        history.record("orders", 5)
+
+        assert history.current("orders") == 5
+        assert history.current("refunds") is None
+
+        history.start_cycle()
+
+        assert history.current("orders") is None
+
+    def test_record_starts_first_cycle(self, history: DepthHistory) -> None:
+        """Test a sample recorded before any cycle started is kept."""
+        history.record("orders", 5)
+
+        assert history.samples("orders") == [(60.0, 5)]
+
+    def test_oldest_overwritten(self, history: DepthHistory) -> None:
+        """Test the oldest sample is dropped once the buffer is full."""
+        for depth in range(4):
+            history.start_cycle()
+            history.record("orders", depth)
+
+        assert history.samples("orders") == [(120.0, 1), (180.0, 2), (240.0, 3)]
+
+    def test_missed_cycles(self, history: DepthHistory) -> None:
+        """Test cycles where the queue was not read hold no sample."""
+        history.start_cycle()
+        history.record("orders", 5)
+        history.start_cycle()
+        history.start_cycle()
+        history.record("refunds", 1)
+
+        assert history.samples("orders") == [(60.0, 5)]
+        assert history.latest("orders") == (60.0, 5)
+        assert history.samples("refunds") == [(180.0, 1)]
+
+    def test_queue_forgotten(self, history: DepthHistory) -> None:
+        """Test a queue not read for a whole buffer of cycles is forgotten."""
+        history.start_cycle()
+        history.record("orders", 5)
+        history.start_cycle()
+        history.start_cycle()
+
+        assert "orders" in history
+
+        history.start_cycle()
+
+        assert "orders" not in history
+
+    def test_depth_clamped(self, history: DepthHistory) -> None:
+        """Test depths are kept within the range of the buffer."""
+        history.record("orders", 2 ** 40)
+        history.record("refunds", -1)
+
+        assert history.latest("orders") == (60.0, DepthHistory.MISSING - 1)
+        assert history.latest("refunds") == (60.0, 0)
+
+    def test_slopes(self) -> None:
+        """Test a line is fitted to the last samples of each queue."""
+        history = DepthHistory(size=5, clock=Mock(side_effect=[0.0, 60.0, 120.0, 180.0]))
+
+        for cycle in range(4):
+            history.start_cycle()
+            history.record("orders", cycle * 100)
+            history.record("refunds", 10)
+
+            # Only read for the last two cycles
+            if cycle >= 2:
+                history.record("returns", 4)
+
+        assert history.slopes(["orders", "refunds", "returns", "missing"], 4) == {
+            "orders": (300, pytest.approx(100 / 60)),
+            "refunds": (10, 0.0),
+        }
+        assert history.slopes(["returns"], 2) == {"returns": (4, 0.0)}
+
+    def test_slopes_skip_cycles_not_read(self) -> None:
+        """Test a queue not read every cycle is fitted to its own last samples."""
+        history = DepthHistory(
+            size=8, clock=Mock(side_effect=[0.0, 30.0, 60.0, 90.0, 120.0])
+        )
+
+        for cycle in range(5):
+            history.start_cycle()
+            history.record("orders", 10)
+
+            # Read every other cycle, such as at a longer interval
+            if cycle % 2 == 0:
+                history.record("audit", cycle * 60)
+
+        assert history.slopes(["orders", "audit"], 3) == {
+            "orders": (10, 0.0),
+            "audit": (240, pytest.approx(2.0)),
+        }
+        assert history.slopes(["audit"], 4) == {}
+
+    def test_slopes_need_full_window(self, history: DepthHistory) -> None:
+        """Test no line is fitted until there are enough cycles."""
+        history.record("orders", 5)
+
+        assert history.slopes(["orders"], 2) == {}
+        assert history.slopes(["orders"], 4) == {}
+
+    def test_slopes_need_time_to_pass(self) -> None:
+        """Test no line is fitted when every sample was taken at once."""
+        history = DepthHistory(size=3, clock=Mock(return_value=0.0))
+
+        for depth in range(2):
+            history.start_cycle()
+            history.record("orders", depth)
+
+        assert history.slopes(["orders"], 2) == {}
+
+    def test_flows(self) -> None:
+        """Test the rises and falls in the depth of each queue are added up."""
+        history = DepthHistory(
+            size=5, clock=Mock(side_effect=[0.0, 60.0, 120.0, 180.0])
+        )
+
+        for cycle, depth in enumerate([100, 400, 300, 500]):
+            history.start_cycle()
+            history.record("orders", depth)
+            history.record("refunds", 10)
+
+            # Only read for the last two cycles
+            if cycle >= 2:
+                history.record("returns", 4 - cycle)
+
+        assert history.flows(["orders", "refunds", "returns", "missing"], 4) == {
+            "orders": (500, pytest.approx(500 / 180), pytest.approx(100 / 180)),
+            "refunds": (10, 0.0, 0.0),
+        }
+        assert history.flows(["returns"], 2) == {"returns": (1, 0.0, 1 / 60)}
+
+    def test_flows_skip_cycles_not_read(self) -> None:
+        """Test a queue not read every cycle is added up over its own last samples."""
+        history = DepthHistory(
+            size=8, clock=Mock(side_effect=[0.0, 30.0, 60.0, 90.0, 120.0])
+        )
+
+        for cycle, depth in enumerate([100, 0, 400, 0, 300]):
+            history.start_cycle()
+            history.record("orders", 10)
+
+            if cycle % 2 == 0:
+                history.record("audit", depth)
+
+        assert history.flows(["audit"], 3) == {
+            "audit": (300, pytest.approx(300 / 120), pytest.approx(100 / 120)),
+        }
+
+    def test_flows_need_full_window(self, history: DepthHistory) -> None:
+        """Test no rates are worked out until there are enough cycles."""
+        history.record("orders", 5)
+
+        assert history.flows(["orders"], 2) == {}
+
+    def test_flows_need_time_to_pass(self) -> None:
+        """Test no rates are worked out when every sample was taken at once."""
+        history = DepthHistory(size=3, clock=Mock(return_value=0.0))
+
+        for depth in range(2):
+            history.start_cycle()
+            history.record("orders", depth)
+
+        assert history.flows(["orders"], 2) == {}
+
+    def test_dump_and_restore(self, history: DepthHistory) -> None:
+        """Test a history restored from its dump carries on where it was."""
+        history.record("orders", 5)
+        history.start_cycle()
+        history.record("orders", 7)
+        history.record("refunds", 1)
+
+        restored = DepthHistory(size=3, clock=Mock(return_value=180.0))
+
+        assert restored.restore(history.dump())
+        assert restored.samples("orders") == history.samples("orders")
+        assert restored.latest("refunds") == history.latest("refunds")
+
+        restored.start_cycle()
+        restored.record("orders", 9)
+
+        assert restored.samples("orders") == [(60.0, 5), (120.0, 7), (180.0, 9)]
+
+    def test_restore_other_size(self, history: DepthHistory) -> None:
+        """Test a history kept with another size is not restored."""
+        history.record("orders", 5)
+
+        restored = DepthHistory(size=4)
+
+        assert not restored.restore(history.dump())
+        assert "orders" not in restored
+
+    def test_compact(self) -> None:
+        """Test each queue takes four bytes per cycle."""
+        history = DepthHistory(size=1440)
+
+        for i in range(100):
+            history.record("queue_{}".format(i), i)
+
+        assert history.nbytes() == 1440 * 8 + 100 * 1440 * 4
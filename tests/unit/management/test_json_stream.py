@@ -0,0 +1,88 @@
+"""Tests for streaming the management API responses."""
+
+import io
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from amqpeek.management import iter_json_items, JsonStreamReader
+
+
+class OneByteStream(io.BytesIO):
+    """Stream returning a single byte per read, to split every value."""
+
+    def read(self, size: int = -1) -> bytes:
+        """Read at most one byte."""
+        return super().read(1)
+
+
+def read_items(document: Any, metadata: Dict[str, Any]) -> List[Any]:
+    """Stream the items of the document, one byte at a time."""
+    stream = OneByteStream(json.dumps(document, indent=1).encode("utf-8"))
+
+    return list(iter_json_items(stream, metadata))
+
+
+class TestIterJsonItems(object):
+    """Tests for the iter_json_items function."""
+
+    @pytest.fixture
+    def items(self) -> List[dict]:
+        """Queue items, including split numbers and multi-byte characters."""
+        return [
+            {"name": "orders", "messages": 123456, "consumers": 2},
+            {"name": "bébé ☃", "messages": 0.5, "consumers": None},
+            {"name": "empty", "messages": [], "consumers": {}},
+        ]
+
+    def test_plain_array(self, items: List[dict]) -> None:
+        """Test the items of a plain array are streamed."""
+        metadata: Dict[str, Any] = {}
+
+        assert read_items(items, metadata) == items
+        assert metadata == {}
+
+    def test_paginated_object(self, items: List[dict]) -> None:
+        """Test items and metadata are read from a paginated object."""
+        metadata: Dict[str, Any] = {}
+        document = {"filtered_count": 3, "items": items, "page": 1, "page_count": 2}
+
+        assert read_items(document, metadata) == items
+        assert metadata == {"filtered_count": 3, "page": 1, "page_count": 2}
+
+    def test_empty_listings(self) -> None:
+        """Test empty arrays and objects stream no items."""
+        assert read_items([], {}) == []
+        assert read_items({"items": []}, {}) == []
+        assert read_items({}, {}) == []
+
+    def test_invalid_json(self) -> None:
+        """Test invalid JSON raises a ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_items(io.BytesIO(b'[{"name": nope}]'), {}))
+
+    def test_truncated_json(self) -> None:
+        """Test a document cut short raises a ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_items(io.BytesIO(b'{"items": [1, 2'), {}))
+
+    def test_unexpected_character(self) -> None:
+        """Test a missing separator raises a ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_items(io.BytesIO(b"[1 2]"), {}))
+
+
+class TestJsonStreamReader(object):
+    """Tests for the JsonStreamReader class."""
+
+    def test_only_unread_data_buffered(self) -> None:
+        """Test values already read are dropped from the buffer."""
+        document = json.dumps(list(range(10000))).encode("utf-8")
+        reader = JsonStreamReader(io.BytesIO(document), chunk_size=64)
+        largest = 0
+
+        for _ in reader.array_items():
+            largest = max(largest, len(reader.buffer))
+
+        assert largest < 256
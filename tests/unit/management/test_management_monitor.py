@@ -0,0 +1,166 @@
+"""Tests for checking queues through the management API."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generator, List
+from unittest.mock import Mock
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from amqpeek.exceptions import ManagementApiError
+from amqpeek.management import ManagementConnector, ManagementMonitor
+from amqpeek.rules import DrainRule
+
+QUEUES = [
+    {"name": "queue_{}".format(i), "messages": i, "consumers": 1} for i in range(5)
+] + [{"name": "new_queue"}]
+
+
+class ManagementApiHandler(BaseHTTPRequestHandler):
+    """Serves canned pages of the queue listing."""
+
+    requests: List[str] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Serve a page of queues, or 401 without the right credentials."""
+        type(self).requests.append(self.path)
+
+        if self.headers["Authorization"] != "Basic Z3Vlc3Q6Z3Vlc3Q=":
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        page, page_size = int(query["page"][0]), int(query["page_size"][0])
+        columns = query["columns"][0].split(",")
+        items = [
+            {column: queue[column] for column in columns if column in queue}
+            for queue in QUEUES[(page - 1) * page_size : page * page_size]
+        ]
+        body = json.dumps(
+            {
+                "items": items,
+                "page": page,
+                "page_count": -(-len(QUEUES) // page_size),
+                "page_size": page_size,
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        """Keep the test output quiet."""
+
+
+class TestManagementMonitor(object):
+    """Tests for the ManagementMonitor class."""
+
+    @pytest.fixture
+    def server(self) -> Generator:
+        """A local stand-in for the management API."""
+        ManagementApiHandler.requests = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ManagementApiHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        yield server
+
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def connector(self, server: ThreadingHTTPServer) -> ManagementConnector:
+        """A connector to the stand-in API, fetching two queues per page."""
+        return ManagementConnector(
+            host="127.0.0.1",
+            port=server.server_address[1],
+            user="guest",
+            passwd="guest",
+            page_size=2,
+        )
+
+    @pytest.fixture
+    def monitor(self, connector: ManagementConnector) -> ManagementMonitor:
+        """Creates a management monitor using the stand-in API."""
+        monitor = ManagementMonitor(
+            connector=connector,
+            queue_details=[
+                ("queue_1", 2),
+                ("queue_4", 2),
+                ("missing_queue", 2),
+                ("new_queue", 2),
+            ],
+        )
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_all_pages_fetched(self, connector: ManagementConnector) -> None:
+        """Test every page of the listing is fetched with the columns filter."""
+        assert set(connector.get_queues()) == {queue["name"] for queue in QUEUES}
+        assert len(ManagementApiHandler.requests) == 3
+
+        query = parse_qs(urlparse(ManagementApiHandler.requests[0]).query)
+        assert query["columns"] == ["name,messages,consumers"]
+        assert urlparse(ManagementApiHandler.requests[0]).path == "/api/queues/%2F"
+
+    def test_only_wanted_queues_kept(self, connector: ManagementConnector) -> None:
+        """Test only the queues asked for are held in memory."""
+        assert connector.get_queues(["queue_0", "queue_3"]) == {
+            "queue_0": QUEUES[0],
+            "queue_3": QUEUES[3],
+        }
+
+    def test_check_notifies(self, monitor: ManagementMonitor) -> None:
+        """Test queues over their limit and missing queues are notified."""
+        monitor.run()
+
+        assert [call.args for call in monitor.notifiers[0].notify.call_args_list] == [
+            ("Queue Length Error", 'Queue "queue_4" is over specified limit!! (4 > 2)'),
+            ("Queue does not exist", 'Queue "missing_queue" has not been declared'),
+        ]
+
+    def test_consumers_read(self, monitor: ManagementMonitor) -> None:
+        """Test the consumers of each queue are read for the drain rule."""
+        monitor.drain_rule = DrainRule()
+
+        monitor.run()
+
+        assert monitor.consumers == {"queue_1": 1, "queue_4": 1, "new_queue": 0}
+
+    def test_not_fetched_while_breaker_open(self, monitor: ManagementMonitor) -> None:
+        """Test the API is not requested while backing off from it."""
+        monitor.breaker = Mock()
+        monitor.breaker.allow.return_value = False
+
+        monitor.run()
+
+        assert ManagementApiHandler.requests == []
+        monitor.notifiers[0].notify.assert_not_called()
+
+    def test_bad_credentials(
+        self, monitor: ManagementMonitor, connector: ManagementConnector
+    ) -> None:
+        """Test a rejected request is notified as a connection error."""
+        connector.passwd = "wrong"
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "127.0.0.1"'
+        )
+
+    def test_api_unavailable(
+        self, connector: ManagementConnector, server: ThreadingHTTPServer
+    ) -> None:
+        """Test an unreachable API raises a ManagementApiError."""
+        server.shutdown()
+        server.server_close()
+
+        with pytest.raises(ManagementApiError):
+            connector.get_queues()
@@ -0,0 +1,147 @@
+"""Tests for the metrics module."""
+import urllib.request
+from typing import Generator
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.metrics import CONTENT_TYPE, escape_label, MetricsExporter
+from amqpeek.monitor import Monitor
+
+
+def test_escape_label() -> None:
+    """Test backslashes, quotes and new lines in label values are escaped."""
+    assert escape_label('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+
+class TestMetricsExporter(object):
+    """Tests for the MetricsExporter class."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """A monitor of three queues, one not declared, after one check."""
+        monitor = Monitor(
+            connector=Mock(host="rmq-eu-1"),
+            queue_details=[("orders", 10), ("refunds", 0), ("missing", 5)],
+        )
+        monitor.get_queue_details()
+        monitor.history.start_cycle()
+        monitor.history.record("orders", 4)
+        monitor.history.record("refunds", 1)
+        monitor.check_duration = 0.25
+        monitor.connection_failures = 2
+
+        return monitor
+
+    @pytest.fixture
+    def exporter(self) -> Generator:
+        """An exporter serving on a free local port."""
+        exporter = MetricsExporter(host="127.0.0.1", port=0)
+        exporter.start()
+
+        yield exporter
+
+        exporter.close()
+
+    def test_render(self, monitor: Monitor) -> None:
+        """Test the results of the last check are rendered as metrics."""
+        exporter = MetricsExporter()
+        exporter.update(monitor)
+
+        lines = exporter.render().decode("utf-8").splitlines()
+
+        assert 'amqpeek_queue_messages{broker="rmq-eu-1",queue="orders"} 4' in lines
+        assert 'amqpeek_queue_limit{broker="rmq-eu-1",queue="orders"} 10' in lines
+        assert (
+            'amqpeek_queue_limit_ratio{broker="rmq-eu-1",queue="orders"} 0.4' in lines
+        )
+        assert 'amqpeek_check_duration_seconds{broker="rmq-eu-1"} 0.25' in lines
+        assert 'amqpeek_checks_total{broker="rmq-eu-1"} 1' in lines
+        assert 'amqpeek_connection_failures_total{broker="rmq-eu-1"} 2' in lines
+        assert "# TYPE amqpeek_checks_total counter" in lines
+        assert not any('queue="missing"' in line for line in lines)
+        # A queue without a limit has no ratio
+        assert not any(
+            line.startswith("amqpeek_queue_limit_ratio") and "refunds" in line
+            for line in lines
+        )
+
+    def test_render_drain(self, monitor: Monitor) -> None:
+        """Test the consumers and drain rates are rendered once read."""
+        monitor.consumers = {"orders": 2, "refunds": 0}
+        monitor.drain = {"orders": (2.5, 0.5, 2.0), "refunds": (0.0, 0.0, None)}
+        exporter = MetricsExporter()
+        exporter.update(monitor)
+
+        lines = exporter.render().decode("utf-8").splitlines()
+
+        assert 'amqpeek_queue_consumers{broker="rmq-eu-1",queue="orders"} 2' in lines
+        assert 'amqpeek_queue_drain_rate{broker="rmq-eu-1",queue="orders"} 2.5' in lines
+        assert (
+            'amqpeek_queue_ingress_rate{broker="rmq-eu-1",queue="orders"} 0.5' in lines
+        )
+        assert (
+            'amqpeek_queue_seconds_to_empty{broker="rmq-eu-1",queue="orders"} 2.0'
+            in lines
+        )
+        # A queue not getting shorter has no time to empty
+        assert not any(
+            line.startswith("amqpeek_queue_seconds_to_empty") and "refunds" in line
+            for line in lines
+        )
+
+    def test_render_not_due(self, monitor: Monitor) -> None:
+        """Test queues not due this check keep their last depth read."""
+        monitor.interval = 1
+        monitor.intervals = {"orders": 5, "missing": 5}
+        monitor.schedule().clock = Mock(side_effect=[0.0, 60.0])  # type: ignore
+        monitor.scheduler.pop_due()  # type: ignore
+        monitor.due = monitor.scheduler.pop_due()  # type: ignore
+        monitor.history.start_cycle()
+        monitor.history.record("refunds", 3)
+        exporter = MetricsExporter()
+        exporter.update(monitor)
+
+        lines = exporter.render().decode("utf-8").splitlines()
+
+        assert 'amqpeek_queue_messages{broker="rmq-eu-1",queue="orders"} 4' in lines
+        assert 'amqpeek_queue_messages{broker="rmq-eu-1",queue="refunds"} 3' in lines
+        assert not any('queue="missing"' in line for line in lines)
+
+    def test_render_cached(self, monitor: Monitor) -> None:
+        """Test the page is only rendered again once a broker has been checked."""
+        exporter = MetricsExporter()
+        exporter.update(monitor)
+        page = exporter.render()
+
+        assert exporter.render() is page
+
+        monitor.name = "eu-1"
+        exporter.update(monitor)
+
+        assert exporter.render() is not page
+        assert 'broker="eu-1"' in exporter.render().decode("utf-8")
+
+    def test_scrape(self, exporter: MetricsExporter, monitor: Monitor) -> None:
+        """Test the metrics are served at /metrics."""
+        exporter.update(monitor)
+
+        with urllib.request.urlopen(
+            "http://127.0.0.1:{}/metrics".format(exporter.port)
+        ) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read() == exporter.render()
+
+    def test_not_found(self, exporter: MetricsExporter) -> None:
+        """Test any other path is not found."""
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen("http://127.0.0.1:{}/".format(exporter.port))
+
+        assert error.value.code == 404
+
+    def test_close_not_started(self) -> None:
+        """Test closing an exporter that was never started does nothing."""
+        exporter = MetricsExporter()
+        exporter.close()
+
+        assert exporter.server is None
@@ -0,0 +1,167 @@
+"""Tests for recovering channels closed by missing queues."""
+
+from types import SimpleNamespace
+from typing import Dict, Generator, List
+from unittest.mock import Mock
+
+import pytest
+from fake_broker import FakeBroker
+from pika.exceptions import ChannelClosedByBroker, ChannelWrongStateError
+
+from amqpeek.monitor import ChannelPool, Connector, Monitor
+
+
+class StandInChannel(object):
+    """Stand-in for a blocking channel, closed by the broker on a missing queue."""
+
+    def __init__(self, queues: Dict[str, int]) -> None:
+        """Create an open channel to a broker with the given queues."""
+        self.queues = queues
+        self.is_open = True
+
+    def queue_declare(self, queue: str, passive: bool) -> SimpleNamespace:
+        """Passively declare the queue, as the broker would.
+
+        Raises:
+            ChannelWrongStateError: When the channel has been closed
+            ChannelClosedByBroker: When the queue has not been declared
+        """
+        if not self.is_open:
+            raise ChannelWrongStateError("Channel is closed.")
+
+        if queue not in self.queues:
+            self.is_open = False
+            raise ChannelClosedByBroker(404, "NOT_FOUND - no queue")
+
+        return SimpleNamespace(method=SimpleNamespace(message_count=self.queues[queue]))
+
+
+class StandInConnection(object):
+    """Stand-in for a blocking connection to a broker with the given queues."""
+
+    def __init__(self, queues: Dict[str, int]) -> None:
+        """Create an open connection."""
+        self.queues = queues
+        self.channels: List[StandInChannel] = []
+        self.is_open = True
+
+    def channel(self) -> StandInChannel:
+        """Open a new channel."""
+        self.channels.append(StandInChannel(self.queues))
+
+        return self.channels[-1]
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.is_open = False
+
+
+class TestChannelPool(object):
+    """Tests for the ChannelPool class."""
+
+    @pytest.fixture
+    def connection(self) -> StandInConnection:
+        """A stand-in connection with one queue."""
+        return StandInConnection({"my_queue": 0})
+
+    def test_idle_channel_reused(self, connection: StandInConnection) -> None:
+        """Test a released channel is handed out again."""
+        pool = ChannelPool(connection)
+        channel = pool.acquire()
+        pool.release(channel)
+
+        assert pool.acquire() is channel
+        assert pool.channels_opened == 1
+
+    def test_closed_channel_replaced(self, connection: StandInConnection) -> None:
+        """Test a channel closed while idle is replaced with a new one."""
+        pool = ChannelPool(connection)
+        channel = pool.acquire()
+        pool.release(channel)
+        channel.is_open = False
+
+        assert pool.acquire() is not channel
+        assert pool.channels_opened == 2
+
+    def test_closed_channel_not_kept(self, connection: StandInConnection) -> None:
+        """Test a closed channel is not returned to the pool."""
+        pool = ChannelPool(connection)
+        channel = pool.acquire()
+        channel.is_open = False
+        pool.release(channel)
+
+        assert pool.idle == []
+
+    def test_idle_channels_limited(self, connection: StandInConnection) -> None:
+        """Test no more than size idle channels are kept."""
+        pool = ChannelPool(connection, size=1)
+        channels = [pool.acquire(), pool.acquire()]
+
+        for channel in channels:
+            pool.release(channel)
+
+        assert pool.idle == channels[:1]
+
+
+class TestMissingQueueSweep(object):
+    """Tests a sweep of many queues, several of them missing."""
+
+    @pytest.fixture
+    def queue_details(self) -> List[tuple]:
+        """1,000 queues to check."""
+        return [("queue_{}".format(i), 10) for i in range(1000)]
+
+    @pytest.fixture
+    def missing(self) -> List[str]:
+        """The queues that have not been declared."""
+        return ["queue_0", "queue_1", "queue_500", "queue_998", "queue_999"]
+
+    @pytest.fixture
+    def queues(self, queue_details: List[tuple], missing: List[str]) -> dict:
+        """The queues known to the broker, every 100th over its limit."""
+        return {
+            name: 11 if i % 100 == 50 else 0
+            for i, (name, _) in enumerate(queue_details)
+            if name not in missing
+        }
+
+    def test_missing_queues_cost_one_channel_each(
+        self, queue_details: List[tuple], missing: List[str], queues: dict
+    ) -> None:
+        """Test missing queues don't affect the rest of the sweep."""
+        connection = StandInConnection(queues)
+        monitor = Monitor(connector=Mock(), queue_details=queue_details)
+        monitor.connector.connect.return_value = connection
+        monitor.notifiers = [Mock()]
+
+        monitor.run()
+
+        notified = [call.args for call in monitor.notifiers[0].notify.call_args_list]
+        assert [subject for subject, _ in notified].count("Queue does not exist") == 5
+        assert [subject for subject, _ in notified].count("Queue Length Error") == 10
+        assert len(connection.channels) == len(missing) + 1
+        monitor.connector.connect.assert_called_once_with()
+
+    @pytest.fixture
+    def broker(self, queues: dict) -> Generator:
+        """A running fake broker holding the queues."""
+        with FakeBroker(queues) as broker:
+            yield broker
+
+    def test_missing_queues_against_broker(
+        self, broker: FakeBroker, queue_details: List[tuple]
+    ) -> None:
+        """Test a sweep with missing queues against the fake AMQP broker."""
+        connector = Connector(
+            host=broker.host, port=broker.port, vhost="/", user="guest", passwd="guest"
+        )
+        monitor = Monitor(connector=connector, queue_details=queue_details)
+        monitor.notifiers = [Mock()]
+
+        monitor.check()
+
+        subjects = [call.args[0] for call in monitor.notifiers[0].notify.call_args_list]
+        assert subjects.count("Queue does not exist") == 5
+        assert subjects.count("Queue Length Error") == 10
+        assert monitor.channel_pool is not None
+        assert monitor.channel_pool.channels_opened == 6
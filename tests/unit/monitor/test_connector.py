@@ -60,3 +60,14 @@ class TestConnector(object):
         blocking_connection_mock.assert_called_once_with(
             parameters=connection_params_instance_mock
         )
+
+    @patch("amqpeek.monitor.ConnectionParameters")
+    def test_heartbeat_passed_to_connection(
+        self, connection_params_mock: MagicMock, connection_params: dict
+    ) -> None:
+        """Test the heartbeat is negotiated when one is configured."""
+        connector = Connector(heartbeat=30, **connection_params)
+
+        connector.connection_parameters()
+
+        assert connection_params_mock.call_args.kwargs["heartbeat"] == 30
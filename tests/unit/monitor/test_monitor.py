@@ -1,12 +1,17 @@
 """Tests for the monitor module."""
-
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import call, MagicMock, Mock, patch
 
 import pytest
-from pika.exceptions import AMQPConnectionError, ChannelClosed
+from pika.exceptions import AMQPConnectionError, AMQPError, ChannelClosed
 
+from amqpeek.alerts import AlertState
+from amqpeek.breaker import CircuitBreaker
+from amqpeek.exceptions import ManagementApiError
 from amqpeek.monitor import Monitor
 from amqpeek.notifier import Notifier
+from amqpeek.rules import DrainRule, GrowthRule
+from amqpeek.schedule import AdaptiveInterval
+from amqpeek.stats import Stats
 
 
 class TestMonitor(object):
@@ -23,6 +28,69 @@ class TestMonitor(object):
 
         return monitor
 
+    def test_depth_history(self, monitor: Monitor) -> None:
+        """Test the depth read each cycle is kept, with no sample when RMQ is down."""
+        monitor.get_queue_message_count = Mock(side_effect=[4, 7])
+        monitor.connector.connect = Mock(
+            side_effect=[Mock(), AMQPConnectionError, Mock()]
+        )
+        monitor.connector.host = "localhost"
+
+        for _ in range(3):
+            monitor.check()
+
+        assert monitor.history.cycles == 3
+        assert [depth for _, depth in monitor.history.samples("test_queue_1")] == [
+            4,
+            7,
+        ]
+
+    def test_connection_lost_during_check(self, monitor: Monitor) -> None:
+        """Test a connection lost mid check is notified, and closed if still open."""
+        connection = monitor.connector.connect.return_value
+        connection.close.side_effect = AMQPError
+        monitor.connector.host = "localhost"
+        monitor.connect_to_queue = Mock(side_effect=AMQPConnectionError)
+
+        monitor.check()
+        connection.is_open = False
+        monitor.check()
+
+        connection.close.assert_called_once_with()
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call("Connection Error", 'Error connecting to host: "localhost"')
+        ] * 2
+
+    def test_run_cycle_exports_metrics(self, monitor: Monitor) -> None:
+        """Test each check is timed and its results exported."""
+        monitor.metrics = Mock()
+        monitor.connector.connect = Mock(side_effect=AMQPConnectionError)
+        monitor.connector.host = "localhost"
+
+        monitor.run_cycle()
+
+        assert monitor.connection_failures == 1
+        assert monitor.check_duration > 0
+        monitor.metrics.update.assert_called_once_with(monitor)
+
+    def test_phases_timed(self, monitor: Monitor) -> None:
+        """Test each phase of a check is timed when collecting stats."""
+        monitor.stats = Stats()
+        monitor.name = "eu-1"
+        monitor.get_queue_message_count = Mock(return_value=101)
+
+        monitor.run()
+
+        assert sorted(monitor.stats.phases) == [
+            "connect",
+            "connect_to_queue",
+            "get_channel",
+            "notify",
+        ]
+        assert [label for _, label in monitor.stats.last_slowest_queues] == [
+            "[eu-1] test_queue_1"
+        ]
+
     def test_add_notifier(self, monitor: Monitor) -> None:
         """Test add_notifier adds notifiers correctly."""
         notifier = Notifier()
@@ -100,7 +168,711 @@ class TestMonitor(object):
         monitor.interval = 10
         monitor.max_connections = 2
         monitor.get_queue_message_count = Mock(return_value=1)
+        clock = monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+        time_mock.sleep.side_effect = lambda seconds: setattr(
+            clock, "return_value", clock.return_value + seconds
+        )
 
         monitor.run()
 
         time_mock.sleep.assert_called_with(monitor.interval * 60)
+
+
+class TestPersistentMonitor(object):
+    """Tests for the monitor keeping its connection open between checks."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a persistent monitor with a mocked connector."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("test_queue_1", 100)],
+            interval=10,
+            max_connections=3,
+            persistent=True,
+        )
+        monitor.notifiers = [Mock()]
+        monitor.get_queue_message_count = Mock(return_value=1)
+
+        return monitor
+
+    def test_connection_and_channel_reused(self, monitor: Monitor) -> None:
+        """Test one connection and channel are used for every check."""
+        connection = monitor.connector.connect.return_value
+
+        monitor.run()
+
+        monitor.connector.connect.assert_called_once_with()
+        connection.channel.assert_called_once_with()
+        assert connection.channel.return_value.queue_declare.call_count == 3
+        assert monitor.connections_opened == 1
+        assert monitor.reconnects == 0
+
+    def test_waits_on_connection(self, monitor: Monitor) -> None:
+        """Test waiting between checks services the connection heartbeats."""
+        connection = monitor.connector.connect.return_value
+        clock = monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+        connection.sleep.side_effect = lambda seconds: setattr(
+            clock, "return_value", clock.return_value + seconds
+        )
+
+        monitor.run()
+
+        connection.sleep.assert_called_with(10 * 60)
+        connection.close.assert_called_once_with()
+
+    @patch("amqpeek.monitor.time")
+    def test_handshake_time_saved(self, time_mock: MagicMock, monitor: Monitor) -> None:
+        """Test the handshake time of every reused connection is counted."""
+        # Two calls time the handshake, then one per wait between checks
+        time_mock.monotonic.side_effect = [0.0, 0.25, 0.0, 0.0, 0.0]
+
+        monitor.run()
+
+        assert monitor.handshake_time_saved == 0.5
+
+    def test_lost_connection_reestablished(self, monitor: Monitor) -> None:
+        """Test a connection closed between checks is replaced."""
+        first, second = Mock(), Mock()
+        monitor.connector.connect.side_effect = [first, second]
+        first.sleep.side_effect = lambda seconds: setattr(first, "is_open", False)
+
+        monitor.run()
+
+        assert monitor.connector.connect.call_count == 2
+        assert monitor.reconnects == 1
+        monitor.notifiers[0].notify.assert_not_called()
+
+    def test_dead_connection_detected_before_use(self, monitor: Monitor) -> None:
+        """Test a connection that fails when polled is replaced."""
+        first = Mock()
+        first.process_data_events.side_effect = AMQPConnectionError
+        monitor.connector.connect.side_effect = [first, Mock()]
+        monitor.max_connections = 2
+
+        monitor.run()
+
+        assert monitor.connector.connect.call_count == 2
+        assert monitor.reconnects == 1
+
+    @patch("amqpeek.monitor.time")
+    def test_connection_lost_while_waiting(
+        self, time_mock: MagicMock, monitor: Monitor
+    ) -> None:
+        """Test the rest of the interval is waited when the connection drops."""
+        time_mock.monotonic.side_effect = [0.0, 0.0, 0.0, 100.0]
+        connection = monitor.connector.connect.return_value
+        connection.sleep.side_effect = AMQPConnectionError
+        monitor.max_connections = 1
+        monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+
+        monitor.run()
+
+        time_mock.sleep.assert_called_once_with(500.0)
+        assert monitor.connection is None
+
+    def test_connection_lost_during_check(self, monitor: Monitor) -> None:
+        """Test a connection error notification is sent when lost mid check."""
+        monitor.connector.host = "localhost"
+        monitor.connect_to_queue = Mock(side_effect=AMQPConnectionError)
+        monitor.interval = None
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "localhost"'
+        )
+        assert monitor.connection is None
+
+    def test_close_error_ignored_when_dropping(self, monitor: Monitor) -> None:
+        """Test a failure closing a lost connection does not escape."""
+        connection = monitor.connector.connect.return_value
+        connection.close.side_effect = AMQPError
+        monitor.connect_to_queue = Mock(side_effect=AMQPConnectionError)
+        monitor.interval = None
+
+        monitor.run()
+
+        assert monitor.connection is None
+
+
+class TestDigestMonitor(object):
+    """Tests for sending the alerts of a cycle as one message."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a digest monitor of three queues, with a mocked connector."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("queue_1", 1), ("queue_2", 1), ("queue_3", 1)],
+            digest=True,
+        )
+        monitor.notifiers = [Mock(), Mock()]
+
+        return monitor
+
+    def test_alerts_sent_as_one_message(self, monitor: Monitor) -> None:
+        """Test each notifier is sent one message, grouped by alert type."""
+        monitor.connect_to_queue = Mock(
+            side_effect=[Mock(), ChannelClosed(404, "NOT_FOUND"), Mock()]
+        )
+        monitor.get_queue_message_count = Mock(side_effect=[2, 3])
+
+        monitor.run()
+
+        for notifier in monitor.notifiers:
+            notifier.notify.assert_called_once_with(
+                "3 alerts",
+                "Queue Length Error (2)\n"
+                '  Queue "queue_1" is over specified limit!! (2 > 1)\n'
+                '  Queue "queue_3" is over specified limit!! (3 > 1)\n'
+                "\n"
+                "Queue does not exist (1)\n"
+                '  Queue "queue_2" has not been declared',
+            )
+
+    def test_single_alert_sent_as_is(self, monitor: Monitor) -> None:
+        """Test a cycle with one alert sends it unchanged."""
+        monitor.connector.connect = Mock(side_effect=AMQPConnectionError)
+        monitor.connector.host = "localhost"
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "localhost"'
+        )
+
+    def test_no_alerts_nothing_sent(self, monitor: Monitor) -> None:
+        """Test nothing is sent for a cycle without alerts."""
+        monitor.get_queue_message_count = Mock(return_value=0)
+
+        monitor.run()
+
+        monitor.notifiers[0].notify.assert_not_called()
+
+    @patch("amqpeek.monitor.time")
+    def test_digest_sent_every_cycle(
+        self, time_mock: MagicMock, monitor: Monitor
+    ) -> None:
+        """Test the digest is emptied once sent, ready for the next cycle."""
+        monitor.interval = 1
+        monitor.max_connections = 2
+        monitor.connector.connect = Mock(side_effect=AMQPConnectionError)
+        monitor.connector.host = "localhost"
+
+        monitor.run()
+
+        assert monitor.notifiers[0].notify.call_count == 2
+        monitor.notifiers[0].notify.assert_called_with(
+            "Connection Error", 'Error connecting to host: "localhost"'
+        )
+
+
+class TestAlertStateMonitor(object):
+    """Tests for not re-sending alerts that are still active."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor of one queue, tracking the alerts it has sent."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("queue_1", 1)],
+            name="eu-1",
+            alert_state=AlertState(clock=Mock(return_value=0.0)),
+        )
+        monitor.connector.host = "rmq-eu-1"
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_queue_length_error_sent_once(self, monitor: Monitor) -> None:
+        """Test a queue staying over its limit is only notified once, then recovers."""
+        monitor.get_queue_message_count = Mock(side_effect=[5, 6, 0, 0])
+
+        for _ in range(4):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call(
+                "[eu-1] Queue Length Error",
+                'Queue "queue_1" is over specified limit!! (5 > 1)',
+            ),
+            call(
+                "[eu-1] Recovered", 'Queue "queue_1" is back within its limit (0 <= 1)'
+            ),
+        ]
+        assert monitor.alert_state.active == {}  # type: ignore
+
+    def test_missing_queue_sent_once(self, monitor: Monitor) -> None:
+        """Test a missing queue is only notified once, then recovers."""
+        monitor.connect_to_queue = Mock(
+            side_effect=[ChannelClosed(404, "NOT_FOUND")] * 2 + [Mock()]
+        )
+        monitor.get_queue_message_count = Mock(return_value=0)
+
+        for _ in range(3):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call(
+                "[eu-1] Queue does not exist", 'Queue "queue_1" has not been declared'
+            ),
+            call("[eu-1] Recovered", 'Queue "queue_1" has been declared'),
+        ]
+
+    def test_connection_error_sent_once(self, monitor: Monitor) -> None:
+        """Test a broker staying down is only notified once, then recovers."""
+        monitor.connector.connect = Mock(
+            side_effect=[AMQPConnectionError, AMQPConnectionError, Mock()]
+        )
+        monitor.get_queue_message_count = Mock(return_value=0)
+
+        for _ in range(3):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call("[eu-1] Connection Error", 'Error connecting to host: "rmq-eu-1"'),
+            call("[eu-1] Recovered", 'Reconnected to host: "rmq-eu-1"'),
+        ]
+
+    def test_discovery_error_sent_once(self, monitor: Monitor) -> None:
+        """Test a broker that cannot be listed is only notified once, then recovers."""
+        monitor.discovery = Mock()
+        monitor.discovery.connector.host = "rmq-api"
+        monitor.discovery.queue_details = []
+        monitor.discovery.resolve.side_effect = [
+            ManagementApiError,
+            ManagementApiError,
+            [],
+        ]
+
+        for _ in range(3):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call("[eu-1] Discovery Error", 'Error listing queues on host: "rmq-api"'),
+            call("[eu-1] Recovered", 'Listed queues on host: "rmq-api"'),
+        ]
+
+
+class TestGrowthMonitor(object):
+    """Tests for alerting on queues projected to reach their limit soon."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor of one queue, alerting ten minutes from its limit."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders", 10000)],
+            alert_state=AlertState(clock=Mock(return_value=0.0)),
+            growth_rule=GrowthRule(window=3, time_to_limit=600),
+        )
+        monitor.history.clock = Mock(side_effect=[0.0, 60.0, 120.0, 180.0])
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_growth_warning(self, monitor: Monitor) -> None:
+        """Test a fast growing queue is warned about, then recovers once it slows."""
+        monitor.get_queue_message_count = Mock(side_effect=[1000, 2000, 3000, 3000])
+
+        for _ in range(4):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call(
+                "Queue Growth Warning",
+                'Queue "orders" will hit its limit of 10000 in ~7 min '
+                "(3000 messages, growing 1000/min)",
+            ),
+            call(
+                "Recovered", 'Queue "orders" is no longer due to hit its limit soon'
+            ),
+        ]
+
+    def test_growth_checked_after_bulk_fetch(self, monitor: Monitor) -> None:
+        """Test queues fetched in bulk are checked for growth too."""
+        monitor.get_queue_message_count = Mock(side_effect=[8000, 8500, 9000])
+
+        for _ in range(3):
+            monitor.history.start_cycle()
+            monitor.check_results({"orders": Mock()}, monitor.queue_details)
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Queue Growth Warning",
+            'Queue "orders" will hit its limit of 10000 in ~2 min '
+            "(9000 messages, growing 500/min)",
+        )
+
+
+class TestDrainMonitor(object):
+    """Tests for alerting on queues with consumers not draining their backlog."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor of one queue, with two consumers."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders", 10000)],
+            alert_state=AlertState(clock=Mock(return_value=0.0)),
+            drain_rule=DrainRule(window=3, backlog=100),
+        )
+        monitor.history.clock = Mock(side_effect=[0.0, 60.0, 120.0, 180.0])
+        monitor.get_queue_consumer_count = Mock(return_value=2)
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_drain_warning(self, monitor: Monitor) -> None:
+        """Test a backlog not drained is warned about, then recovers once it drains."""
+        monitor.get_queue_message_count = Mock(side_effect=[500, 500, 500, 200])
+
+        for _ in range(4):
+            monitor.check()
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call(
+                "Queue Drain Warning",
+                'Queue "orders" is not draining with 2 consumers (500 messages, '
+                "consumers stuck, draining 0/min, arriving 0/min)",
+            ),
+            call("Recovered", 'Queue "orders" is draining again'),
+        ]
+        assert monitor.consumers == {"orders": 2}
+        assert monitor.drain == {"orders": (2.5, 0.0, 80.0)}
+
+    def test_drain_checked_after_bulk_fetch(self, monitor: Monitor) -> None:
+        """Test queues fetched in bulk are checked for draining too."""
+        monitor.get_queue_message_count = Mock(side_effect=[1000, 1500, 1400])
+
+        for _ in range(3):
+            monitor.history.start_cycle()
+            monitor.check_results({"orders": Mock()}, monitor.queue_details)
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Queue Drain Warning",
+            'Queue "orders" is not draining with 2 consumers (1400 messages, '
+            "too few consumers, draining 50/min, arriving 250/min)",
+        )
+
+    def test_consumers_forgotten(self, monitor: Monitor) -> None:
+        """Test the consumers of queues no longer monitored are forgotten."""
+        monitor.consumers["refunds"] = 1
+        monitor.get_queue_message_count = Mock(return_value=0)
+
+        monitor.check()
+
+        assert monitor.consumers == {"orders": 2}
+
+
+class TestScheduledMonitor(object):
+    """Tests for the monitor checking queues at their own intervals."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor checking one queue every minute, one every 5."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders", 100), ("audit", 100)],
+            interval=1,
+            intervals={"audit": 5},
+        )
+        monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+        monitor.notifiers = [Mock()]
+        monitor.get_queue_message_count = Mock(return_value=1)
+
+        return monitor
+
+    def test_due_queues_checked(self, monitor: Monitor) -> None:
+        """Test each queue is checked on its own schedule, in one batch when due."""
+        channel_mock = Mock()
+        monitor.get_channel = Mock(return_value=channel_mock)
+        checked = []
+
+        for now in (0.0, 60.0, 300.0):
+            monitor.scheduler.clock.return_value = now  # type: ignore
+            channel_mock.reset_mock()
+            monitor.run_cycle()
+            checked.append(
+                [c.kwargs["queue"] for c in channel_mock.queue_declare.call_args_list]
+            )
+
+        assert checked == [["orders", "audit"], ["orders"], ["orders", "audit"]]
+        assert monitor.connector.connect.call_count == 3
+        assert monitor.is_due("audit")
+
+    def test_nothing_due_not_connected(self, monitor: Monitor) -> None:
+        """Test RMQ is not connected to when woken before any queue is due."""
+        monitor.run_cycle()
+        monitor.scheduler.clock.return_value = 30.0  # type: ignore
+        monitor.run_cycle()
+
+        assert monitor.connector.connect.call_count == 1
+        assert monitor.history.cycles == 1
+
+    @patch("amqpeek.monitor.time")
+    def test_waits_until_next_due(self, time_mock: MagicMock, monitor: Monitor) -> None:
+        """Test the wait between checks takes off the time the check took."""
+        monitor.max_connections = 1
+        monitor.scheduler.clock.side_effect = [0.0, 2.5]  # type: ignore
+
+        monitor.run()
+
+        time_mock.sleep.assert_called_once_with(57.5)
+
+    def test_rules_at_queue_interval(self, monitor: Monitor) -> None:
+        """Test a queue checked at its own interval is still checked by the rules."""
+        clock = monitor.scheduler.clock  # type: ignore
+        monitor.history.clock = clock
+        monitor.growth_rule = GrowthRule(window=3, time_to_limit=3600)
+        monitor.drain_rule = DrainRule(window=3)
+        monitor.connect_to_queue = Mock(side_effect=lambda channel, name: name)
+        # audit grows 6 messages a minute, orders stays the same
+        monitor.get_queue_message_count = Mock(
+            side_effect=lambda name: int(clock.return_value) // 10 if name == "audit" else 1
+        )
+        monitor.get_queue_consumer_count = Mock(return_value=1)
+
+        for minute in range(11):
+            clock.return_value = minute * 60.0
+            monitor.run_cycle()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Queue Growth Warning",
+            'Queue "audit" will hit its limit of 100 in ~7 min '
+            "(60 messages, growing 6/min)",
+        )
+        assert sorted(monitor.drain) == ["audit", "orders"]
+
+
+class TestAdaptiveMonitor(object):
+    """Tests for the monitor polling more often as queues near their limits."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor checking between every 30 seconds and every 4 minutes."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders", 100), ("audit", 100)],
+            interval=1,
+            intervals={"audit": 5},
+            adaptive=AdaptiveInterval(min_period=30, max_period=240),
+        )
+        monitor.schedule().clock = Mock(return_value=0.0)  # type: ignore
+        monitor.history.clock = Mock(side_effect=[0.0, 240.0])
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_interval_adapted(self, monitor: Monitor) -> None:
+        """Test calm queues are checked less often, and busy queues more often."""
+        monitor.get_queue_message_count = Mock(side_effect=[10, 99, 95])
+
+        monitor.run_cycle()
+
+        assert monitor.scheduler.next_deadline() == 240  # type: ignore
+
+        monitor.scheduler.clock.return_value = 240.0  # type: ignore
+        monitor.run_cycle()
+
+        assert monitor.scheduler.next_deadline() == 270  # type: ignore
+        # The queue at its own interval is not adapted
+        assert (300, 300) in monitor.scheduler.deadlines  # type: ignore
+
+    def test_interval_kept_when_not_read(self, monitor: Monitor) -> None:
+        """Test the next check is at the interval when RMQ cannot be reached."""
+        monitor.connector.connect.side_effect = AMQPConnectionError
+
+        monitor.run_cycle()
+
+        assert monitor.scheduler.next_deadline() == 60  # type: ignore
+
+
+class TestBreakerMonitor(object):
+    """Tests for the monitor backing off from a broker that is down."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a monitor backing off 30 seconds, doubling, without jitter."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("queue_1", 10)],
+            breaker=CircuitBreaker(
+                base_delay=30, jitter=0, clock=Mock(return_value=0.0)
+            ),
+        )
+        monitor.connector.host = "rmq-eu-1"
+        monitor.get_queue_message_count = Mock(return_value=0)
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def check_at(self, monitor: Monitor, now: float) -> None:
+        """Check the queues at the given time."""
+        monitor.breaker.clock.return_value = now  # type: ignore
+        monitor.check()
+
+    def test_backoff(self, monitor: Monitor) -> None:
+        """Test RMQ is not connected to while down, until each delay has passed."""
+        monitor.connector.connect.side_effect = AMQPConnectionError
+
+        for now in (0, 10, 29, 30, 60, 89, 90):
+            self.check_at(monitor, now)
+
+        # Connected at 0, then probed at 30 and 90
+        assert monitor.connector.connect.call_count == 3
+        assert monitor.connection_failures == 3
+        assert monitor.history.cycles == 7
+        assert monitor.breaker.retry_in() == 120  # type: ignore
+
+    def test_down_and_recovered_sent_once(self, monitor: Monitor) -> None:
+        """Test a broker going down and recovering is notified once each."""
+        monitor.connector.connect.side_effect = [
+            AMQPConnectionError,
+            AMQPConnectionError,
+            Mock(),
+            Mock(),
+        ]
+
+        for now in (0, 30, 90, 120):
+            self.check_at(monitor, now)
+
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call("Connection Error", 'Error connecting to host: "rmq-eu-1"'),
+            call("Recovered", 'Reconnected to host: "rmq-eu-1"'),
+        ]
+
+    def test_new_breaker_keeps_state(self, monitor: Monitor) -> None:
+        """Test a new breaker set while the broker is down carries on the outage."""
+        monitor.connector.connect.side_effect = [
+            AMQPConnectionError,
+            AMQPConnectionError,
+            Mock(),
+        ]
+
+        self.check_at(monitor, 0)
+        monitor.set_breaker(
+            CircuitBreaker(base_delay=60, jitter=0, clock=monitor.breaker.clock)
+        )
+
+        assert monitor.breaker.failures == 1  # type: ignore
+        assert monitor.breaker.retry_in() == 30  # type: ignore
+
+        # The failed probe at 30 backs off with the new delay, doubled
+        for now in (30, 149, 150):
+            self.check_at(monitor, now)
+
+        assert monitor.connector.connect.call_count == 3
+        assert monitor.notifiers[0].notify.call_args_list == [
+            call("Connection Error", 'Error connecting to host: "rmq-eu-1"'),
+            call("Recovered", 'Reconnected to host: "rmq-eu-1"'),
+        ]
+
+    def test_recovered_clears_alert(self, monitor: Monitor) -> None:
+        """Test the connection error is no longer active once recovered."""
+        monitor.alert_state = AlertState(clock=Mock(return_value=0.0))
+        monitor.connector.connect.side_effect = [AMQPConnectionError, Mock()]
+
+        for now in (0, 30):
+            self.check_at(monitor, now)
+
+        assert monitor.alert_state.active == {}
+        assert monitor.notifiers[0].notify.call_count == 2
+
+    def test_lost_during_check(self, monitor: Monitor) -> None:
+        """Test a persistent connection lost during a check opens the breaker."""
+        monitor.persistent = True
+        monitor.get_queue_message_count.side_effect = AMQPConnectionError
+
+        self.check_at(monitor, 0)
+        self.check_at(monitor, 10)
+
+        monitor.connector.connect.assert_called_once_with()
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error", 'Error connecting to host: "rmq-eu-1"'
+        )
+
+
+class TestReconfiguredMonitor(object):
+    """Tests for the monitor applying a reloaded config."""
+
+    @pytest.fixture
+    def monitor(self) -> Monitor:
+        """Creates a persistent monitor with a mocked connector."""
+        monitor = Monitor(
+            connector=Mock(),
+            queue_details=[("orders", 100)],
+            interval=1,
+            persistent=True,
+        )
+        monitor.notifiers = [Mock()]
+        monitor.get_queue_message_count = Mock(return_value=1)
+
+        return monitor
+
+    def test_remove_notifier(self, monitor: Monitor) -> None:
+        """Test a removed notifier is no longer sent notifications."""
+        notifier = monitor.notifiers[0]
+
+        monitor.remove_notifier(notifier)
+
+        assert monitor.notifiers == []
+
+    def test_set_queues(self, monitor: Monitor) -> None:
+        """Test the new queues are checked, keeping the schedule and connection."""
+        scheduler = monitor.schedule()
+        monitor.run_cycle()
+        discovery = Mock()
+
+        monitor.set_queues([("orders", 10), ("audit", 10)], discovery=discovery)
+
+        assert monitor.queue_details == [("orders", 10), ("audit", 10)]
+        assert monitor.discovery is discovery
+        assert monitor.scheduler is scheduler
+        assert monitor.connection is not None
+
+    def test_set_queues_new_intervals_rescheduled(self, monitor: Monitor) -> None:
+        """Test the queues are scheduled again when their intervals change."""
+        monitor.schedule()
+
+        monitor.set_queues([("orders", 100)], {"orders": 5})
+
+        assert monitor.intervals == {"orders": 5}
+        assert monitor.scheduler is None
+        assert monitor.schedule().intervals == {"orders": 300}  # type: ignore
+
+    def test_set_connector(self, monitor: Monitor) -> None:
+        """Test the connection is reopened with the new connector."""
+        connection = monitor.connector.connect.return_value
+        monitor.run_cycle()
+        connector = Mock()
+
+        monitor.set_connector(connector)
+        monitor.check()
+
+        connection.close.assert_called_once_with()
+        connector.connect.assert_called_once_with()
+        assert monitor.reconnects == 0
+
+    def test_set_breaker(self, monitor: Monitor) -> None:
+        """Test the new circuit breaker is used from the next check."""
+        breaker = Mock()
+        breaker.allow.return_value = False
+
+        monitor.set_breaker(breaker)
+        monitor.check()
+
+        assert monitor.breaker is breaker
+        monitor.connector.connect.assert_not_called()
+
+    @patch("amqpeek.monitor.time")
+    def test_reloader_polled_between_checks(
+        self, time_mock: MagicMock, monitor: Monitor
+    ) -> None:
+        """Test changes to the config are looked for after each wait."""
+        monitor.max_connections = 3
+        monitor.reloader = Mock()
+
+        monitor.run()
+
+        assert monitor.reloader.poll.call_count == 2
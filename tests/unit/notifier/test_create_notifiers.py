@@ -5,7 +5,10 @@ from unittest.mock import patch
 
 import pytest
 
-from amqpeek.notifier import create_notifiers, SlackNotifier, SmtpNotifier
+from amqpeek import notifier
+from amqpeek.notifier import create_notifiers
+from amqpeek.slack_notifier import SlackNotifier
+from amqpeek.smtp_notifier import SmtpNotifier
 
 
 class TestNotifierFactory(object):
@@ -39,7 +42,7 @@ class TestNotifierFactory(object):
         """Test the correct notifier objects are returned for the given config."""
         # We have to patch SMTP as a connection is established on
         # instantiation
-        with patch("amqpeek.notifier.SMTP"):
+        with patch("amqpeek.smtp_notifier.SMTP"):
             notifiers = create_notifiers(notifier_data)
 
         assert len(notifiers) == len(notifier_data)
@@ -51,3 +54,14 @@ class TestNotifierFactory(object):
         notifiers = create_notifiers({})
 
         assert len(notifiers) == 0
+
+
+def test_notifiers_imported_from_notifier() -> None:
+    """Test the notifiers can still be imported from the notifier module."""
+    from amqpeek.notifier import SlackNotifier as Slack, SmtpNotifier as Smtp
+
+    assert Slack is SlackNotifier
+    assert Smtp is SmtpNotifier
+
+    with pytest.raises(AttributeError):
+        notifier.MissingNotifier  # noqa: B018
@@ -0,0 +1,185 @@
+"""Tests for sending notifications from a background thread."""
+import threading
+from typing import Generator
+from unittest.mock import Mock, patch
+
+import pytest
+
+from amqpeek.notifier import Notifier, QueuedNotifier
+from amqpeek.stats import Stats
+
+
+class BlockedNotifier(Notifier):
+    """Notifier that holds up every notification until released."""
+
+    def __init__(self) -> None:
+        """Create the notifier, blocked."""
+        self.released = threading.Event()
+        self.started = threading.Event()
+        self.sent: list = []
+        self.closed = False
+
+    def notify(self, subject: str, message: str) -> None:
+        """Wait to be released, then record the notification.
+
+        Args:
+            subject: The subject of the notification
+            message: The body of the notification
+        """
+        self.started.set()
+        self.released.wait(5)
+        self.sent.append((subject, message))
+
+    def close(self) -> None:
+        """Record the notifier was closed."""
+        self.closed = True
+
+
+class TestQueuedNotifier(object):
+    """Tests for the QueuedNotifier class."""
+
+    @pytest.fixture
+    def blocked(self) -> BlockedNotifier:
+        """A notifier held up until released."""
+        return BlockedNotifier()
+
+    @pytest.fixture
+    def queued(self, blocked: BlockedNotifier) -> Generator:
+        """A queued notifier holding two notifications, sending through blocked."""
+        queued = QueuedNotifier(blocked, max_size=2, flush_timeout=5)
+
+        yield queued
+
+        blocked.released.set()
+        queued.close()
+
+    def hold(self, queued: QueuedNotifier) -> None:
+        """Send a first notification and wait for the worker to get stuck on it.
+
+        Args:
+            queued: The queued notifier to hold up
+        """
+        queued.notify("Held", "held")
+        queued.notifier.started.wait(5)  # type: ignore
+
+    def test_notify_does_not_wait_for_channel(
+        self, blocked: BlockedNotifier, queued: QueuedNotifier
+    ) -> None:
+        """Test notify returns while the notification channel is still sending."""
+        self.hold(queued)
+        queued.notify("Queue Length Error", "over limit")
+
+        assert blocked.sent == []
+        assert list(queued.pending) == [("Queue Length Error", "over limit")]
+
+    def test_close_flushes(
+        self, blocked: BlockedNotifier, queued: QueuedNotifier
+    ) -> None:
+        """Test the queued notifications are sent before closing."""
+        self.hold(queued)
+        queued.notify("Queue Length Error", "over limit")
+        blocked.released.set()
+
+        queued.close()
+
+        assert blocked.sent == [
+            ("Held", "held"),
+            ("Queue Length Error", "over limit"),
+        ]
+        assert not queued.worker.is_alive()
+        assert blocked.closed
+
+    def test_drop_oldest(
+        self, blocked: BlockedNotifier, queued: QueuedNotifier
+    ) -> None:
+        """Test the oldest waiting notification is dropped when the queue is full."""
+        self.hold(queued)
+
+        for i in range(3):
+            queued.notify("Queue Length Error", str(i))
+
+        assert list(queued.pending) == [
+            ("Queue Length Error", "1"),
+            ("Queue Length Error", "2"),
+        ]
+        assert queued.dropped == 1
+
+    def test_coalesce(self, blocked: BlockedNotifier) -> None:
+        """Test a notification is merged into one waiting with the same subject."""
+        queued = QueuedNotifier(blocked, max_size=2, overflow="coalesce")
+        self.hold(queued)
+
+        queued.notify("Queue Length Error", "a")
+        queued.notify("Connection Error", "b")
+        queued.notify("Queue Length Error", "c")
+        queued.notify("Queue does not exist", "d")
+
+        assert list(queued.pending) == [
+            ("Connection Error", "b"),
+            ("Queue does not exist", "d"),
+        ]
+        assert queued.dropped == 1
+
+        queued.notify("Connection Error", "e")
+
+        assert list(queued.pending) == [
+            ("Connection Error", "b\ne"),
+            ("Queue does not exist", "d"),
+        ]
+
+        blocked.released.set()
+        queued.close()
+
+        assert blocked.sent[1:] == [
+            ("Connection Error", "b\ne"),
+            ("Queue does not exist", "d"),
+        ]
+
+    def test_send_timed(self, blocked: BlockedNotifier) -> None:
+        """Test the time taken to send each notification is recorded."""
+        stats = Stats()
+        queued = QueuedNotifier(blocked, stats=stats)
+        blocked.released.set()
+
+        queued.notify("Queue Length Error", "over limit")
+        queued.close()
+
+        assert stats.phases["send"].count == 1
+
+    def test_unknown_overflow_policy(self) -> None:
+        """Test an unknown overflow policy is rejected."""
+        with pytest.raises(ValueError):
+            QueuedNotifier(Mock(), overflow="shrug")
+
+    @patch("amqpeek.notifier.logging")
+    def test_errors_logged(self, logging_mock: Mock) -> None:
+        """Test an error sending one notification does not stop the others."""
+        notifier = Mock()
+        notifier.notify.side_effect = [RuntimeError, None]
+        queued = QueuedNotifier(notifier)
+
+        queued.notify("First", "1")
+        queued.notify("Second", "2")
+        queued.close()
+
+        assert notifier.notify.call_count == 2
+        logging_mock.exception.assert_called_once_with(
+            'Error sending notification "%s"', "First"
+        )
+
+    @patch("amqpeek.notifier.logging")
+    def test_close_gives_up_after_timeout(
+        self, logging_mock: Mock, blocked: BlockedNotifier
+    ) -> None:
+        """Test closing does not wait forever on a stuck notification channel."""
+        queued = QueuedNotifier(blocked, flush_timeout=0.05)
+        self.hold(queued)
+        queued.notify("Queue Length Error", "over limit")
+
+        queued.close()
+
+        logging_mock.error.assert_called_once_with(
+            "Gave up sending %d notifications after %ss", 1, 0.05
+        )
+        assert not blocked.closed
+        blocked.released.set()
@@ -1,10 +1,58 @@
 """Tests the slack notifier module."""
 
-from unittest.mock import patch
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generator, List
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
-from amqpeek.notifier import SlackNotifier
+from amqpeek.notifier import TokenBucket
+from amqpeek.slack_notifier import SlackNotifier
+
+
+class SlackApiHandler(BaseHTTPRequestHandler):
+    """Answers chat.postMessage with the next of the canned responses."""
+
+    protocol_version = "HTTP/1.1"
+    server: "SlackApiServer"
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Reply with the next canned status, rate limiting when it is 429."""
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(self.client_address)
+        status, body = (200, {"ok": True})
+
+        if self.server.responses:
+            status, body = self.server.responses.pop(0)
+
+        data = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+
+        if status == 429:
+            self.send_header("Retry-After", "2")
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: object) -> None:
+        """Keep the test output quiet."""
+
+
+class SlackApiServer(ThreadingHTTPServer):
+    """Local stand-in for the Slack API, recording the requests made."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        """Listen on a free local port."""
+        super().__init__(("127.0.0.1", 0), SlackApiHandler)
+        self.requests: List[tuple] = []
+        self.responses: List[tuple] = []
 
 
 class TestSlackNotifier(object):
@@ -18,7 +66,7 @@ class TestSlackNotifier(object):
     @pytest.fixture
     def slack_notifier(self, slack_notifier_args: dict) -> SlackNotifier:
         """Patch the slack notifier."""
-        with patch("amqpeek.notifier.Slacker"):
+        with patch("amqpeek.slack_notifier.Slacker"):
             return SlackNotifier(**slack_notifier_args)
 
     def test_notify(
@@ -37,3 +85,118 @@ class TestSlackNotifier(object):
             text="{}: {}".format(message_args["subject"], message_args["message"]),
             username=slack_notifier_args["username"],
         )
+
+
+class TestSlackNotifierRateLimits(object):
+    """Tests for sending to a Slack API that rate limits."""
+
+    @pytest.fixture
+    def server(self) -> Generator:
+        """A local stand-in for the Slack API."""
+        server = SlackApiServer()
+        thread = threading.Thread(
+            target=server.serve_forever, args=(0.01,), daemon=True
+        )
+        thread.start()
+
+        url = "http://127.0.0.1:{}/api/".format(server.server_address[1])
+
+        with patch("slacker.get_api_url", lambda method: url + method):
+            yield server
+
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def slack_notifier(self, server: SlackApiServer) -> Generator:
+        """A notifier sending to the stand-in API, without sleeping."""
+        slack_notifier = SlackNotifier(
+            api_key="my_key", username="test", channel="#general", retries=2
+        )
+
+        with patch("amqpeek.slack_notifier.time.sleep") as sleep:
+            slack_notifier.sleep = sleep  # type: ignore
+            yield slack_notifier
+
+        slack_notifier.close()
+
+    def test_session_reused(
+        self, server: SlackApiServer, slack_notifier: SlackNotifier
+    ) -> None:
+        """Test messages are sent over one keep-alive connection."""
+        for i in range(3):
+            slack_notifier.notify("Queue Length Error", "queue_{}".format(i))
+
+        assert len(server.requests) == 3
+        assert len(set(server.requests)) == 1
+
+    def test_retry_after_honoured(
+        self, server: SlackApiServer, slack_notifier: SlackNotifier
+    ) -> None:
+        """Test a rate limited message is sent again after Retry-After."""
+        server.responses = [(429, {"ok": False})]
+
+        slack_notifier.notify("Queue Length Error", "queue_1")
+
+        assert len(server.requests) == 2
+        (delay,), _ = slack_notifier.sleep.call_args  # type: ignore
+        assert 1.9 < delay <= 2
+
+    @patch("amqpeek.slack_notifier.logging")
+    def test_gives_up_after_retries(
+        self,
+        logging_mock: MagicMock,
+        server: SlackApiServer,
+        slack_notifier: SlackNotifier,
+    ) -> None:
+        """Test a message still rate limited after the retries is dropped."""
+        server.responses = [(429, {"ok": False})] * 3
+
+        slack_notifier.notify("Queue Length Error", "queue_1")
+
+        assert len(server.requests) == 3
+        logging_mock.error.assert_called_once_with(
+            'Gave up sending Slack message "%s" after %d attempts',
+            "Queue Length Error",
+            3,
+        )
+
+    @pytest.mark.parametrize(
+        "response", [(500, {"ok": False}), (200, {"ok": False, "error": "nope"})]
+    )
+    @patch("amqpeek.slack_notifier.logging")
+    def test_errors_not_retried(
+        self,
+        logging_mock: MagicMock,
+        server: SlackApiServer,
+        slack_notifier: SlackNotifier,
+        response: tuple,
+    ) -> None:
+        """Test errors other than rate limits are logged rather than retried."""
+        server.responses = [response]
+
+        slack_notifier.notify("Queue Length Error", "queue_1")
+
+        assert len(server.requests) == 1
+        logging_mock.error.assert_called_once()
+
+
+class TestTokenBucket(object):
+    """Tests for the TokenBucket class."""
+
+    def test_burst_then_rate(self) -> None:
+        """Test a burst goes straight through, then tokens come at the rate."""
+        bucket = TokenBucket(rate=2, burst=3, clock=Mock(return_value=0.0))
+
+        assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+
+    def test_refill(self) -> None:
+        """Test tokens are added back over time, up to the burst."""
+        clock = Mock(return_value=0.0)
+        bucket = TokenBucket(rate=1, burst=2, clock=clock)
+        bucket.reserve()
+        bucket.reserve()
+
+        clock.return_value = 10.0
+
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 1.0]
@@ -1,10 +1,88 @@
-"""Tests for the notifier module."""
+"""Tests for the smtp_notifier module."""
 
-from unittest.mock import patch
+import socketserver
+import threading
+from smtplib import SMTPServerDisconnected
+from typing import Generator, List
+from unittest.mock import MagicMock, patch
 
 import pytest
 
-from amqpeek.notifier import SmtpNotifier
+from amqpeek.smtp_notifier import SmtpNotifier
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """Handles one SMTP session, enough of the protocol for smtplib to send mail.
+
+    The server can be told to hang up after a number of messages, as mail
+    servers do with idle or long lived connections.
+    """
+
+    server: "SmtpServer"
+
+    def reply(self, line: str) -> None:
+        """Send a reply line to the client.
+
+        Args:
+            line: The reply, without the line ending
+        """
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        """Answer the client's commands until it quits or the server hangs up."""
+        self.server.sessions += 1
+        self.reply("220 stand-in ESMTP")
+
+        for raw in self.rfile:
+            command = raw.decode("ascii").strip().upper()
+            self.server.commands.append(command.split(" ")[0])
+
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-stand-in\r\n250 AUTH PLAIN\r\n")
+            elif command.startswith("AUTH"):
+                self.reply("235 Authentication successful")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.server.messages.append(self.read_data())
+                self.reply("250 Queued")
+
+                if self.server.hang_up_after == len(self.server.messages):
+                    return
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+    def read_data(self) -> str:
+        """Read the body of a message, up to the line holding a single dot.
+
+        Returns:
+            The body of the message
+        """
+        lines = []
+
+        for raw in self.rfile:
+            if raw == b".\r\n":
+                break
+
+            lines.append(raw.decode("ascii"))
+
+        return "".join(lines)
+
+
+class SmtpServer(socketserver.ThreadingTCPServer):
+    """Local stand-in for an SMTP server, recording what it receives."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        """Listen on a free local port."""
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.sessions = 0
+        self.commands: List[str] = []
+        self.messages: List[str] = []
+        self.hang_up_after = 0
 
 
 class TestSmtpNotifier(object):
@@ -23,10 +101,17 @@ class TestSmtpNotifier(object):
         }
 
     @pytest.fixture
-    def smtp_notifier(self, smtp_notifier_args: dict) -> SmtpNotifier:
-        """Patch the SmtpNotifier."""
-        with patch("amqpeek.notifier.SMTP"):
-            return SmtpNotifier(**smtp_notifier_args)
+    def smtp_patch(self) -> Generator:
+        """Patch the SMTP client."""
+        with patch("amqpeek.smtp_notifier.SMTP") as smtp:
+            yield smtp
+
+    @pytest.fixture
+    def smtp_notifier(
+        self, smtp_patch: MagicMock, smtp_notifier_args: dict
+    ) -> SmtpNotifier:
+        """An SmtpNotifier using a mocked SMTP client."""
+        return SmtpNotifier(**smtp_notifier_args)
 
     @pytest.fixture
     def mail_message(self, smtp_notifier_args: dict, message_args: dict) -> str:
@@ -40,14 +125,28 @@ class TestSmtpNotifier(object):
             message=message_args["message"],
         )
 
+    def test_connects_when_first_used(
+        self, smtp_patch: MagicMock, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test no connection is made until the first email is sent."""
+        smtp_patch.assert_not_called()
+
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+
+        smtp_patch.assert_called_once_with("localhost", 0, timeout=10)
+
     def test_smtp_login_called_when_credentials_present(
         self, smtp_notifier: SmtpNotifier, smtp_notifier_args: dict
     ) -> None:
         """Test Notifier logs in into SMTP server correctly."""
-        smtp_notifier.server.login.assert_called_once_with(
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+
+        smtp_notifier.server.login.assert_called_once_with(  # type: ignore
             smtp_notifier_args["user"], smtp_notifier_args["passwd"]
         )
+        smtp_notifier.server.starttls.assert_not_called()  # type: ignore
 
+    @pytest.mark.usefixtures("smtp_patch")
     def test_smtp_login_not_called_when_credentials_not_present(
         self, smtp_notifier_args: dict
     ) -> None:
@@ -55,15 +154,175 @@ class TestSmtpNotifier(object):
         del smtp_notifier_args["user"]
         del smtp_notifier_args["passwd"]
 
-        with patch("amqpeek.notifier.SMTP"):
-            smtp_notifier = SmtpNotifier(**smtp_notifier_args)
+        smtp_notifier = SmtpNotifier(**smtp_notifier_args)
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+
+        smtp_notifier.server.login.assert_not_called()  # type: ignore
 
-        smtp_notifier.server.login.assert_not_called()
+    @pytest.mark.usefixtures("smtp_patch")
+    def test_starttls(self, smtp_notifier_args: dict) -> None:
+        """Test the connection is upgraded to TLS before logging in."""
+        smtp_notifier = SmtpNotifier(starttls=True, **smtp_notifier_args)
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+
+        smtp_notifier.server.starttls.assert_called_once_with()  # type: ignore
+
+    def test_login_failure_closes_socket(
+        self, smtp_patch: MagicMock, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test a connection that cannot log in is closed and retried."""
+        smtp_patch.return_value.login.side_effect = OSError
+        smtp_notifier.retry_delay = 0
+
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+
+        assert smtp_patch.call_count == 3
+        assert smtp_patch.return_value.close.call_count == 3
 
     def test_notify(self, smtp_notifier: SmtpNotifier, mail_message: str) -> None:
         """Test notify method calls the SMTP server."""
         smtp_notifier.notify(subject="Test message", message="This is a test message")
 
-        smtp_notifier.server.sendmail.assert_called_once_with(
+        smtp_notifier.server.sendmail.assert_called_once_with(  # type: ignore
             "test_from@test.com", ["test_to@test.com"], mail_message
         )
+
+    def test_close(self, smtp_notifier: SmtpNotifier) -> None:
+        """Test close quits the SMTP session."""
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+        server = smtp_notifier.server
+
+        smtp_notifier.close()
+
+        server.quit.assert_called_once_with()  # type: ignore
+        assert smtp_notifier.server is None
+
+    def test_close_disconnected(self, smtp_notifier: SmtpNotifier) -> None:
+        """Test close does not fail when the server has already hung up."""
+        smtp_notifier.notify(subject="Test message", message="This is a test message")
+        server = smtp_notifier.server
+        server.quit.side_effect = SMTPServerDisconnected  # type: ignore
+
+        smtp_notifier.close()
+
+        server.close.assert_called_once_with()  # type: ignore
+
+    def test_close_never_connected(
+        self, smtp_patch: MagicMock, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test close does nothing when no email was sent."""
+        smtp_notifier.close()
+
+        smtp_patch.assert_not_called()
+
+
+class TestSmtpNotifierSessions(object):
+    """Tests for reusing and re-establishing sessions with an SMTP server."""
+
+    @pytest.fixture
+    def server(self) -> Generator:
+        """A local stand-in SMTP server."""
+        server = SmtpServer()
+        thread = threading.Thread(
+            target=server.serve_forever, args=(0.01,), daemon=True
+        )
+        thread.start()
+
+        yield server
+
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def smtp_notifier(self, server: SmtpServer) -> SmtpNotifier:
+        """A notifier sending to the stand-in server, without waiting to retry."""
+        return SmtpNotifier(
+            host="127.0.0.1",
+            port=server.server_address[1],
+            to_addr=["test_to@test.com"],
+            from_addr="test_from@test.com",
+            subject="Test Subject",
+            user="user",
+            passwd="passwd",
+            retry_delay=0,
+        )
+
+    def test_session_reused(
+        self, server: SmtpServer, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test emails sent back to back share one session and one login."""
+        for i in range(5):
+            smtp_notifier.notify("Queue Length Error", "queue_{}".format(i))
+
+        smtp_notifier.close()
+
+        assert len(server.messages) == 5
+        assert server.sessions == 1
+        assert server.commands.count("AUTH") == 1
+        assert "NOOP" not in server.commands
+
+    def test_idle_session_checked(
+        self, server: SmtpServer, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test a session left idle is checked with a NOOP before use."""
+        smtp_notifier.noop_after = 0
+
+        smtp_notifier.notify("Queue Length Error", "queue_1")
+        smtp_notifier.notify("Queue Length Error", "queue_2")
+        smtp_notifier.close()
+
+        assert server.commands.count("NOOP") == 1
+        assert server.sessions == 1
+
+    @pytest.mark.parametrize("noop_after", [0, 30])
+    def test_reconnect_after_hang_up(
+        self, server: SmtpServer, smtp_notifier: SmtpNotifier, noop_after: float
+    ) -> None:
+        """Test a dropped session is replaced, found by NOOP or by failing to send."""
+        server.hang_up_after = 1
+        smtp_notifier.noop_after = noop_after
+
+        smtp_notifier.notify("Queue Length Error", "queue_1")
+        smtp_notifier.notify("Queue Length Error", "queue_2")
+        smtp_notifier.close()
+
+        assert len(server.messages) == 2
+        assert server.sessions == 2
+        assert smtp_notifier.connections_opened == 2
+
+    @patch("amqpeek.smtp_notifier.logging")
+    def test_gives_up_after_retries(self, logging_mock: MagicMock) -> None:
+        """Test sending is retried a bounded number of times, without raising."""
+        with SmtpServer() as server:
+            port = server.server_address[1]
+
+        smtp_notifier = SmtpNotifier(
+            host="127.0.0.1",
+            port=port,
+            to_addr=["test_to@test.com"],
+            from_addr="test_from@test.com",
+            subject="Test Subject",
+            retries=2,
+            retry_delay=0,
+        )
+
+        smtp_notifier.notify("Queue Length Error", "queue_1")
+
+        assert logging_mock.info.call_count == 3
+        logging_mock.error.assert_called_once_with(
+            'Gave up sending email "%s" after %d attempts',
+            "Test Subject - Queue Length Error",
+            3,
+        )
+
+    @patch("amqpeek.smtp_notifier.logging")
+    def test_rejected_email_not_retried(
+        self, logging_mock: MagicMock, server: SmtpServer, smtp_notifier: SmtpNotifier
+    ) -> None:
+        """Test an email the server rejects is logged rather than retried."""
+        smtp_notifier.to_addr = []
+
+        smtp_notifier.notify("Queue Length Error", "queue_1")
+
+        assert server.sessions == 1
+        logging_mock.error.assert_called_once()
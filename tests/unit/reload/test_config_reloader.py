@@ -0,0 +1,215 @@
+"""Tests for the reload module."""
+import os
+import signal
+from copy import deepcopy
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+import yaml
+
+from amqpeek.monitor import Connector
+from amqpeek.reload import ConfigReloader
+
+
+class TestConfigReloader(object):
+    """Tests for the ConfigReloader class."""
+
+    @pytest.fixture
+    def config_path(self, tmp_path: Path, config_data: dict) -> str:
+        """Write the config to a file."""
+        config_path = tmp_path / "amqpeek.yaml"
+        config_path.write_text(yaml.dump(config_data))
+
+        return str(config_path)
+
+    @pytest.fixture
+    def notifiers(self) -> dict:
+        """Mocked notifiers of each notifier type in the config."""
+        return {"smtp": Mock(), "slack": Mock()}
+
+    @pytest.fixture
+    def reloader(
+        self, config_path: str, config_data: dict, notifiers: dict
+    ) -> ConfigReloader:
+        """Create a reloader of a mocked monitor."""
+        monitor = Mock()
+
+        return ConfigReloader(
+            config_path,
+            config_data,
+            {"engine": "blocking"},
+            monitor,
+            [monitor],
+            notifiers,
+        )
+
+    def write(self, reloader: ConfigReloader, config_data: dict) -> None:
+        """Write a new config, marking it as changed."""
+        with open(reloader.config_path, "w") as config_file:
+            config_file.write(yaml.dump(config_data))
+
+        stat = os.stat(reloader.config_path)
+        os.utime(reloader.config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    def test_unchanged_config_not_read(self, reloader: ConfigReloader) -> None:
+        """Test the config is only read once it has changed."""
+        with patch("amqpeek.reload.read_config") as read_config_mock:
+            assert not reloader.poll()
+
+        read_config_mock.assert_not_called()
+
+    def test_sighup_reloads(self, reloader: ConfigReloader) -> None:
+        """Test the config is reloaded after SIGHUP, restoring the handler after."""
+        previous_handler = signal.getsignal(signal.SIGHUP)
+        reloader.install()
+
+        try:
+            os.kill(os.getpid(), signal.SIGHUP)
+        finally:
+            reloader.uninstall()
+
+        assert reloader.requested
+        assert signal.getsignal(signal.SIGHUP) == previous_handler
+        assert reloader.poll()
+        assert not reloader.requested
+
+    def test_no_sighup(self, reloader: ConfigReloader) -> None:
+        """Test the file is still watched where there is no SIGHUP."""
+        with patch("amqpeek.reload.signal", Mock(spec=[])):
+            reloader.install()
+            reloader.uninstall()
+
+        assert reloader.previous_handler is None
+
+    def test_changed_queues_applied(
+        self, reloader: ConfigReloader, config_data: dict
+    ) -> None:
+        """Test new queues and limits are applied, keeping the connection."""
+        config_data = deepcopy(config_data)
+        config_data["queues"]["audit"] = {"limit": 5, "interval": 10}
+        config_data["queue_limits"] = {0: ["my_queue"]}
+        self.write(reloader, config_data)
+
+        assert reloader.poll()
+
+        monitor = reloader.monitors[0]
+        monitor.set_connector.assert_not_called()
+        queue_details, intervals, discovery = monitor.set_queues.call_args.args
+
+        assert sorted(queue_details) == [("audit", 5), ("my_queue", 0)]
+        assert intervals == {"audit": 10}
+        assert discovery is None
+        assert reloader.app_config["queues"]["audit"] == {"limit": 5, "interval": 10}
+
+    def test_changed_connection_applied(
+        self, reloader: ConfigReloader, config_data: dict
+    ) -> None:
+        """Test the monitor connects with the new settings, keeping its queues."""
+        config_data = deepcopy(config_data)
+        config_data["rabbit_connection"]["host"] = "rmq-2"
+        self.write(reloader, config_data)
+
+        assert reloader.poll()
+
+        monitor = reloader.monitors[0]
+        (connector,) = monitor.set_connector.call_args.args
+
+        assert isinstance(connector, Connector)
+        assert connector.host == "rmq-2"
+        monitor.set_queues.assert_not_called()
+
+    def test_changed_reconnect_applied(
+        self, reloader: ConfigReloader, config_data: dict
+    ) -> None:
+        """Test the monitor backs off with the new settings, keeping its connection."""
+        config_data = deepcopy(config_data)
+        config_data["reconnect"] = {"max_delay": 60}
+        self.write(reloader, config_data)
+
+        assert reloader.poll()
+
+        monitor = reloader.monitors[0]
+        (breaker,) = monitor.set_breaker.call_args.args
+
+        assert breaker.max_delay == 60
+        monitor.set_connector.assert_not_called()
+
+    def test_changed_notifiers_replaced(
+        self, reloader: ConfigReloader, config_data: dict, notifiers: dict
+    ) -> None:
+        """Test removed and changed notifiers are closed and replaced."""
+        smtp, slack = notifiers["smtp"], notifiers["slack"]
+        config_data = deepcopy(config_data)
+        config_data["notifiers"]["slack"]["channel"] = "#alerts"
+        del config_data["notifiers"]["smtp"]
+        self.write(reloader, config_data)
+
+        with patch("amqpeek.cli.create_notifiers", return_value=(Mock(),)) as create:
+            assert reloader.poll()
+
+        create.assert_called_once_with({"slack": config_data["notifiers"]["slack"]})
+        smtp.close.assert_called_once_with()
+        slack.close.assert_called_once_with()
+        reloader.monitor.remove_notifier.assert_any_call(smtp)
+        reloader.monitor.remove_notifier.assert_any_call(slack)
+        reloader.monitor.add_notifier.assert_called_once_with(notifiers["slack"])
+        assert list(notifiers) == ["slack"]
+        assert notifiers["slack"].notifier is create.return_value[0]
+        notifiers["slack"].close()
+
+    def test_restart_sections_kept(
+        self, reloader: ConfigReloader, config_data: dict
+    ) -> None:
+        """Test changes to sections only read at startup are not applied."""
+        config_data = deepcopy(config_data)
+        config_data["monitor"] = {"engine": "asyncio"}
+        self.write(reloader, config_data)
+
+        with patch("amqpeek.reload.logging") as logging_mock:
+            assert reloader.poll()
+
+        logging_mock.warning.assert_called_once_with(
+            'Changes to "%s" in the config require a restart', "monitor"
+        )
+        assert reloader.app_config["monitor"] is None
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            "queues: [",
+            "- not a map",
+            "rabbit_connection: [{name: other, host: rmq}]",
+            "rabbit_connection: {host: rmq}\nqueues: {q: {}}",
+            "rabbit_connection: {host: rmq}\nnotifiers: {pager: {}}",
+            "rabbit_connection: {bad: rmq}",
+            "rabbit_connection: {host: rmq}\nqueue_limits: {0: ['re:(']}",
+        ],
+    )
+    def test_invalid_config_ignored(
+        self, reloader: ConfigReloader, content: str
+    ) -> None:
+        """Test a config that cannot be applied leaves the monitors unchanged."""
+        app_config = reloader.app_config
+
+        with open(reloader.config_path, "w") as config_file:
+            config_file.write(content)
+
+        reloader.request()
+
+        with patch("amqpeek.reload.logging") as logging_mock:
+            assert not reloader.poll()
+
+        logging_mock.error.assert_called_once()
+        reloader.monitors[0].set_connector.assert_not_called()
+        reloader.monitors[0].set_queues.assert_not_called()
+        reloader.monitor.add_notifier.assert_not_called()
+        assert reloader.app_config is app_config
+
+    def test_deleted_config_ignored(self, reloader: ConfigReloader) -> None:
+        """Test the monitors carry on when the config file is removed."""
+        os.remove(reloader.config_path)
+
+        assert not reloader.poll()
+        assert reloader.mtime_ns is None
+        assert not reloader.poll()
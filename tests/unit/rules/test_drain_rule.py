@@ -0,0 +1,72 @@
+"""Tests for the rules module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.history import DepthHistory
+from amqpeek.rules import DrainRule
+
+
+class TestDrainRule(object):
+    """Tests for the DrainRule class."""
+
+    @pytest.fixture
+    def history(self) -> DepthHistory:
+        """Three cycles a minute apart, of queues draining at different rates."""
+        history = DepthHistory(clock=Mock(side_effect=[0.0, 60.0, 120.0]))
+        depths = {
+            "stuck": [500, 500, 500],
+            "slow": [1000, 1500, 1400],
+            "draining": [900, 600, 300],
+            "idle": [5000, 5000, 5000],
+        }
+
+        for cycle in range(3):
+            history.start_cycle()
+
+            for queue_name, queue_depths in depths.items():
+                history.record(queue_name, queue_depths[cycle])
+
+        return history
+
+    def test_check(self, history: DepthHistory) -> None:
+        """Test queues with consumers not getting shorter are reported as stuck."""
+        rule = DrainRule(window=3, backlog=100)
+
+        results = rule.check(
+            history,
+            {"stuck": 2, "slow": 1, "draining": 4},
+            [("stuck", 0), ("slow", 0), ("draining", 0), ("idle", 0), ("missing", 0)],
+        )
+
+        assert results == [
+            ("stuck", 500, 2, 0.0, 0.0, None, True),
+            (
+                "slow",
+                1400,
+                1,
+                pytest.approx(100 / 120),
+                pytest.approx(500 / 120),
+                None,
+                True,
+            ),
+            (
+                "draining",
+                300,
+                4,
+                pytest.approx(600 / 120),
+                0.0,
+                pytest.approx(60),
+                False,
+            ),
+            # No consumers to be stuck
+            ("idle", 5000, 0, 0.0, 0.0, None, False),
+        ]
+
+    def test_backlog(self, history: DepthHistory) -> None:
+        """Test a queue holding fewer messages than the backlog is not stuck."""
+        rule = DrainRule(window=3, backlog=1000)
+
+        assert rule.check(history, {"stuck": 2}, [("stuck", 0)]) == [
+            ("stuck", 500, 2, 0.0, 0.0, None, False)
+        ]
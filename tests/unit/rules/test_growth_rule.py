@@ -0,0 +1,55 @@
+"""Tests for the rules module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.history import DepthHistory
+from amqpeek.rules import GrowthRule
+
+
+class TestGrowthRule(object):
+    """Tests for the GrowthRule class."""
+
+    @pytest.fixture
+    def history(self) -> DepthHistory:
+        """Three cycles a minute apart, of queues growing at different rates."""
+        history = DepthHistory(clock=Mock(side_effect=[0.0, 60.0, 120.0]))
+
+        for cycle in range(3):
+            history.start_cycle()
+            history.record("orders", 1000 + cycle * 1000)
+            history.record("refunds", 10 + cycle)
+            history.record("returns", 50 - cycle * 10)
+            history.record("invoices", 500)
+
+        return history
+
+    def test_check(self, history: DepthHistory) -> None:
+        """Test only queues due to reach their limit within the time are projected."""
+        rule = GrowthRule(window=3, time_to_limit=600)
+
+        results = rule.check(
+            history,
+            [
+                ("orders", 10000),
+                ("refunds", 10000),
+                ("returns", 100),
+                ("invoices", 100),
+                ("missing", 100),
+            ],
+        )
+
+        assert results == [
+            ("orders", 10000, 3000, pytest.approx(1000 / 60), pytest.approx(420)),
+            ("refunds", 10000, 12, pytest.approx(1 / 60), None),
+            ("returns", 100, 30, pytest.approx(-10 / 60), None),
+            ("invoices", 100, 500, 0.0, None),
+        ]
+
+    def test_time_to_limit(self, history: DepthHistory) -> None:
+        """Test a queue further from its limit than the time to limit is not projected."""
+        rule = GrowthRule(window=3, time_to_limit=400)
+
+        assert rule.check(history, [("orders", 10000)]) == [
+            ("orders", 10000, 3000, pytest.approx(1000 / 60), None)
+        ]
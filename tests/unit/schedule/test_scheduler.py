@@ -0,0 +1,184 @@
+"""Tests for the schedule module."""
+from unittest.mock import Mock
+
+import pytest
+
+from amqpeek.history import DepthHistory
+from amqpeek.schedule import AdaptiveInterval, Scheduler
+
+
+class TestScheduler(object):
+    """Tests for the Scheduler class."""
+
+    @pytest.fixture
+    def clock(self) -> Mock:
+        """A clock starting at 0."""
+        return Mock(return_value=0.0)
+
+    @pytest.fixture
+    def scheduler(self, clock: Mock) -> Scheduler:
+        """Queues checked every minute, one every 5 minutes and one every 2."""
+        return Scheduler(60, {"audit": 300, "refunds": 120}, clock=clock)
+
+    def test_pop_due(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test every interval is due first, then each on its own schedule."""
+        due = []
+
+        for now in (0, 60, 120, 180, 240, 300):
+            clock.return_value = float(now)
+            due.append(scheduler.pop_due())
+
+        assert due == [
+            {60, 120, 300},
+            {60},
+            {60, 120},
+            {60},
+            {60, 120},
+            {60, 300},
+        ]
+
+    def test_pop_due_early(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test nothing is due before the next deadline."""
+        scheduler.pop_due()
+        clock.return_value = 59.9
+
+        assert scheduler.pop_due() == set()
+
+    def test_pop_due_woken_early(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test the deadline waited for is due, when the wait ends a little early."""
+        scheduler.pop_due()
+        deadline = scheduler.next_deadline()
+        clock.return_value = 59.999
+
+        assert scheduler.pop_due(deadline) == {60}
+        assert scheduler.next_deadline() == 120.0
+
+    def test_no_drift(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test late checks do not push back the checks after them."""
+        scheduler.pop_due()
+        clock.return_value = 70.0
+        scheduler.pop_due()
+
+        assert scheduler.delay() == 50.0
+
+    def test_missed_ticks_skipped(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test checks overrunning several ticks are run once, on the schedule."""
+        scheduler.pop_due()
+        clock.return_value = 250.0
+
+        assert scheduler.pop_due() == {60, 120}
+        assert scheduler.deadlines[0] == (300.0, 60)
+        assert scheduler.delay() == 50.0
+
+    def test_zero_interval(self, clock: Mock) -> None:
+        """Test an interval of 0 is always due."""
+        scheduler = Scheduler(0, clock=clock)
+
+        assert scheduler.pop_due() == {0}
+        assert scheduler.pop_due() == {0}
+        assert scheduler.delay() == 0.0
+
+    def test_delay(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test the delay is to the next deadline, and never negative."""
+        assert scheduler.delay() == 0.0
+
+        scheduler.pop_due()
+        clock.return_value = 15.0
+
+        assert scheduler.delay() == 45.0
+
+        clock.return_value = 75.0
+
+        assert scheduler.delay() == 0.0
+
+    def test_select(self, scheduler: Scheduler) -> None:
+        """Test only the queues at the intervals due are selected."""
+        queue_details = [("orders", 10), ("audit", 100), ("refunds", 5)]
+
+        assert scheduler.select(queue_details, {60, 120, 300}) == queue_details
+        assert scheduler.select(queue_details, {60}) == [("orders", 10)]
+        assert scheduler.select(queue_details, {60, 120}) == [
+            ("orders", 10),
+            ("refunds", 5),
+        ]
+        assert scheduler.select(queue_details, {300}) == [("audit", 100)]
+
+    def test_select_no_intervals(self) -> None:
+        """Test every queue is selected when due, without per queue intervals."""
+        scheduler = Scheduler(60)
+        queue_details = [("orders", 10), ("audit", 100)]
+
+        assert scheduler.select(queue_details, {60}) == queue_details
+        assert scheduler.select(queue_details, set()) == []
+
+    def test_retime(self, clock: Mock, scheduler: Scheduler) -> None:
+        """Test the next check of an interval is moved, leaving the others."""
+        scheduler.retime(60, 240)
+        scheduler.pop_due()
+        scheduler.retime(60, 240)
+
+        assert sorted(scheduler.deadlines) == [(120, 120), (240, 60), (300, 300)]
+
+        clock.return_value = 500.0
+        scheduler.retime(120, 30)
+
+        assert scheduler.next_deadline() == 240
+        assert (500.0, 120) in scheduler.deadlines
+
+
+class TestAdaptiveInterval(object):
+    """Tests for the AdaptiveInterval class."""
+
+    @pytest.fixture
+    def adaptive(self) -> AdaptiveInterval:
+        """Checks between every 30 seconds and every 8 minutes."""
+        return AdaptiveInterval(min_period=30, max_period=480)
+
+    def test_period(self, adaptive: AdaptiveInterval) -> None:
+        """Test the period shrinks from the longest to the shortest as queues fill."""
+        assert adaptive.period(0.0) == 480
+        assert adaptive.period(0.5) == 480
+        assert adaptive.period(0.75) == pytest.approx(120)
+        assert adaptive.period(1.0) == 30
+        assert adaptive.period(3.0) == 30
+
+    def test_pressure(self, adaptive: AdaptiveInterval) -> None:
+        """Test the pressure is the fullest queue, projected by its growth."""
+        history = DepthHistory(clock=Mock(side_effect=[0.0, 60.0]))
+        history.start_cycle()
+        history.record("orders", 100)
+        history.record("refunds", 100)
+        history.start_cycle()
+        history.record("orders", 400)
+        history.record("refunds", 90)
+
+        # orders grows 5/s, so is projected to 400 + 5 * 480 in the longest period
+        assert adaptive.pressure(
+            history, [("orders", 3500), ("refunds", 200), ("audit", 10)]
+        ) == pytest.approx(0.8)
+        # A shrinking queue is not projected to shrink further
+        assert adaptive.pressure(history, [("refunds", 200)]) == pytest.approx(0.45)
+        assert adaptive.pressure(history, [("audit", 10)]) is None
+
+    def test_pressure_between_other_checks(self, adaptive: AdaptiveInterval) -> None:
+        """Test the growth of a queue is projected when other queues are read more."""
+        history = DepthHistory(clock=Mock(side_effect=[0.0, 30.0, 60.0]))
+        history.start_cycle()
+        history.record("orders", 100)
+        history.start_cycle()
+        history.record("refunds", 0)
+        history.start_cycle()
+        history.record("orders", 400)
+
+        assert adaptive.pressure(history, [("orders", 3500)]) == pytest.approx(0.8)
+
+    def test_pressure_no_limit(self, adaptive: AdaptiveInterval) -> None:
+        """Test any message on a queue with a limit of 0 is full pressure."""
+        history = DepthHistory()
+        history.record("orders", 0)
+
+        assert adaptive.pressure(history, [("orders", 0)]) == 0.0
+
+        history.record("orders", 1)
+
+        assert adaptive.pressure(history, [("orders", 0)]) == 1.0
@@ -0,0 +1,197 @@
+"""Tests for the sharded monitor module."""
+from concurrent.futures.process import BrokenProcessPool
+from typing import Generator
+from unittest.mock import Mock, patch
+
+import pytest
+from fake_broker import FakeBroker
+
+from amqpeek import sharded
+from amqpeek.async_monitor import AsyncioMonitor
+from amqpeek.monitor import Connector
+from amqpeek.rules import DrainRule
+from amqpeek.sharded import fetch_shard, init_worker, ShardedMonitor
+
+
+class TestShardedMonitor(object):
+    """Tests for the ShardedMonitor class."""
+
+    @pytest.fixture
+    def monitor(self) -> ShardedMonitor:
+        """Creates a sharded monitor with a mocked pool of workers."""
+        monitor = ShardedMonitor(
+            connector=Mock(),
+            queue_details=[("queue_{}".format(i), 2) for i in range(4)],
+            processes=1,
+        )
+        monitor.pool = Mock()
+        monitor.notifiers = [Mock()]
+
+        return monitor
+
+    def test_processes_default_to_cpus(self) -> None:
+        """Test a worker process is started for each CPU by default."""
+        with patch("amqpeek.sharded.os.cpu_count", return_value=6):
+            assert ShardedMonitor(connector=Mock(), queue_details=[]).processes == 6
+
+    def test_split(self, monitor: ShardedMonitor) -> None:
+        """Test the queues are dealt between the shards, a few for each process."""
+        queue_details = [("queue_{}".format(i), 2) for i in range(10)]
+
+        shards = monitor.split(queue_details)
+
+        assert len(shards) == 4
+        assert shards[0] == ["queue_0", "queue_4", "queue_8"]
+        assert sorted(sum(shards, [])) == sorted(name for name, _ in queue_details)
+        assert monitor.split(queue_details[:2]) == [["queue_0"], ["queue_1"]]
+
+    def test_results_merged(self, monitor: ShardedMonitor) -> None:
+        """Test the counts of every shard are checked once, in queue order."""
+        monitor.pool.map.return_value = iter(
+            [
+                {"queue_0": (0, 1), "queue_1": (3, 1)},
+                {"queue_2": None, "queue_3": (4, 2)},
+            ]
+        )
+
+        monitor.check()
+
+        assert [call.args for call in monitor.notifiers[0].notify.call_args_list] == [
+            ("Queue Length Error", 'Queue "queue_1" is over specified limit!! (3 > 2)'),
+            ("Queue does not exist", 'Queue "queue_2" has not been declared'),
+            ("Queue Length Error", 'Queue "queue_3" is over specified limit!! (4 > 2)'),
+        ]
+        assert monitor.history.current("queue_3") == 4
+
+    def test_consumers_read(self, monitor: ShardedMonitor) -> None:
+        """Test the consumers counted by the workers are read for the drain rule."""
+        monitor.drain_rule = DrainRule()
+        monitor.pool.map.return_value = iter(
+            [
+                {"queue_0": (0, 1), "queue_1": (3, 2)},
+                {"queue_2": None, "queue_3": (4, 0)},
+            ]
+        )
+
+        monitor.check()
+
+        assert monitor.consumers == {"queue_0": 1, "queue_1": 2, "queue_3": 0}
+
+    def test_connection_error(self, monitor: ShardedMonitor) -> None:
+        """Test a worker unable to connect to RMQ is notified once."""
+        monitor.pool.map.return_value = iter([{"queue_0": (0, 1)}, None])
+
+        monitor.check()
+
+        monitor.notifiers[0].notify.assert_called_once_with(
+            "Connection Error",
+            'Error connecting to host: "{}"'.format(monitor.connector.host),
+        )
+
+    def test_not_fetched_while_breaker_open(self, monitor: ShardedMonitor) -> None:
+        """Test no shard is sent to the workers while backing off from RMQ."""
+        monitor.breaker = Mock()
+        monitor.breaker.allow.return_value = False
+
+        monitor.check()
+
+        monitor.pool.map.assert_not_called()
+        assert monitor.history.cycles == 1
+
+    def test_broken_pool_replaced(self, monitor: ShardedMonitor) -> None:
+        """Test the workers are started again after one dies."""
+        pool = monitor.pool
+        pool.map.side_effect = BrokenProcessPool
+
+        monitor.check()
+
+        pool.shutdown.assert_called_once_with()
+        assert monitor.pool is None
+        monitor.notifiers[0].notify.assert_not_called()
+
+    def test_shutdown_stops_workers(self, monitor: ShardedMonitor) -> None:
+        """Test the worker processes are stopped on shutdown."""
+        pool = monitor.pool
+
+        monitor.shutdown()
+        monitor.shutdown()
+
+        pool.shutdown.assert_called_once_with()
+
+
+class TestShardedMonitorWithBroker(object):
+    """Tests for the ShardedMonitor against the fake AMQP broker."""
+
+    @pytest.fixture
+    def broker(self) -> Generator:
+        """A running fake broker holding a few queues."""
+        with FakeBroker({"queue_{}".format(i): i for i in range(5)}) as broker:
+            yield broker
+
+    @pytest.fixture
+    def connector(self, broker: FakeBroker) -> Connector:
+        """Connector of the fake broker."""
+        return Connector(
+            host=broker.host, port=broker.port, vhost="/", user="guest", passwd="guest"
+        )
+
+    @pytest.fixture
+    def worker(self, connector: Connector) -> Generator:
+        """Set up this process as a worker of the fake broker."""
+        init_worker(connector, 2)
+
+        yield sharded.worker_monitor
+
+        sharded.worker_monitor.shutdown()  # type: ignore
+        sharded.worker_monitor = None
+
+    def test_fetch_shard(self, worker: AsyncioMonitor) -> None:
+        """Test a worker counts the messages of its shard on one connection."""
+        assert fetch_shard(["queue_1", "queue_3", "queue_7"]) == {
+            "queue_1": (1, 1),
+            "queue_3": (3, 1),
+            "queue_7": None,
+        }
+        assert fetch_shard(["queue_4"]) == {"queue_4": (4, 1)}
+        assert worker.connections_opened == 1
+
+    def test_fetch_shard_reconnects(
+        self, worker: AsyncioMonitor, broker: FakeBroker
+    ) -> None:
+        """Test a connection closed while idle is replaced with a new one."""
+        fetch_shard(["queue_1"])
+        broker.drop_on_channel_open = True
+
+        assert fetch_shard(["queue_1"]) is None
+        assert worker.connections_opened == 2
+
+        broker.drop_on_channel_open = False
+
+        assert fetch_shard(["queue_1"]) == {"queue_1": (1, 1)}
+
+    def test_fetch_shard_connection_refused(
+        self, worker: AsyncioMonitor, connector: Connector
+    ) -> None:
+        """Test a worker unable to connect returns no counts."""
+        connector.port = 1
+
+        assert fetch_shard(["queue_1"]) is None
+
+    def test_check_against_broker(self, connector: Connector) -> None:
+        """Test the queues checked by several processes are notified once."""
+        monitor = ShardedMonitor(
+            connector=connector,
+            queue_details=[("queue_{}".format(i), 2) for i in range(7)],
+            processes=2,
+        )
+        monitor.notifiers = [Mock()]
+
+        monitor.run()
+
+        assert monitor.pool is None
+        assert [call.args for call in monitor.notifiers[0].notify.call_args_list] == [
+            ("Queue Length Error", 'Queue "queue_3" is over specified limit!! (3 > 2)'),
+            ("Queue Length Error", 'Queue "queue_4" is over specified limit!! (4 > 2)'),
+            ("Queue does not exist", 'Queue "queue_5" has not been declared'),
+            ("Queue does not exist", 'Queue "queue_6" has not been declared'),
+        ]
@@ -0,0 +1,171 @@
+"""Tests for the state module."""
+import marshal
+import os
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from amqpeek.alerts import AlertState
+from amqpeek.monitor import Monitor
+from amqpeek.state import default_state_dir, StateStore
+
+
+def test_default_state_dir(monkeypatch: MonkeyPatch) -> None:
+    """Test the state is kept under $XDG_STATE_HOME, or ~/.local/state."""
+    monkeypatch.setenv("XDG_STATE_HOME", "/var/state")
+
+    assert default_state_dir() == os.path.join("/var/state", "amqpeek")
+
+    monkeypatch.delenv("XDG_STATE_HOME")
+
+    assert default_state_dir() == os.path.join(
+        os.path.expanduser("~"), ".local", "state", "amqpeek"
+    )
+
+
+class TestStateStore(object):
+    """Tests for the StateStore class."""
+
+    @pytest.fixture
+    def store(self, tmp_path: Path) -> StateStore:
+        """A state store of a config, in its own directory."""
+        return StateStore(str(tmp_path / "state"), str(tmp_path / "amqpeek.yaml"))
+
+    def create_monitor(self, name: str = "eu-1") -> Monitor:
+        """Create a monitor keeping a history of three cycles and active alerts."""
+        monitor = Monitor(
+            connector=Mock(host="rmq"),
+            queue_details=[("orders", 10)],
+            name=name,
+            alert_state=AlertState(),
+            history_size=3,
+        )
+        monitor.history.clock = Mock(side_effect=[60.0, 120.0, 180.0])
+
+        return monitor
+
+    def test_saved_state_loaded(self, store: StateStore) -> None:
+        """Test the history and active alerts are carried over to the next run."""
+        monitor = self.create_monitor()
+        monitor.history.record("orders", 11)
+        monitor.alert_state.should_send(("eu-1", "orders", "Queue Length Error"))
+        store.save([monitor])
+
+        restored = self.create_monitor()
+        store.load([restored])
+
+        assert restored.history.samples("orders") == [(60.0, 11)]
+        assert list(restored.alert_state.active) == [
+            ("eu-1", "orders", "Queue Length Error")
+        ]
+
+    def test_brokers_kept_apart(self, store: StateStore) -> None:
+        """Test the state of each broker is restored to the same broker only."""
+        monitor = self.create_monitor()
+        monitor.history.record("orders", 11)
+        store.save([monitor])
+
+        other = self.create_monitor("us-1")
+        unnamed = self.create_monitor("")
+        store.load([other, unnamed])
+
+        assert "orders" not in other.history
+        assert "orders" not in unnamed.history
+
+    def test_history_size_changed(self, store: StateStore) -> None:
+        """Test a history kept with another size is dropped, keeping the alerts."""
+        monitor = self.create_monitor()
+        monitor.history.record("orders", 11)
+        monitor.alert_state.should_send("orders")
+        store.save([monitor])
+
+        restored = Monitor(
+            connector=Mock(host="rmq"),
+            queue_details=[],
+            name="eu-1",
+            alert_state=AlertState(),
+            history_size=5,
+        )
+        store.load([restored])
+
+        assert "orders" not in restored.history
+        assert list(restored.alert_state.active) == ["orders"]
+
+    def test_no_alert_state(self, store: StateStore) -> None:
+        """Test the history is kept for monitors sending every alert."""
+        monitor = self.create_monitor()
+        monitor.alert_state = None
+        monitor.history.record("orders", 11)
+        store.save([monitor])
+
+        restored = self.create_monitor()
+        restored.alert_state = None
+        store.load([restored])
+
+        assert restored.history.current("orders") == 11
+
+    def test_no_state_yet(self, store: StateStore) -> None:
+        """Test the first run starts with an empty history."""
+        monitor = self.create_monitor()
+
+        store.load([monitor])
+
+        assert len(monitor.history) == 0
+
+    @pytest.mark.parametrize(
+        "content", [b"not marshal", marshal.dumps((0, {"eu-1": {}}))]
+    )
+    def test_unreadable_state_ignored(self, store: StateStore, content: bytes) -> None:
+        """Test a corrupt state, or one of another version, is ignored."""
+        os.makedirs(store.state_dir)
+
+        with open(store.path, "wb") as state_file:
+            state_file.write(content)
+
+        monitor = self.create_monitor()
+        store.load([monitor])
+
+        assert len(monitor.history) == 0
+
+    def test_save_error_logged(self, store: StateStore) -> None:
+        """Test a state that cannot be written is logged, not raised."""
+        Path(store.state_dir).write_text("")
+
+        with patch("amqpeek.state.logging") as logging_mock:
+            store.save([self.create_monitor()])
+
+        logging_mock.warning.assert_called_once()
+
+    def test_lock_released(self, store: StateStore) -> None:
+        """Test the lock can be taken by the next run once released."""
+        assert store.lock()
+
+        store.unlock()
+        store.unlock()
+
+        assert store.lock()
+        store.unlock()
+
+    def test_lock_waits_for_other_run(self, store: StateStore, tmp_path: Path) -> None:
+        """Test a run gives up on the state when another run holds it too long."""
+        other_run = StateStore(store.state_dir, str(tmp_path / "amqpeek.yaml"))
+        assert other_run.lock()
+        store.clock = Mock(side_effect=[0.0, 30.0, 60.0])
+
+        with patch("amqpeek.state.time.sleep") as sleep_mock:
+            assert not store.lock()
+
+        sleep_mock.assert_called_once()
+        other_run.unlock()
+
+    def test_lock_unavailable(self, tmp_path: Path) -> None:
+        """Test a state directory that cannot be created is logged, not raised."""
+        (tmp_path / "state").write_text("")
+        store = StateStore(str(tmp_path / "state"), "amqpeek.yaml")
+
+        with patch("amqpeek.state.logging") as logging_mock:
+            assert not store.lock()
+
+        logging_mock.warning.assert_called_once()
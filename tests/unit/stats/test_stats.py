@@ -0,0 +1,108 @@
+"""Tests for the stats module."""
+from contextlib import nullcontext
+from unittest.mock import Mock, patch
+
+import pytest
+
+from amqpeek.stats import BUCKET_BOUNDS, LatencyHistogram, span, Stats
+
+
+class TestLatencyHistogram(object):
+    """Tests for the LatencyHistogram class."""
+
+    def test_empty(self) -> None:
+        """Test the percentiles are 0 when nothing has been recorded."""
+        assert LatencyHistogram().percentile(50) == 0.0
+
+    def test_percentiles(self) -> None:
+        """Test the percentiles are within a bucket of the true values."""
+        histogram = LatencyHistogram()
+
+        for millis in range(1, 101):
+            histogram.record(millis / 1000)
+
+        assert histogram.count == 100
+        assert histogram.max == 0.1
+        assert histogram.percentile(50) == pytest.approx(0.05, rel=0.19)
+        assert histogram.percentile(99) == pytest.approx(0.099, rel=0.19)
+        assert histogram.percentile(100) == 0.1
+
+    def test_beyond_largest_bucket(self) -> None:
+        """Test latencies longer than the largest bucket are still counted."""
+        histogram = LatencyHistogram()
+        histogram.record(BUCKET_BOUNDS[-1] * 2)
+
+        assert histogram.percentile(50) == BUCKET_BOUNDS[-1] * 2
+
+
+class TestStats(object):
+    """Tests for the Stats class."""
+
+    @pytest.fixture
+    def stats(self) -> Stats:
+        """Stats keeping the two slowest queues, logged every minute."""
+        return Stats(slowest=2, log_interval=60, clock=Mock(return_value=0.0))
+
+    def test_span(self, stats: Stats) -> None:
+        """Test a span records the time taken, even when the code raises."""
+        with patch("amqpeek.stats.time.perf_counter", side_effect=[1.0, 1.5]):
+            with pytest.raises(RuntimeError):
+                with stats.span("connect"):
+                    Mock(side_effect=RuntimeError)()
+
+        assert stats.phases["connect"].count == 1
+        assert stats.phases["connect"].max == 0.5
+
+    def test_span_not_collected(self) -> None:
+        """Test nothing is timed when stats are not collected."""
+        assert isinstance(span(None, "connect"), nullcontext)
+
+    def test_slowest_queues(self, stats: Stats) -> None:
+        """Test the slowest queues of each cycle are kept."""
+        for seconds, label in [(0.1, "a"), (0.3, "b"), (0.2, "c"), (0.05, "d")]:
+            stats.record("connect_to_queue", seconds, label)
+
+        stats.record("notify", 1.0)
+        stats.end_cycle()
+
+        assert stats.last_slowest_queues == [(0.3, "b"), (0.2, "c")]
+        assert stats.slowest_queues == []
+        assert stats.phases["connect_to_queue"].count == 4
+
+    @patch("amqpeek.stats.logging")
+    def test_logged_every_interval(self, logging_mock: Mock, stats: Stats) -> None:
+        """Test the stats are logged once the log interval has passed."""
+        stats.record("connect_to_queue", 0.002, "orders")
+        stats.end_cycle()
+
+        logging_mock.info.assert_not_called()
+
+        stats.clock.return_value = 60.0
+        stats.end_cycle()
+
+        logging_mock.info.assert_called_once_with(
+            "Check stats: %s",
+            "connect_to_queue p50=2.0ms p95=2.0ms p99=2.0ms; slowest: none",
+        )
+        stats.record("connect_to_queue", 0.002, "orders")
+        stats.end_cycle()
+
+        assert stats.log_line().endswith("slowest: orders 2.0ms")
+
+    def test_summary(self, stats: Stats) -> None:
+        """Test the summary shows each phase and the slowest queues."""
+        stats.record("connect", 0.01)
+        stats.record("connect_to_queue", 0.002, "orders")
+        stats.end_cycle()
+
+        lines = stats.summary().splitlines()
+
+        assert lines[0].split() == "phase count p50 ms p95 ms p99 ms max ms".split()
+        assert lines[1].split() == ["connect", "1"] + ["10.00"] * 4
+        assert lines[2].split() == ["connect_to_queue", "1"] + ["2.00"] * 4
+        assert lines[4] == "Slowest queues of the last test:"
+        assert lines[5].split() == ["orders", "2.00", "ms"]
+
+    def test_summary_no_queues(self, stats: Stats) -> None:
+        """Test the slowest queues are left out when no queue was checked."""
+        assert stats.summary().splitlines()[1:] == []